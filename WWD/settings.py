@@ -87,6 +87,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'board.activity.ActivityBufferMiddleware',  # เขียน ActivityLog ทีเดียวตอนจบ request
 ]
 
 ROOT_URLCONF = 'WWD.urls'
@@ -153,6 +154,16 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Cache กลางที่ทุก process ใช้ร่วมกัน (daphne หลาย worker / run_jobs / shell)
+# สิทธิ์เข้าถึงบอร์ด, snapshot, report ถูก cache ไว้ -> ถ้าเป็น cache แยกต่อ process การล้าง cache จะไม่ถึง process อื่น
+# ใช้ Redis ตัวเดียวกับ Channels แต่คนละ database (db 1)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -187,4 +198,15 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 
-DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
\ No newline at end of file
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# ==========================================
+# ⚙️ Background Jobs (board/jobs.py)
+# ==========================================
+# งาน Email / Discord ถูกเก็บลงตาราง Job แล้วรันใน Thread Pool ของโปรเซส
+# งานที่ค้าง/ต้อง retry จะถูกเก็บต่อโดย `python manage.py run_jobs`
+JOB_WORKERS = 4
+JOB_DESTINATION_LIMITS = {
+    'email': 4,     # ส่งเมลพร้อมกันได้ 4 ฉบับ
+    'discord': 1,   # ต่อ 1 webhook (Discord จำกัด rate ต่อ webhook)
+}
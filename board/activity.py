@@ -0,0 +1,304 @@
+import base64
+import csv
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ActivityLog
+
+# ==========================================
+# Activity Feed (ประวัติกิจกรรมของบอร์ด)
+# ==========================================
+# แบ่งหน้าแบบ keyset (cursor) บน (created_at, id) แทน OFFSET
+#   -> หน้าที่ 1,000 เร็วเท่าหน้าแรก (เดิน index activity_board_created_idx ต่อจากแถวสุดท้ายที่เห็น)
+#   -> มี activity ใหม่เข้ามาระหว่างเลื่อนดู ก็ไม่เห็นแถวซ้ำ / ไม่ข้ามแถว
+# Export (CSV / NDJSON) สตรีมทีละ chunk ด้วย .iterator() -> บอร์ดที่มีเป็นล้านแถวก็ใช้ memory คงที่
+#
+# การบันทึก: log() เก็บเหตุการณ์แบบมีโครงสร้าง (verb + task / from_list / to_list + payload)
+#   ระหว่าง request จะพักไว้ใน buffer แล้วเขียนทีเดียวด้วย bulk_create ตอนจบ request (ActivityBufferMiddleware)
+#   ข้อความภาษาไทยสร้างตอนอ่าน (render_action) -> เปลี่ยนถ้อยคำได้โดยไม่ต้องแก้ข้อมูลเก่า
+
+ACTIVITY_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_FIELDS = ('id', 'created_at', 'actor_id', 'actor', 'verb', 'task_id', 'action')
+
+
+Verb = ActivityLog.Verb
+
+# ข้อความของแต่ละ verb ({task} / {from_list} / {to_list} / {board} แทนด้วยชื่อตอนแสดงผล
+# ค่าอื่น ๆ เช่น {users} / {member} มาจาก payload ที่ส่งให้ log())
+VERB_TEMPLATES = {
+    Verb.TASK_CREATED: "สร้างการ์ด '{task}' ในรายการ '{to_list}'",
+    Verb.TASK_MOVED: "ย้ายการ์ด '{task}' จาก '{from_list}' ไปยัง '{to_list}'",
+    Verb.TASK_UPDATED: "แก้ไขการ์ด '{task}'",
+    Verb.TASK_COMPLETED: "ทำการ์ด '{task}' เสร็จแล้ว",
+    Verb.TASK_REOPENED: "ยกเลิกสถานะเสร็จของการ์ด '{task}'",
+    Verb.TASK_ASSIGNED: "มอบหมายการ์ด '{task}' ให้ {users}",
+    Verb.TASK_UNASSIGNED: "นำ {users} ออกจากการ์ด '{task}'",
+    Verb.COMMENT_ADDED: "แสดงความคิดเห็นในการ์ด '{task}'",
+    Verb.MEMBER_JOINED: "เข้าร่วมบอร์ด '{board}'",
+    Verb.MEMBER_REMOVED: "นำ {member} ออกจากบอร์ด '{board}'",
+    Verb.BOARD_LEFT: "ได้ออกจากบอร์ด '{board}'",
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _Names(dict):
+    # ชื่อที่ไม่มีใน payload (เช่น log เก่า) -> ว่าง แทนที่จะ KeyError
+    def __missing__(self, key):
+        return ''
+
+
+# ------------------------------------------
+# Buffered Logger
+# ------------------------------------------
+
+_buffer = ContextVar('activity_buffer', default=None)
+
+
+def log(board, actor, verb, /, task=None, from_list=None, to_list=None, **payload):
+    """
+    บันทึกกิจกรรม (ถ้าอยู่ใน request จะรอเขียนพร้อมกันตอนจบ request)
+    board / actor / verb ส่งตามตำแหน่งเท่านั้น -> board='ชื่อบอร์ด' แบบ keyword เข้า payload ได้
+    """
+    # เก็บชื่อ ณ ตอนนี้ไว้ใน payload ด้วย เผื่อการ์ด/รายการถูกลบภายหลัง
+    if task is not None:
+        payload.setdefault('task', task.title)
+    if from_list is not None:
+        payload.setdefault('from_list', from_list.title)
+    if to_list is not None:
+        payload.setdefault('to_list', to_list.title)
+
+    entry = ActivityLog(
+        board_id=getattr(board, 'pk', board), actor=actor, verb=verb,
+        task=task, from_list=from_list, to_list=to_list, payload=payload,
+    )
+    pending = _buffer.get()
+    if pending is None:
+        entry.save()
+    else:
+        pending.append(entry)
+    return entry
+
+
+def flush():
+    """เขียนกิจกรรมที่ค้างใน buffer ลง DB (INSERT เดียว)"""
+    pending = _buffer.get()
+    if not pending:
+        return
+    for entry in pending:
+        # การ์ด/รายการถูกลบในระหว่าง request เดียวกัน -> เหลือแค่ชื่อใน payload
+        for field in ('task', 'from_list', 'to_list'):
+            obj = getattr(entry, field)
+            if obj is not None and obj.pk is None:
+                setattr(entry, field, None)
+    ActivityLog.objects.bulk_create(pending)
+    pending.clear()
+
+
+@contextmanager
+def buffered():
+    """พัก log() ทั้งหมดในบล็อกนี้ไว้ แล้ว flush ครั้งเดียวตอนออกจากบล็อก"""
+    if _buffer.get() is not None:  # ซ้อนกัน -> ใช้ buffer ชั้นนอก
+        yield
+        return
+    token = _buffer.set([])
+    try:
+        yield
+        flush()
+    finally:
+        _buffer.reset(token)
+
+
+class ActivityBufferMiddleware:
+    """รวม ActivityLog ที่เกิดขึ้นใน request เดียวเป็น bulk insert ครั้งเดียว (รองรับทั้ง sync และ async view)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with buffered():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if _buffer.get() is not None:
+            return await self.get_response(request)
+        token = _buffer.set([])
+        try:
+            response = await self.get_response(request)
+            await sync_to_async(flush)()
+            return response
+        finally:
+            _buffer.reset(token)
+
+
+# ------------------------------------------
+# Filters
+# ------------------------------------------
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def activity_queryset(board_id, actor_id=None, date_from=None, date_to=None):
+    """
+    Activity ของบอร์ด (ใหม่ -> เก่า) กรองตามผู้กระทำ / ช่วงวันที่ (รวมวัน date_to ทั้งวัน)
+    date_from / date_to เป็น datetime.date
+    """
+    activities = ActivityLog.objects.filter(board_id=board_id)
+    if actor_id:
+        activities = activities.filter(actor_id=actor_id)
+    if date_from:
+        activities = activities.filter(created_at__gte=_start_of_day(date_from))
+    if date_to:
+        activities = activities.filter(created_at__lt=_start_of_day(date_to + timedelta(days=1)))
+    return activities.order_by('-created_at', '-id')
+
+
+def parse_filters(params):
+    """request.GET -> kwargs ของ activity_queryset (ค่าที่อ่านไม่ออกถือว่าไม่ได้กรอง)"""
+    try:
+        actor_id = int(params.get('actor') or 0) or None
+    except ValueError:
+        actor_id = None
+    try:
+        date_from = parse_date(params.get('from') or '')
+        date_to = parse_date(params.get('to') or '')
+    except ValueError:
+        date_from = date_to = None
+    return {'actor_id': actor_id, 'date_from': date_from, 'date_to': date_to}
+
+
+# ------------------------------------------
+# Keyset Pagination
+# ------------------------------------------
+
+def encode_cursor(activity):
+    raw = f"{activity.created_at.isoformat()}|{activity.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """cursor -> (created_at, id) ของแถวสุดท้ายในหน้าก่อน"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if created_at is None:
+        raise InvalidCursor(cursor)
+    return created_at, pk
+
+
+def activity_page(activities, cursor=None, page_size=ACTIVITY_PAGE_SIZE):
+    """1 หน้าต่อจาก cursor -> (activities, next_cursor หรือ None ถ้าหมดแล้ว)"""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # (created_at, id) < (ค่าของแถวสุดท้าย) เรียงจากใหม่ไปเก่า
+        activities = activities.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    rows = list(with_names(activities)[:page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], encode_cursor(rows[page_size - 1])
+    return rows, None
+
+
+def render_action(verb, action='', payload=None, task=None, from_list=None, to_list=None, board=None):
+    """เหตุการณ์ -> ข้อความที่แสดง (ใช้ชื่อปัจจุบันก่อน ถ้าถูกลบไปแล้วใช้ชื่อใน payload)"""
+    template = VERB_TEMPLATES.get(verb)
+    if template is None:
+        return action
+    payload = payload or {}
+    names = _Names(payload)
+    names.update({
+        'task': task or payload.get('task', ''),
+        'from_list': from_list or payload.get('from_list', ''),
+        'to_list': to_list or payload.get('to_list', ''),
+        'board': board or payload.get('board', ''),
+    })
+    return template.format_map(names)
+
+
+def with_names(activities):
+    """select_related ชื่อที่ render_action ต้องใช้ (ไม่ดึงทั้งแถวของ Task / List)"""
+    return activities.select_related('actor', 'task', 'from_list', 'to_list').only(
+        'id', 'board_id', 'verb', 'action', 'payload', 'created_at', 'actor_id', 'actor__username',
+        'task__title', 'from_list__title', 'to_list__title',
+    )
+
+
+def serialize(activity):
+    username = activity.actor.username
+    return {
+        'id': activity.pk,
+        'actor': username,
+        'actor_id': activity.actor_id,
+        'actor_initial': username[0].upper() if username else '?',
+        'verb': activity.verb,
+        'task_id': activity.task_id,
+        'action': render_action(
+            activity.verb, activity.action, activity.payload,
+            task=activity.task and activity.task.title,
+            from_list=activity.from_list and activity.from_list.title,
+            to_list=activity.to_list and activity.to_list.title,
+        ),
+        'created_at': timezone.localtime(activity.created_at).strftime('%d/%m/%Y %H:%M'),
+    }
+
+
+# ------------------------------------------
+# Streaming Export
+# ------------------------------------------
+
+class _Echo:
+    """file-like ที่คืนค่าที่เขียนกลับมาเลย (ให้ csv.writer ผลิตทีละบรรทัดโดยไม่เก็บทั้งไฟล์)"""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(activities, chunk_size):
+    # values_list + iterator -> ไม่สร้าง model instance, ดึงจาก DB ทีละ chunk_size แถว
+    rows = activities.values_list(
+        'id', 'created_at', 'actor_id', 'actor__username', 'verb', 'task_id', 'action', 'payload',
+        'task__title', 'from_list__title', 'to_list__title',
+    )
+    for (pk, created_at, actor_id, username, verb, task_id, action, payload,
+         task_title, from_title, to_title) in rows.iterator(chunk_size=chunk_size):
+        text = render_action(verb, action, payload, task=task_title, from_list=from_title, to_list=to_title)
+        yield pk, created_at.isoformat(), actor_id, username, verb, task_id, text
+
+
+def export_lines(activities, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """generator ของข้อความทีละบรรทัด สำหรับ StreamingHttpResponse"""
+    if fmt == 'ndjson':
+        for row in _export_rows(activities, chunk_size):
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
+        return
+
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM ให้ Excel อ่านภาษาไทยถูก
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _export_rows(activities, chunk_size):
+        yield writer.writerow(row)
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class BoardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'board'
\ No newline at end of file
+    name = 'board'
+
+    def ready(self):
+        from . import signals, ordering  # noqa: F401  (ordering: ลงทะเบียน job rebalance)
@@ -1,33 +1,135 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .live import LIVE_TICK, board_group, coalesce, event, join_presence, leave_presence
+from .notifications import RECENT_LIMIT, aget_unread_count, arecent_notifications
+from .permissions import can_access
+
 class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    ws/notifications/?since=<id ล่าสุดที่ client มี>
+    - connect: ส่งแจ้งเตือนที่ใหม่กว่า since (ไม่ระบุ = 10 รายการล่าสุด) + ตัวนับ -> client ไม่ต้อง fetch / poll เอง
+      reconnect หลังเน็ตหลุดก็ได้เฉพาะส่วนที่พลาดไป
+    - แจ้งเตือนใหม่: ส่ง object เต็ม (เฉพาะที่ใหม่กว่า id ล่าสุดที่ส่งไปแล้ว)
+    - อ่านแล้ว (จากแท็บไหนก็ได้): ส่ง id ที่อ่าน + ตัวนับ
+    """
+
     async def connect(self):
         # ตรวจสอบว่า Login หรือยัง
         if self.scope["user"].is_anonymous:
             await self.close()
-        else:
-            # สร้างห้องส่วนตัวชื่อ "user_ID" (เช่น user_1)
-            self.room_group_name = f"user_{self.scope['user'].id}"
+            return
 
-            await self.channel_layer.group_add(
-                self.room_group_name,
-                self.channel_name
-            )
-            await self.accept()
-            print(f"User {self.scope['user'].id} Connected to Notifications")
+        self.user_id = self.scope['user'].id
+        # สร้างห้องส่วนตัวชื่อ "user_ID" (เช่น user_1)
+        self.room_group_name = f"user_{self.user_id}"
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+        await self.accept()
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            since_id = int(query.get('since', ['0'])[0]) or None
+        except ValueError:
+            since_id = None
+        await self.resync(since_id)
 
     async def disconnect(self, close_code):
-        if not self.scope["user"].is_anonymous:
+        if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
 
+    async def resync(self, since_id):
+        # ขอเกิน 1 แถว -> ถ้าพลาดไปเกิน RECENT_LIMIT ให้ client แทนที่ทั้งรายการ (reset)
+        rows = await arecent_notifications(self.user_id, since_id, limit=RECENT_LIMIT + 1)
+        reset = since_id is None or len(rows) > RECENT_LIMIT
+        rows = rows[:RECENT_LIMIT]
+        self.last_id = max([since_id or 0] + [row['id'] for row in rows])
+        await self.send(text_data=json.dumps({
+            'type': 'notification.sync',
+            'reset': reset,
+            'notifications': rows,
+            'unread_count': await aget_unread_count(self.scope['user']),
+        }))
+
     # ฟังก์ชันรับข้อมูลแจ้งเตือน แล้วส่งต่อให้ Frontend
     async def send_notification(self, event):
+        rows = await arecent_notifications(self.user_id, self.last_id)
+        if rows:
+            self.last_id = max(row['id'] for row in rows)
         await self.send(text_data=json.dumps({
             'type': 'notification',
             'message': event['message'],
-            'unread_count': event['unread_count']
-        }))
\ No newline at end of file
+            'unread_count': event['unread_count'],
+            'notifications': rows,
+        }))
+
+    async def notification_read(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'notification.read',
+            'ids': event['ids'],
+            'unread_count': event['unread_count'],
+        }))
+
+class BoardConsumer(AsyncWebsocketConsumer):
+    """
+    ws/board/<id>/ : ส่งการเปลี่ยนแปลงของบอร์ดแบบ real-time (ดู live.py)
+    - เช็คสิทธิ์ครั้งเดียวตอน connect
+    - event ที่เข้ามาภายใน LIVE_TICK วินาทีถูกรวม (coalesce) แล้วส่งเป็น frame เดียว
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        self.board_id = int(self.scope['url_route']['kwargs']['board_id'])
+        self.pending = {}
+        self.flush_task = None
+        self.joined = False
+
+        if self.user.is_anonymous or not await database_sync_to_async(can_access)(self.user, self.board_id):
+            await self.close()
+            return
+
+        self.room_group_name = board_group(self.board_id)
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.accept()
+
+        # แจ้งทุกคนในบอร์ดว่ามีคนเข้ามา (presence)
+        self.joined = True
+        users = await sync_to_async(join_presence)(self.board_id, self.user)
+        await self.channel_layer.group_send(self.room_group_name, {'type': 'board.events', 'events': [event('presence', users=users)]})
+
+    async def disconnect(self, close_code):
+        if self.flush_task:
+            self.flush_task.cancel()
+        if not self.joined:
+            return
+        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        users = await sync_to_async(leave_presence)(self.board_id, self.user)
+        await self.channel_layer.group_send(self.room_group_name, {'type': 'board.events', 'events': [event('presence', users=users)]})
+
+    async def board_events(self, message):
+        for item in message['events']:
+            if item['type'] == 'member.removed':
+                if self.user.id in item['user_ids']:
+                    await self.close()
+                    return
+                continue
+            coalesce(self.pending, item)
+
+        if self.pending and self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(LIVE_TICK)
+        events, self.pending = list(self.pending.values()), {}
+        self.flush_task = None
+        await self.send(text_data=json.dumps({'type': 'board.delta', 'events': events}))
@@ -1,6 +1,7 @@
 # boards/forms.py
 from django import forms
-from .models import Board, List, Task, ClassSchedule   
+from .models import Board, Label, List, Task, ClassSchedule   
+from .permissions import board_member_ids
 from users.models import User
 
 
@@ -55,7 +56,42 @@ class ListForm(forms.ModelForm):
             field.widget.attrs.update({"class": base})
 
 
+class BoardScopedChoiceField(forms.TypedMultipleChoiceField):
+    """
+    เลือกได้หลายค่า แต่ต้องอยู่ใน allowed_ids ของบอร์ด (สมาชิก / ป้าย)
+    - ตรวจค่าด้วย set ของ ID อย่างเดียว (ไม่ query ทั้งตาราง)
+    - choices (ชื่อที่แสดง) ส่งมาเป็น callable -> query เฉพาะตอน render ฟอร์ม
+    """
+
+    def __init__(self, *, allowed_ids=frozenset(), **kwargs):
+        kwargs.setdefault('coerce', int)
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+        self.allowed_ids = allowed_ids
+
+    def valid_value(self, value):
+        try:
+            return int(value) in self.allowed_ids
+        except (TypeError, ValueError):
+            return False
+
+
+def _diff_m2m(related_manager, old_ids, new_ids):
+    """เขียนเฉพาะส่วนต่างของ M2M (remove / add อย่างละครั้ง ถ้ามี) -> (added, removed)"""
+    added, removed = new_ids - old_ids, old_ids - new_ids
+    if removed:
+        related_manager.remove(*removed)
+    if added:
+        related_manager.add(*added)
+    return added, removed
+
+
 class TaskForm(forms.ModelForm):   
+    """
+    ฟอร์มงานที่ผูกกับบอร์ด: TaskForm(data, instance=task, board=board)
+    ผู้รับผิดชอบเลือกได้เฉพาะสมาชิกบอร์ด (ตรวจกับ board_member_ids ที่ cache ไว้) / ป้ายเฉพาะของบอร์ดนี้
+    หลัง save(): form.added_assignee_ids / form.removed_assignee_ids = คนที่เพิ่ง assign / ถูกเอาออก
+    """
     due_date = forms.DateTimeField(
         required=False,
         widget=forms.DateTimeInput(
@@ -64,24 +100,61 @@ class TaskForm(forms.ModelForm):
             }
         ),
     )
+    assigned_to = BoardScopedChoiceField(label="ผู้รับผิดชอบ")
+    labels = BoardScopedChoiceField(label="ป้ายกำกับ")
 
     class Meta:
         model = Task
         fields = ["title", "description", "assigned_to", "due_date",  "priority",'remind_days']
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, board=None, **kwargs):
         super().__init__(*args, **kwargs)
+        if board is None:
+            board = self.instance.list.board
+        self.board = board
+
+        member_ids = board_member_ids(board)
+        label_ids = frozenset(Label.objects.filter(board=board).values_list('id', flat=True))
+        self.fields['assigned_to'].allowed_ids = member_ids
+        self.fields['assigned_to'].choices = lambda: list(
+            User.objects.filter(id__in=member_ids).order_by('username').values_list('id', 'username')
+        )
+        self.fields['labels'].allowed_ids = label_ids
+        self.fields['labels'].choices = lambda: list(
+            Label.objects.filter(board=board).order_by('name').values_list('id', 'name')
+        )
+
+        # ค่าเดิมของงาน (ใช้ทั้งแสดงผลและหา diff ตอนบันทึก)
+        self.old_assignee_ids = set()
+        self.old_label_ids = set()
+        if self.instance.pk:
+            self.old_assignee_ids = set(self.instance.assigned_to.values_list('id', flat=True))
+            self.old_label_ids = set(self.instance.labels.values_list('id', flat=True))
+        self.initial['assigned_to'] = sorted(self.old_assignee_ids)
+        self.initial['labels'] = sorted(self.old_label_ids)
+        self.added_assignee_ids = set()
+        self.removed_assignee_ids = set()
+
         base = ("w-full rounded-md border border-gray-300 px-3 py-2 text-sm "
                 "focus:outline-none focus:ring-2 focus:ring-[#0094FF]")
 
         for name, field in self.fields.items():
-            if name in ["status", "priority", "assigned_to"]:
+            if name in ["status", "priority", "assigned_to", "labels"]:
                 field.widget.attrs.update({
                     "class": base.replace("px-3 py-2", "px-3 py-2")  # select ใช้ class เดียวกันได้
                 })
             else:
                 field.widget.attrs.update({"class": base})
 
+    def _save_m2m(self):
+        # ไม่ใช้ .set() ของ Django (อ่านค่าเดิมซ้ำ) -> ใช้ค่าเดิมที่โหลดไว้ตอนสร้างฟอร์มแล้ว diff เอง
+        self.added_assignee_ids, self.removed_assignee_ids = _diff_m2m(
+            self.instance.assigned_to, self.old_assignee_ids, set(self.cleaned_data['assigned_to']),
+        )
+        # ป้าย: เปลี่ยนเฉพาะเมื่อฟอร์มส่งช่อง labels มา (ฟอร์มที่ไม่มีช่องนี้จะไม่ล้างป้ายเดิม)
+        if 'labels' in self.data:
+            _diff_m2m(self.instance.labels, self.old_label_ids, set(self.cleaned_data['labels']))
+
 class ClassScheduleForm(forms.ModelForm):
     class Meta:
         model = ClassSchedule
@@ -0,0 +1,380 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from . import live
+from .models import GoogleCalendarSync, SearchDocument, Task
+from .ordering import POSITION_GAP, first_position
+from .search import index_objects
+from .snapshot import bump_board_version
+from .stats import record_changed_tasks, record_new_tasks, task_state
+
+# ==========================================
+# Google Calendar Fetch Service
+# ==========================================
+# ทุก View ที่ดึง Event จาก Google ใช้ตัวนี้ร่วมกัน:
+# - ยิง events().list ของแต่ละปฏิทินพร้อมกันผ่าน Thread Pool ขนาดจำกัด
+# - Cache ผลแยกตาม user / ปฏิทิน / ช่วงเวลา (ปัดช่วงเวลาให้ลง bucket เดียวกันจะได้ hit cache)
+# - สร้าง service ผ่าน `build` ของโมดูลนี้ -> ทดสอบได้ด้วยการ patch `board.google_calendar.build`
+
+GOOGLE_CALENDAR_WORKERS = getattr(settings, 'GOOGLE_CALENDAR_WORKERS', 4)
+GOOGLE_CALENDAR_CACHE_TIMEOUT = getattr(settings, 'GOOGLE_CALENDAR_CACHE_TIMEOUT', 900)  # 15 นาที
+
+UPCOMING_BUCKET = datetime.timedelta(minutes=15)
+SKIP_CALENDAR_KEYWORDS = ['holiday', 'วันหยุด', 'birthday', 'วันเกิด']
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GOOGLE_CALENDAR_WORKERS, thread_name_prefix='google-calendar')
+        return _executor
+
+
+def get_service(creds_data):
+    """สร้าง Calendar service (1 ตัวต่อ thread ต่อ credentials เพราะ httplib2 ไม่ thread-safe)"""
+    key = creds_data.get('token')
+    services = getattr(_local, 'services', None)
+    if services is None:
+        services = _local.services = {}
+    if key not in services:
+        services.clear()  # เก็บแค่ของ user ล่าสุดพอ
+        services[key] = build('calendar', 'v3', credentials=Credentials(**creds_data))
+    return services[key]
+
+
+def floor_time(dt, bucket):
+    """ปัดเวลาลงให้ตรง bucket (เช่น ทุก 15 นาที) เพื่อให้ request ใกล้ ๆ กันใช้ cache key เดียวกัน"""
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=dt.tzinfo)
+    return dt - (dt - epoch) % bucket
+
+
+def _iso(dt):
+    return dt.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def event_start(event):
+    return event['start'].get('dateTime', event['start'].get('date'))
+
+
+def parse_event_start(start):
+    """แปลงเวลาเริ่มของ Event (ISO datetime หรือ date) เป็น datetime"""
+    try:
+        if isinstance(start, str):
+            if 'T' in start:
+                return datetime.datetime.fromisoformat(start.replace('Z', '+00:00'))
+            return datetime.datetime.strptime(start, "%Y-%m-%d")
+    except ValueError:
+        pass
+    return start
+
+
+# ------------------------------------------
+# Fetch (Cache + Thread Pool)
+# ------------------------------------------
+
+def list_calendars(user_id, creds_data, show_hidden=False):
+    """รายชื่อปฏิทินของ user (cache ไว้)"""
+    key = f"google_calendars_{user_id}_{int(show_hidden)}"
+    calendars = cache.get(key)
+    if calendars is None:
+        params = {'showHidden': True} if show_hidden else {}
+        items = get_service(creds_data).calendarList().list(**params).execute().get('items', [])
+        calendars = [{'id': c['id'], 'summary': c.get('summary', '')} for c in items]
+        cache.set(key, calendars, GOOGLE_CALENDAR_CACHE_TIMEOUT)
+    return calendars
+
+
+def _events_key(user_id, calendar_id, time_min, time_max, max_results):
+    return f"google_events_{user_id}_{calendar_id}_{time_min}_{time_max or ''}_{max_results}"
+
+
+def _fetch_calendar(creds_data, calendar_id, time_min, time_max, max_results):
+    params = {
+        'calendarId': calendar_id,
+        'timeMin': time_min,
+        'maxResults': max_results,
+        'singleEvents': True,
+        'orderBy': 'startTime',
+    }
+    if time_max:
+        params['timeMax'] = time_max
+    return get_service(creds_data).events().list(**params).execute().get('items', [])
+
+
+def fetch_events(user_id, creds_data, calendar_ids, time_min, time_max=None, max_results=50):
+    """
+    ดึง Event ของหลายปฏิทินในช่วงเวลาเดียวกัน -> {calendar_id: [event, ...]}
+    ตัวที่อยู่ใน cache ไม่ต้องยิงใหม่ ที่เหลือยิงพร้อมกันผ่าน Thread Pool
+    ปฏิทินที่ error จะถูกข้าม (ไม่ cache ไว้ รอบหน้าลองใหม่)
+    """
+    time_min = _iso(time_min)
+    time_max = _iso(time_max) if time_max else None
+    keys = {cal_id: _events_key(user_id, cal_id, time_min, time_max, max_results) for cal_id in calendar_ids}
+    cached = cache.get_many(list(keys.values()))
+
+    results = {}
+    missing = []
+    for cal_id, key in keys.items():
+        if key in cached:
+            results[cal_id] = cached[key]
+        else:
+            missing.append(cal_id)
+
+    if missing:
+        executor = _get_executor()
+        futures = {
+            cal_id: executor.submit(_fetch_calendar, creds_data, cal_id, time_min, time_max, max_results)
+            for cal_id in missing
+        }
+        fresh = {}
+        for cal_id, future in futures.items():
+            try:
+                results[cal_id] = fresh[keys[cal_id]] = future.result()
+            except Exception as e:
+                print(f"Google API Error ({cal_id}): {e}")
+        if fresh:
+            cache.set_many(fresh, GOOGLE_CALENDAR_CACHE_TIMEOUT)
+
+    return results
+
+
+# ------------------------------------------
+# ใช้ใน Views
+# ------------------------------------------
+
+def upcoming_events(user_id, creds_data, limit=15, per_calendar=5):
+    """
+    Event ที่กำลังจะมาถึง (Dashboard / Widget) -> (events, course_names)
+    events = [{'title', 'start', 'link', 'source'}] เรียงตามเวลา
+    """
+    calendars = [
+        c for c in list_calendars(user_id, creds_data)
+        if not any(k in c['summary'].lower() for k in SKIP_CALENDAR_KEYWORDS)
+    ]
+    course_names = []
+    for c in calendars:
+        if c['summary'] not in course_names and '@' not in c['summary']:
+            course_names.append(c['summary'])
+
+    now = floor_time(datetime.datetime.now(datetime.timezone.utc), UPCOMING_BUCKET)
+    by_calendar = fetch_events(user_id, creds_data, [c['id'] for c in calendars], now, max_results=per_calendar)
+
+    all_events = []
+    for c in calendars:
+        for event in by_calendar.get(c['id'], []):
+            all_events.append((c['summary'], event))
+    all_events.sort(key=lambda item: event_start(item[1]))
+
+    events = [
+        {
+            'title': event.get('summary', '(ไม่มีชื่อ)'),
+            'start': parse_event_start(event_start(event)),
+            'link': event.get('htmlLink', '#'),
+            'source': cal_name or 'Google Calendar',
+        }
+        for cal_name, event in all_events[:limit]
+    ]
+    return events, course_names
+
+
+def calendar_feed_events(user_id, creds_data, time_min, time_max=None, max_results=50):
+    """Event ดิบของทุกปฏิทิน (หน้า Calendar) -> [(ชื่อปฏิทิน, event), ...]"""
+    calendars = [
+        c for c in list_calendars(user_id, creds_data, show_hidden=True)
+        if not ('holiday' in c['id'] or 'addressbook' in c['id'] or 'th.thai' in c['id'])
+    ]
+    by_calendar = fetch_events(
+        user_id, creds_data, [c['id'] for c in calendars], time_min, time_max, max_results=max_results,
+    )
+    return [
+        (c['summary'] or 'Unknown', event)
+        for c in calendars
+        for event in by_calendar.get(c['id'], [])
+    ]
+
+
+# ------------------------------------------
+# Incremental Sync (Google Calendar -> Task)
+# ------------------------------------------
+# รอบแรกดึงย้อนหลัง SYNC_LOOKBACK_DAYS วัน แล้วเก็บ nextSyncToken ไว้ใน GoogleCalendarSync
+# รอบถัดไปส่ง syncToken -> Google ส่งมาเฉพาะ Event ที่เพิ่ม / แก้ / ยกเลิก
+
+SYNC_LOOKBACK_DAYS = 90
+SYNC_PAGE_SIZE = 250
+
+
+def event_due_date(event):
+    """เวลาเริ่มของ Event -> due_date (ถ้ามีแต่วันที่ ให้เป็น 23:59 ของวันนั้น)"""
+    start = event.get('start', {}).get('dateTime', event.get('start', {}).get('date'))
+    if not start:
+        return None
+    try:
+        if 'T' in start:
+            return datetime.datetime.fromisoformat(start.replace('Z', '+00:00'))
+        due_date = datetime.datetime.strptime(start, "%Y-%m-%d").replace(hour=23, minute=59)
+        return timezone.make_aware(due_date)
+    except ValueError:
+        return None
+
+
+def _event_fields(event):
+    desc_text = event.get('description', '') or "-"
+    link = event.get('htmlLink', '#')
+    return {
+        'title': event.get('summary', '(No Title)')[:255],
+        'description': f"{desc_text}\n\n🔗 Google Link:\n{link}",
+        'due_date': event_due_date(event),
+    }
+
+
+def _apply_page(events, board, todo_list, user):
+    """
+    นำ Event 1 หน้าเข้า DB: เช็คซ้ำด้วย IN query เดียว, สร้างด้วย bulk_create,
+    แก้ไข/ยกเลิกด้วย bulk_update -> คืนค่า (created, updated, cancelled)
+    bulk_* ไม่ผ่าน signal -> อัปเดตสถิติ (stats.py) และดัชนีค้นหาเองในนี้
+    """
+    by_id = {event['id']: event for event in events}
+    existing = {
+        task.google_event_id: task
+        for task in Task.objects.filter(google_event_id__in=list(by_id)).only(
+            'id', 'list_id', 'google_event_id', 'title', 'description', 'due_date',
+            'remind_days', 'is_completed', 'is_reminded', 'is_archived',
+            'created_at', 'completed_at', 'priority',
+        )
+    }
+    board_list_ids = set(board.lists.values_list('id', flat=True))
+
+    new_tasks, changed = [], []
+    old_states = {}  # task.pk -> task_state ก่อนแก้ (ไว้คิดส่วนต่างสถิติ)
+    cancelled = 0
+    position = first_position(todo_list.tasks.all())
+    for g_id, event in by_id.items():
+        task = existing.get(g_id)
+        if task is not None and task.list_id not in board_list_ids:
+            continue  # Event เดียวกันถูกนำเข้าไว้ในบอร์ดอื่นแล้ว (google_event_id ห้ามซ้ำ)
+
+        if event.get('status') == 'cancelled':
+            if task is not None and not task.is_archived:
+                old_states[task.pk] = task_state(task)
+                task.is_archived = True
+                changed.append(task)
+                cancelled += 1
+            continue
+
+        fields = _event_fields(event)
+        if task is None:
+            task = Task(
+                list=todo_list,
+                google_event_id=g_id,
+                position=position,
+                priority=Task.Priority.MEDIUM,
+                status=Task.Status.TODO,
+                **fields,
+            )
+            task.remind_at = task.compute_remind_at()
+            new_tasks.append(task)
+            position -= POSITION_GAP
+            continue
+
+        if any(getattr(task, name) != value for name, value in fields.items()):
+            old_states[task.pk] = task_state(task)
+            if task.due_date != fields['due_date']:
+                task.is_reminded = False  # วันเปลี่ยน -> ต้องเตือนใหม่
+            for name, value in fields.items():
+                setattr(task, name, value)
+            changed.append(task)
+
+    new_ids = []
+    with transaction.atomic():
+        if new_tasks:
+            Task.objects.bulk_create(new_tasks, ignore_conflicts=True)
+            # MySQL ไม่คืน pk จาก bulk_create -> ดึง id กลับมาด้วย google_event_id
+            # (ignore_conflicts: Event ที่ถูกนำเข้าไปแล้วระหว่างนี้จะไม่ได้แถวใหม่ -> ไม่นับ)
+            inserted = dict(Task.objects.filter(
+                list=todo_list, google_event_id__in=[task.google_event_id for task in new_tasks]
+            ).values_list('google_event_id', 'id'))
+            new_tasks = [task for task in new_tasks if task.google_event_id in inserted]
+            new_ids = list(inserted.values())
+            Task.assigned_to.through.objects.bulk_create(
+                [Task.assigned_to.through(task_id=task_id, user_id=user.id) for task_id in new_ids],
+                ignore_conflicts=True,
+            )
+            record_new_tasks(new_tasks, board.id)
+        if changed:
+            for task in changed:
+                task.remind_at = task.compute_remind_at()
+            Task.objects.bulk_update(
+                changed, ['title', 'description', 'due_date', 'is_reminded', 'is_archived', 'remind_at'],
+            )
+            record_changed_tasks([(old_states[task.pk], task) for task in changed], board.id)
+
+        # bulk_create / bulk_update ไม่ผ่าน signal -> index งานที่สร้าง/แก้ไขเข้าระบบค้นหาเอง
+        indexed = list(Task.objects.filter(id__in=new_ids).only('id', 'list_id', 'title', 'description')) if new_ids else []
+        index_objects(SearchDocument.Kind.TASK, indexed + changed)
+
+    return len(new_tasks), len(changed) - cancelled, cancelled
+
+
+def sync_calendar(user, creds_data, calendar_id, board, todo_list):
+    """
+    Sync ปฏิทิน 1 อันเข้าบอร์ด (ใช้ syncToken ถ้าเคย sync แล้ว) -> {'created', 'updated', 'cancelled'}
+    ถ้า Google ตอบ 410 (token หมดอายุ) จะล้าง token แล้วดึงใหม่ทั้งหมด
+    """
+    state, _ = GoogleCalendarSync.objects.get_or_create(
+        user=user, calendar_id=calendar_id, defaults={'board': board},
+    )
+    if state.board_id != board.id:
+        state.board = board
+        state.sync_token = ''  # เปลี่ยนบอร์ดปลายทาง -> ต้องดึงใหม่ทั้งหมด
+
+    service = get_service(creds_data)
+    totals = {'created': 0, 'updated': 0, 'cancelled': 0}
+    page_token = None
+    while True:
+        params = {'calendarId': calendar_id, 'singleEvents': True, 'maxResults': SYNC_PAGE_SIZE}
+        if state.sync_token:
+            params['syncToken'] = state.sync_token
+        else:
+            params['timeMin'] = _iso(timezone.now() - datetime.timedelta(days=SYNC_LOOKBACK_DAYS))
+        if page_token:
+            params['pageToken'] = page_token
+
+        try:
+            result = service.events().list(**params).execute()
+        except HttpError as e:
+            if e.resp.status == 410 and state.sync_token:
+                state.sync_token = ''
+                page_token = None
+                continue
+            raise
+
+        created, updated, cancelled = _apply_page(result.get('items', []), board, todo_list, user)
+        totals['created'] += created
+        totals['updated'] += updated
+        totals['cancelled'] += cancelled
+
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            state.sync_token = result.get('nextSyncToken', '')
+            break
+
+    state.last_synced_at = timezone.now()
+    state.save()
+    if any(totals.values()):
+        bump_board_version(board.id)
+        live.publish(board.id, live.event('board.changed'))  # นำเข้าแบบ bulk -> ให้คนที่เปิดบอร์ดอยู่โหลดใหม่
+    return totals
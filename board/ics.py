@@ -0,0 +1,195 @@
+import hashlib
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from users.models import User
+from .models import ClassSchedule, Task
+from .permissions import accessible_board_ids
+from .snapshot import get_board_versions
+
+# ==========================================
+# iCalendar Feed (.ics สำหรับ Google Calendar / Apple Calendar / Outlook subscribe)
+# ==========================================
+# URL มี token ที่เซ็นไว้ (user + บอร์ด) -> client ภายนอกดึงได้โดยไม่ต้องล็อกอิน
+#   token ผูกกับรหัสผ่าน: เปลี่ยนรหัสผ่าน = ลิงก์เดิมใช้ไม่ได้ทันที
+# ETag = data version ของ user (ไม่ต้องแตะตาราง Task):
+#   version ของทุกบอร์ดที่เข้าถึงได้ (แถว BoardVersion ที่ signals.py bump อยู่แล้ว) + version ตารางเรียนของ user
+#   -> client poll ทุก ๆ กี่นาทีก็ได้ 304 ถ้าไม่มีอะไรเปลี่ยน
+# เนื้อหาสร้างแบบ streaming ทีละบรรทัด (values() + iterator) -> งานเป็นหมื่นก็ใช้ memory คงที่
+
+ICS_SALT = 'board.ics'
+ICS_CHUNK_SIZE = 2000
+TASK_DURATION = timedelta(minutes=30)
+# ตารางเรียนไม่มีวันที่เริ่ม -> เริ่ม RRULE รายสัปดาห์จากวันจันทร์ตายตัว (เนื้อหาไฟล์ไม่เปลี่ยนตามวันที่ดึง)
+SCHEDULE_ANCHOR = date(2024, 1, 1)
+ICS_DAYS = {'Mon': 'MO', 'Tue': 'TU', 'Wed': 'WE', 'Thu': 'TH', 'Fri': 'FR', 'Sat': 'SA', 'Sun': 'SU'}
+DAY_OFFSET = {'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3, 'Fri': 4, 'Sat': 5, 'Sun': 6}
+
+
+class InvalidToken(Exception):
+    pass
+
+
+# ------------------------------------------
+# Token
+# ------------------------------------------
+
+def _user_key(user):
+    # เปลี่ยนทุกครั้งที่รหัสผ่านเปลี่ยน (ไม่เปิดเผย hash ของรหัสผ่านใน URL)
+    return salted_hmac(ICS_SALT, user.password).hexdigest()[:16]
+
+
+def make_token(user, board_id=None):
+    """token ของ feed รวมทุกบอร์ด (board_id=None) หรือเฉพาะบอร์ด"""
+    return signing.dumps({'u': user.pk, 'b': board_id, 'k': _user_key(user)}, salt=ICS_SALT, compress=True)
+
+
+def read_token(token):
+    """token -> (user, board_id หรือ None)"""
+    try:
+        data = signing.loads(token, salt=ICS_SALT)
+        user = User.objects.only('id', 'username', 'password', 'is_active').get(pk=data['u'], is_active=True)
+    except (signing.BadSignature, KeyError, TypeError, User.DoesNotExist):
+        raise InvalidToken(token)
+    if not constant_time_compare(data.get('k', ''), _user_key(user)):
+        raise InvalidToken(token)
+    return user, data.get('b')
+
+
+# ------------------------------------------
+# Data Version (ETag)
+# ------------------------------------------
+
+def _schedule_version_key(user_id):
+    return f"class_schedule_version_{user_id}"
+
+
+def get_schedule_version(user_id):
+    """version ตารางเรียนของ user (timestamp ms เก็บใน cache กลาง -> ทุก process เห็นค่าเดียวกัน)"""
+    key = _schedule_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_schedule_version(user_id):
+    old = cache.get(_schedule_version_key(user_id)) or 0
+    cache.set(_schedule_version_key(user_id), max(int(time.time() * 1000), old + 1), None)
+
+
+def feed_board_ids(user, board_id=None):
+    """บอร์ดที่อยู่ใน feed (เฉพาะที่ยังเข้าถึงได้)"""
+    board_ids = accessible_board_ids(user)
+    if board_id is None:
+        return sorted(board_ids)
+    return [board_id] if board_id in board_ids else []
+
+
+def feed_version(user, board_ids, include_schedule):
+    """ETag ของ feed จาก version ล้วน ๆ (query ตาราง BoardVersion ครั้งเดียว ไม่แตะตาราง Task)"""
+    versions = get_board_versions(board_ids)
+    raw = ",".join(f"{board_id}:{versions[board_id]}" for board_id in board_ids)
+    if include_schedule:
+        raw += f"|s:{get_schedule_version(user.pk)}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+# ------------------------------------------
+# Streaming Render
+# ------------------------------------------
+
+def _escape(text):
+    return (
+        (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    # RFC 5545: บรรทัดยาวเกิน 75 octet ต้องตัดแล้วขึ้นบรรทัดใหม่ด้วยช่องว่าง (ไม่ตัดกลางตัวอักษร UTF-8)
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def _utc(dt):
+    return dt.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _task_event(row, base_url, domain, stamp):
+    due = row['due_date']
+    yield 'BEGIN:VEVENT'
+    yield f"UID:task-{row['id']}@{domain}"
+    yield f"DTSTAMP:{stamp}"
+    yield f"DTSTART:{_utc(due)}"
+    yield f"DTEND:{_utc(due + TASK_DURATION)}"
+    summary = f"[{row['list__board__name']}] {row['title']}"
+    yield f"SUMMARY:{_escape(summary)}"
+    if row['description']:
+        yield f"DESCRIPTION:{_escape(row['description'])}"
+    yield f"URL:{base_url}/board/{row['list__board_id']}/?task_id={row['id']}"
+    yield 'END:VEVENT'
+
+
+def _schedule_event(row, domain, stamp):
+    # เวลาแบบ floating (ไม่มี Z / TZID) -> แสดงตามเวลาท้องถิ่นของเครื่องผู้ใช้ เหมือน "08:30" ในตารางเรียน
+    day = SCHEDULE_ANCHOR + timedelta(days=DAY_OFFSET[row['day']])
+    yield 'BEGIN:VEVENT'
+    yield f"UID:schedule-{row['id']}@{domain}"
+    yield f"DTSTAMP:{stamp}"
+    yield f"DTSTART:{datetime.combine(day, row['start_time']):%Y%m%dT%H%M%S}"
+    yield f"DTEND:{datetime.combine(day, row['end_time']):%Y%m%dT%H%M%S}"
+    yield f"RRULE:FREQ=WEEKLY;BYDAY={ICS_DAYS[row['day']]}"
+    yield f"SUMMARY:{_escape(row['subject_name'])}"
+    yield 'END:VEVENT'
+
+
+def feed_lines(user, board_ids, include_schedule, base_url, name, chunk_size=ICS_CHUNK_SIZE):
+    """generator ของไฟล์ .ics ทีละบรรทัด (สำหรับ StreamingHttpResponse) / base_url เช่น https://example.com"""
+    stamp = _utc(timezone.now())
+    domain = base_url.split('://', 1)[-1]
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//DSSI Board//Tasks//TH',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f"X-WR-CALNAME:{_escape(name)}",
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+    ]
+    for line in header:
+        yield _fold(line)
+
+    tasks = (
+        Task.objects.filter(list__board_id__in=board_ids, due_date__isnull=False, is_archived=False)
+        .values('id', 'title', 'description', 'due_date', 'list__board_id', 'list__board__name')
+        .order_by('due_date', 'id')
+    )
+    for row in tasks.iterator(chunk_size=chunk_size):
+        for line in _task_event(row, base_url, domain, stamp):
+            yield _fold(line)
+
+    if include_schedule:
+        schedules = ClassSchedule.objects.filter(user=user, day__in=ICS_DAYS).values(
+            'id', 'subject_name', 'day', 'start_time', 'end_time',
+        )
+        for row in schedules.iterator(chunk_size=chunk_size):
+            for line in _schedule_event(row, domain, stamp):
+                yield _fold(line)
+
+    yield _fold('END:VCALENDAR')
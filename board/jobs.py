@@ -0,0 +1,250 @@
+import threading
+import traceback
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Job
+
+# ==========================================
+# Background Job Queue
+# ==========================================
+# งานทุกชิ้นถูกบันทึกลงตาราง Job ก่อน แล้วค่อยส่งให้ Worker Pool ในโปรเซสรัน
+# ถ้าโปรเซสตาย/รีสตาร์ท งานที่ค้างจะถูกเก็บต่อโดย `python manage.py run_jobs`
+
+JOB_WORKERS = getattr(settings, 'JOB_WORKERS', 4)
+JOB_RUN_IN_PROCESS = getattr(settings, 'JOB_RUN_IN_PROCESS', True)
+JOB_RETRY_BASE_SECONDS = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 10)
+JOB_LOCK_TIMEOUT = timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 300))
+# จำนวนงานที่รันพร้อมกันได้ต่อปลายทาง (key = ส่วนหน้าของ destination เช่น 'discord', 'email')
+JOB_DESTINATION_LIMITS = getattr(settings, 'JOB_DESTINATION_LIMITS', {'email': 4, 'discord': 1})
+
+_handlers = {}
+
+
+def job_handler(kind):
+    """ลงทะเบียนฟังก์ชันที่ใช้รันงานประเภท `kind` (รับ payload เป็น dict)"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def destination_limit(destination):
+    return JOB_DESTINATION_LIMITS.get(destination.split(':', 1)[0], JOB_WORKERS)
+
+
+# ------------------------------------------
+# Enqueue
+# ------------------------------------------
+
+def enqueue(kind, payload, destination='', max_attempts=5):
+    """บันทึกงานลง DB แล้วส่งเข้า Worker Pool หลัง transaction commit"""
+    job = Job.objects.create(
+        kind=kind,
+        payload=payload,
+        destination=destination or kind,
+        max_attempts=max_attempts,
+    )
+    if JOB_RUN_IN_PROCESS:
+        transaction.on_commit(lambda: get_pool().submit(job.pk, job.destination))
+    return job
+
+
+def enqueue_email(subject, message, recipient_list):
+    recipient_list = [email for email in recipient_list if email]
+    if not recipient_list:
+        return None
+    return enqueue('email', {
+        'subject': subject,
+        'message': message,
+        'recipient_list': recipient_list,
+    }, destination='email')
+
+
+def enqueue_discord(message, webhook_url):
+    if not webhook_url:
+        return None
+    # แยก destination ตาม webhook (Discord จำกัด rate ต่อ webhook)
+    return enqueue('discord', {
+        'webhook_url': webhook_url,
+        'content': message,
+    }, destination=f"discord:{urlparse(webhook_url).path}"[:255])
+
+
+# ------------------------------------------
+# Handlers
+# ------------------------------------------
+
+@job_handler('email')
+def _send_email(payload):
+    send_mail(
+        payload['subject'],
+        payload['message'],
+        settings.DEFAULT_FROM_EMAIL,
+        payload['recipient_list'],
+        fail_silently=False,
+    )
+
+
+@job_handler('discord')
+def _send_discord(payload):
+    data = {
+        "username": "Work Wai D Borad",
+        "avatar_url": "https://cdn-icons-png.flaticon.com/512/2991/2991148.png",
+        "content": payload['content'],
+    }
+    response = requests.post(payload['webhook_url'], json=data, timeout=3)
+    response.raise_for_status()
+
+
+# ------------------------------------------
+# Execution
+# ------------------------------------------
+
+def retry_delay(attempts):
+    """Exponential backoff: 10s, 20s, 40s, ... (สูงสุด 1 ชั่วโมง)"""
+    return min(JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), 3600)
+
+
+def due_jobs(now=None):
+    """งานที่ถึงเวลารันแล้ว + งานที่ค้างสถานะ running นานเกินไป (Worker ตาย)"""
+    now = now or timezone.now()
+    return Job.objects.filter(
+        Q(status=Job.Status.PENDING, run_at__lte=now)
+        | Q(status=Job.Status.RUNNING, locked_at__lt=now - JOB_LOCK_TIMEOUT)
+    ).order_by('run_at', 'id')
+
+
+def run_job(job_id):
+    """
+    รันงาน 1 ชิ้น (claim ด้วย conditional UPDATE กันรันซ้ำข้ามโปรเซส)
+    คืนค่า seconds ที่ควรรอก่อน retry หรือ None ถ้าไม่ต้อง retry
+    """
+    now = timezone.now()
+    claimed = Job.objects.filter(
+        Q(status=Job.Status.PENDING) | Q(status=Job.Status.RUNNING, locked_at__lt=now - JOB_LOCK_TIMEOUT),
+        pk=job_id,
+        run_at__lte=now,
+    ).update(status=Job.Status.RUNNING, locked_at=now)
+    if not claimed:
+        return None
+
+    job = Job.objects.get(pk=job_id)
+    job.attempts += 1
+    try:
+        handler = _handlers[job.kind]
+        handler(job.payload)
+    except Exception as e:
+        job.last_error = f"{e}\n{traceback.format_exc()}"[:5000]
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+            delay = None
+            print(f"Job Error ({job.kind} #{job.pk}) gave up: {e}")
+        else:
+            job.status = Job.Status.PENDING
+            delay = retry_delay(job.attempts)
+            job.run_at = timezone.now() + timedelta(seconds=delay)
+            print(f"Job Error ({job.kind} #{job.pk}) retry in {delay}s: {e}")
+        job.save(update_fields=['attempts', 'status', 'run_at', 'locked_at', 'last_error', 'finished_at'])
+        return delay
+
+    job.status = Job.Status.DONE
+    job.locked_at = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=['attempts', 'status', 'locked_at', 'finished_at'])
+    return None
+
+
+class WorkerPool:
+    """Thread pool ขนาดจำกัด + จำกัดจำนวนงานที่รันพร้อมกันต่อ destination"""
+
+    def __init__(self, max_workers=JOB_WORKERS, retry_in_process=True):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='board-jobs')
+        self._retry_in_process = retry_in_process
+        self._cond = threading.Condition()
+        self._running = defaultdict(int)
+        self._waiting = defaultdict(deque)
+        self._outstanding = 0
+
+    def submit(self, job_id, destination):
+        with self._cond:
+            self._outstanding += 1
+            if self._running[destination] >= destination_limit(destination):
+                self._waiting[destination].append(job_id)
+                return
+            self._running[destination] += 1
+        self._executor.submit(self._run, job_id, destination)
+
+    def join(self):
+        """รอจนงานที่ส่งเข้ามาทั้งหมดรันเสร็จ (ไม่รวม retry ที่นัดไว้ภายหลัง)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._outstanding == 0)
+
+    def _run(self, job_id, destination):
+        try:
+            delay = run_job(job_id)
+            if delay is not None and self._retry_in_process:
+                timer = threading.Timer(delay, self.submit, args=(job_id, destination))
+                timer.daemon = True
+                timer.start()
+        except Exception as e:
+            print(f"Job Runner Error (#{job_id}): {e}")
+        finally:
+            close_old_connections()
+            next_id = None
+            with self._cond:
+                self._outstanding -= 1
+                if self._waiting[destination]:
+                    next_id = self._waiting[destination].popleft()
+                else:
+                    self._running[destination] -= 1
+                self._cond.notify_all()
+            if next_id is not None:
+                self._executor.submit(self._run, next_id, destination)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool
+
+
+def run_due_jobs(limit=100, pool=None):
+    """ดึงงานที่ถึงเวลาแล้วมารันทั้งชุด แล้วรอจนเสร็จ (ใช้โดย run_jobs) -> จำนวนงานที่ส่งรัน"""
+    now = timezone.now()
+    running = dict(
+        Job.objects.filter(status=Job.Status.RUNNING, locked_at__gte=now - JOB_LOCK_TIMEOUT)
+        .values('destination')
+        .annotate(total=Count('id'))
+        .values_list('destination', 'total')
+    )
+
+    pool = pool or WorkerPool(retry_in_process=False)
+    submitted = 0
+    for job_id, destination in due_jobs(now).values_list('id', 'destination')[:limit]:
+        # เคารพ limit ข้ามโปรเซสด้วย (งานที่โปรเซสอื่นกำลังรันอยู่ + งานที่รอบนี้ส่งไปแล้ว)
+        # ส่วนที่เกินรอรอบถัดไป -> รวมทุกโปรเซสแล้วรันพร้อมกันไม่เกิน limit
+        if running.get(destination, 0) >= destination_limit(destination):
+            continue
+        pool.submit(job_id, destination)
+        running[destination] = running.get(destination, 0) + 1
+        submitted += 1
+    pool.join()
+    return submitted
@@ -0,0 +1,154 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+from .permissions import board_member_ids
+
+# ==========================================
+# Board Live Updates (WebSocket)
+# ==========================================
+# ฝั่ง Server: signals.py / ordering.py เรียก publish() -> ส่งเข้า group "board_<id>" หลัง commit
+# ฝั่ง Consumer: BoardConsumer รวม event ที่เข้ามาในช่วง LIVE_TICK วินาที (coalesce) แล้วส่งเป็น frame เดียว
+#   -> ลากการ์ดรัว ๆ 20 ครั้งใน 0.1 วินาที client ได้ข้อความเดียว (เหลือสถานะล่าสุดของการ์ดแต่ละใบ)
+#
+# รูปแบบ event (compact, client นำไปแก้ DOM ได้ทันทีไม่ต้องโหลดบอร์ดใหม่):
+#   task.created / task.updated  {id, list_id, position, title, is_completed, is_archived, priority, due_date}
+#   task.moved                   {id, list_id, position}
+#   task.archived                {id, is_archived}
+#   task.deleted                 {id}
+#   list.tasks_reordered         {list_id, positions: {task_id: position}}
+#   list.reordered               {positions: {list_id: position}}
+#   list.updated / list.deleted  {id, title?, position?}
+#   board.changed                {}  (เปลี่ยนแบบ bulk -> client แสดงปุ่มโหลดใหม่)
+#   presence                     {users: [{id, username}]}
+
+LIVE_TICK = 0.1
+PRESENCE_TIMEOUT = 60 * 60
+
+
+def board_group(board_id):
+    return f"board_{board_id}"
+
+
+def publish(board_id, *events):
+    """ส่ง event ให้ทุก client ที่เปิดบอร์ดอยู่ (หลัง transaction commit เท่านั้น)"""
+    if board_id is None or not events:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    def send():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                board_group(board_id), {'type': 'board.events', 'events': list(events)},
+            )
+        except Exception as e:
+            print(f"Board Live Error: {e}")
+
+    transaction.on_commit(send)
+
+
+def event(kind, **data):
+    return {'type': kind, **data}
+
+
+def task_data(task):
+    return {
+        'id': task.pk,
+        'list_id': task.list_id,
+        'position': task.position,
+        'title': task.title,
+        'is_completed': task.is_completed,
+        'is_archived': task.is_archived,
+        'priority': task.priority,
+        'due_date': task.due_date.isoformat() if task.due_date else None,
+    }
+
+
+# ------------------------------------------
+# Coalescing (ใช้ใน BoardConsumer)
+# ------------------------------------------
+
+def _key(item):
+    kind = item['type']
+    if kind.startswith('task.'):
+        return ('task', item['id'])
+    if kind == 'list.tasks_reordered':
+        return ('list_tasks', item['list_id'])
+    if kind in ('list.updated', 'list.deleted'):
+        return ('list', item['id'])
+    return (kind,)
+
+
+def coalesce(pending, item):
+    """
+    รวม item เข้า pending (dict ตามลำดับ) โดยเก็บเฉพาะสถานะล่าสุดต่อ key
+    key ที่ถูกแก้จะย้ายไปท้ายสุด -> ลำดับใน frame ยังตรงกับลำดับการแก้ไขจริง
+    """
+    key = _key(item)
+    old = pending.pop(key, None)
+    if old is None or item['type'] in ('task.deleted', 'list.deleted', 'presence', 'board.changed'):
+        pending[key] = item
+        return
+
+    merged = {**old, **item}
+    if 'positions' in old and 'positions' in item:
+        merged['positions'] = {**old['positions'], **item['positions']}
+    if key[0] == 'task' and old['type'] != item['type']:
+        # สร้างแล้วแก้ต่อ -> ยังเป็นการ์ดใหม่ / ชนิดต่างกัน (ย้าย + เก็บ) -> updated ที่มีฟิลด์ของทั้งสองแบบ
+        merged['type'] = 'task.created' if old['type'] == 'task.created' else 'task.updated'
+    pending[key] = merged
+
+
+# ------------------------------------------
+# Presence (ใครเปิดบอร์ดนี้อยู่)
+# ------------------------------------------
+# นับจำนวนแท็บที่เปิดต่อ (บอร์ด, user) ด้วย cache.incr / decr (Redis = INCR/DECR, atomic)
+# -> เปิด/ปิดพร้อมกันหลายแท็บไม่ทับค่ากันเหมือน get -> แก้ -> set ทั้งก้อน
+# รายชื่อ = สมาชิกบอร์ด (cache ไว้แล้ว ดู permissions.py) ที่ตัวนับ > 0, อ่านด้วย get_many ครั้งเดียว
+
+def _presence_key(board_id, user_id):
+    return f"board_presence_{board_id}_{user_id}"
+
+
+def _presence_name_key(board_id, user_id):
+    return f"board_presence_name_{board_id}_{user_id}"
+
+
+def join_presence(board_id, user):
+    key = _presence_key(board_id, user.pk)
+    cache.add(key, 0, PRESENCE_TIMEOUT)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # หมดอายุระหว่าง add กับ incr
+        count = 0
+    if count < 1:
+        # ตัวนับหาย / ติดลบ (ปิดแท็บหลังค่าหมดอายุ) -> เริ่มนับใหม่จากแท็บนี้
+        cache.set(key, 1, PRESENCE_TIMEOUT)
+    else:
+        cache.touch(key, PRESENCE_TIMEOUT)
+    cache.set(_presence_name_key(board_id, user.pk), user.username, PRESENCE_TIMEOUT)
+    return presence_list(board_id)
+
+
+def leave_presence(board_id, user):
+    try:
+        cache.decr(_presence_key(board_id, user.pk))
+    except ValueError:  # หมดอายุไปแล้ว
+        pass
+    return presence_list(board_id)
+
+
+def presence_list(board_id):
+    user_ids = sorted(board_member_ids(board_id))
+    values = cache.get_many(
+        [_presence_key(board_id, user_id) for user_id in user_ids]
+        + [_presence_name_key(board_id, user_id) for user_id in user_ids]
+    )
+    return [
+        {'id': user_id, 'username': values.get(_presence_name_key(board_id, user_id), '')}
+        for user_id in user_ids
+        if values.get(_presence_key(board_id, user_id), 0) > 0
+    ]
@@ -0,0 +1,94 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# ตัวเลขความจุเทียบกันได้เฉพาะเมื่อรันบน backend เดียวกับ production (MySQL + Redis)
+# SQLite: ORM ทุกคำสั่ง (async หรือไม่) ไปรอคิวที่ DB thread เดียว / InMemoryChannelLayer: ไม่มี I/O ให้รอ
+PRODUCTION_DB_VENDORS = ('mysql', 'postgresql')
+
+
+class Command(BaseCommand):
+    help = 'ยิง request พร้อมกันไปที่ endpoint (เช่น /board/notifications/) เพื่อวัดความจุต่อ process ของ server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='URL เต็ม เช่น http://127.0.0.1:8000/board/notifications/')
+        parser.add_argument('--requests', type=int, default=1000, help='จำนวน request ทั้งหมด')
+        parser.add_argument('--concurrency', type=int, default=50, help='จำนวน request ที่ค้างพร้อมกัน')
+        parser.add_argument('--method', default='GET', choices=['GET', 'POST'])
+        parser.add_argument('--session', help='ค่า cookie sessionid ของผู้ใช้ที่ล็อกอินแล้ว')
+        parser.add_argument('--csrftoken', help='ค่า cookie csrftoken (จำเป็นสำหรับ POST)')
+        parser.add_argument('--data', action='append', default=[], help='ฟิลด์ POST แบบ key=value (ใส่ซ้ำได้)')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        concurrency = options['concurrency']
+        if total < 1 or concurrency < 1:
+            raise CommandError('--requests และ --concurrency ต้องมากกว่า 0')
+
+        cookies, headers = {}, {}
+        if options['session']:
+            cookies['sessionid'] = options['session']
+        if options['csrftoken']:
+            cookies['csrftoken'] = options['csrftoken']
+            headers['X-CSRFToken'] = options['csrftoken']
+        data = dict(item.split('=', 1) for item in options['data'])
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        def hit(_):
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    options['method'], options['url'], cookies=cookies, headers=headers,
+                    data=data or None, timeout=options['timeout'], allow_redirects=False,
+                )
+                status = response.status_code
+            except requests.RequestException:
+                status = None
+            return status, time.perf_counter() - started
+
+        self._write_backends()
+        self.stdout.write(f"⏳ ยิง {total} request (พร้อมกัน {concurrency}) -> {options['method']} {options['url']}")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(hit, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status is None or status >= 400)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(f"   เวลารวม   : {elapsed:.2f} s")
+        self.stdout.write(f"   ความจุ    : {total / elapsed:.1f} req/s")
+        self.stdout.write(
+            f"   latency   : เฉลี่ย {statistics.mean(latencies) * 1000:.0f} ms"
+            f" | p50 {percentile(0.50):.0f} ms | p95 {percentile(0.95):.0f} ms | p99 {percentile(0.99):.0f} ms"
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"⚠️ ผิดพลาด {errors} request (status >= 400 หรือเชื่อมต่อไม่ได้)"))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ ผ่านทุก request'))
+
+    def _write_backends(self):
+        # พิมพ์ backend ที่ settings ชุดนี้ใช้ (ควรเป็นชุดเดียวกับ server ที่ถูกยิง) -> แนบไปกับตัวเลขทุกครั้ง
+        cache_backend = getattr(settings, 'CACHES', {}).get('default', {}).get('BACKEND', '-')
+        layer_backend = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND', '-')
+        self.stdout.write(
+            f"🧩 backend   : db={connection.vendor} | cache={cache_backend.rsplit('.', 1)[-1]}"
+            f" | channel_layer={layer_backend.rsplit('.', 1)[-1]}"
+        )
+        if connection.vendor not in PRODUCTION_DB_VENDORS or 'InMemory' in layer_backend:
+            self.stdout.write(self.style.WARNING(
+                '⚠️ ไม่ใช่ backend แบบ production -> ใช้ดูแนวโน้มเท่านั้น ห้ามใช้ยืนยันความจุ (ให้วัดซ้ำบน MySQL + Redis)'
+            ))
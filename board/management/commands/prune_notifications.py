@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from board.retention import (
+    NOTIFICATION_ARCHIVE_DIR, NOTIFICATION_DIGEST_AFTER_DAYS, NOTIFICATION_READ_TTL_DAYS, RETENTION_BATCH_SIZE,
+    prune_notifications, retention_stats,
+)
+
+
+class Command(BaseCommand):
+    help = 'ลบแจ้งเตือนที่อ่านแล้วและหมดอายุ + รวบแจ้งเตือนซ้ำของงานเดียวกันเป็น digest (ลบทีละ batch)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--read-ttl-days', type=int, default=NOTIFICATION_READ_TTL_DAYS,
+                            help='ลบแจ้งเตือนที่อ่านแล้วและเก่ากว่ากี่วัน')
+        parser.add_argument('--digest-after-days', type=int, default=NOTIFICATION_DIGEST_AFTER_DAYS,
+                            help='รวบแจ้งเตือนของงานเดียวกันที่เก่ากว่ากี่วัน')
+        parser.add_argument('--no-digest', action='store_true', help='ไม่รวบ digest (ลบที่หมดอายุอย่างเดียว)')
+        parser.add_argument('--batch-size', type=int, default=RETENTION_BATCH_SIZE, help='จำนวนแถวที่ลบต่อ transaction')
+        parser.add_argument('--sleep', type=float, default=0, help='วินาทีที่พักระหว่าง batch (ลดภาระ DB ตอนกลางวัน)')
+        parser.add_argument('--archive-dir', default=NOTIFICATION_ARCHIVE_DIR,
+                            help='โฟลเดอร์เก็บไฟล์ archive (.ndjson.gz) ของแถวที่ลบ')
+        parser.add_argument('--dry-run', action='store_true', help='แสดงตัวเลขอย่างเดียว ไม่ลบ')
+
+    def handle(self, *args, **options):
+        if options['read_ttl_days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--read-ttl-days และ --batch-size ต้องมากกว่า 0')
+        digest_after_days = None if options['no_digest'] else options['digest_after_days']
+
+        if options['dry_run']:
+            stats = retention_stats(read_ttl_days=options['read_ttl_days'], digest_after_days=digest_after_days)
+            self.stdout.write(f"📊 แจ้งเตือนทั้งหมด            : {stats['total']}")
+            self.stdout.write(f"   อ่านแล้วเกิน {options['read_ttl_days']} วัน (ลบ)  : {stats['expired']}")
+            self.stdout.write(f"   digest ที่จะสร้าง            : {stats['digests']} (รวบ {stats['collapsed']} แถว)")
+            self.stdout.write(f"   คงเหลือหลังรัน               : {stats['remaining']}")
+            self.stdout.write(self.style.WARNING('(dry-run) ยังไม่ได้ลบข้อมูล'))
+            return
+
+        self.stdout.write("⏳ กำลังจัดการแจ้งเตือนเก่า...")
+        result = prune_notifications(
+            read_ttl_days=options['read_ttl_days'],
+            digest_after_days=digest_after_days,
+            batch_size=options['batch_size'],
+            archive_dir=options['archive_dir'],
+            pause=options['sleep'],
+        )
+        if result['archive']:
+            self.stdout.write(f"🗄️ archive: {result['archive']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ ลบที่หมดอายุ {result['expired']} แถว, สร้าง digest {result['digests']} รายการ (รวบ {result['collapsed']} แถว)"
+        ))
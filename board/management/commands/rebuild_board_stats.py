@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from board.models import Board
+from board.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'สร้างตารางสถิติรายวัน (BoardDailyStats) ใหม่จากข้อมูล Task จริง'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', type=int, action='append', help='เฉพาะบอร์ดนี้ (ใส่ซ้ำได้)')
+        parser.add_argument('--days', type=int, help='สร้างใหม่เฉพาะย้อนหลังกี่วัน (ไม่ใส่ = ทั้งหมด)')
+        parser.add_argument('--batch-size', type=int, default=200, help='จำนวนบอร์ดต่อรอบ')
+
+    def handle(self, *args, **options):
+        boards = Board.objects.order_by('id')
+        if options['board']:
+            boards = boards.filter(id__in=options['board'])
+        board_ids = list(boards.values_list('id', flat=True))
+        since = timezone.localdate() - timedelta(days=options['days'] - 1) if options['days'] else None
+
+        self.stdout.write(f"⏳ กำลังสร้างสถิติรายวันของ {len(board_ids)} บอร์ด...")
+        total = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(board_ids), batch_size):
+            total += rebuild(board_ids[start:start + batch_size], since=since)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ สร้างสถิติเสร็จแล้ว {total} แถว'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from board.models import SearchDocument
+from board.search import INDEX_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'สร้างดัชนีค้นหา (SearchDocument / SearchToken) ใหม่จากข้อมูลจริง'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', action='append', choices=SearchDocument.Kind.values,
+            help='เฉพาะประเภทนี้ (ใส่ซ้ำได้, ไม่ใส่ = ทั้งหมด)',
+        )
+        parser.add_argument('--batch-size', type=int, default=INDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or SearchDocument.Kind.values:
+            self.stdout.write(f"⏳ กำลังสร้างดัชนีค้นหา: {kind}...")
+            total = rebuild_index(kind, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'✅ {kind}: index แล้ว {total} รายการ'))
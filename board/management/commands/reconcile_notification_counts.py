@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from users.models import User
+from board.models import NotificationCounter
+from board.notifications import count_unread
+
+
+class Command(BaseCommand):
+    help = 'ปรับตัวนับแจ้งเตือนที่ยังไม่อ่าน (NotificationCounter) ให้ตรงกับข้อมูลจริง'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='ตรวจเฉพาะ User ID ที่ระบุ (ใส่ซ้ำได้)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='แสดงผลอย่างเดียว ไม่บันทึก')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        users = User.objects.order_by('id')
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+        user_ids = list(users.values_list('id', flat=True))
+
+        fixed = 0
+        self.stdout.write(f"⏳ กำลังตรวจสอบตัวนับของ {len(user_ids)} ผู้ใช้...")
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            actual = count_unread(batch)
+            stored = dict(
+                NotificationCounter.objects.filter(user_id__in=batch).values_list('user_id', 'unread_count')
+            )
+
+            to_update, to_create = [], []
+            for user_id in batch:
+                real = actual.get(user_id, 0)
+                if stored.get(user_id) == real:
+                    continue
+                self.stdout.write(f"🔧 User {user_id}: {stored.get(user_id)} -> {real}")
+                counter = NotificationCounter(user_id=user_id, unread_count=real)
+                (to_update if user_id in stored else to_create).append(counter)
+
+            fixed += len(to_update) + len(to_create)
+            if not dry_run:
+                NotificationCounter.objects.bulk_update(to_update, ['unread_count'])
+                NotificationCounter.objects.bulk_create(to_create, ignore_conflicts=True)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'(dry-run) พบตัวนับที่ไม่ตรง {fixed} รายการ'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ ปรับตัวนับแล้ว {fixed} รายการ'))
@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from board.jobs import WorkerPool, run_due_jobs, JOB_WORKERS
+from board.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Worker สำหรับรันงานเบื้องหลัง (Email / Discord) ที่ค้างอยู่ในตาราง Job'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='รันงานที่ถึงเวลาแล้วรอบเดียวแล้วจบ')
+        parser.add_argument('--interval', type=float, default=2.0, help='วินาทีที่รอระหว่างรอบ (เมื่อไม่มีงาน)')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=JOB_WORKERS)
+        parser.add_argument('--keep-days', type=int, default=7, help='ลบงานที่เสร็จแล้วเก่ากว่ากี่วัน')
+
+    def handle(self, *args, **options):
+        pool = WorkerPool(max_workers=options['workers'], retry_in_process=False)
+        last_purge = None
+        self.stdout.write("⏳ เริ่ม Job Worker...")
+
+        try:
+            while True:
+                count = run_due_jobs(limit=options['batch_size'], pool=pool)
+                if count:
+                    self.stdout.write(f"🔔 รันงานไป {count} รายการ")
+
+                if options['once']:
+                    break
+                if count < options['batch_size']:
+                    # ล้างงานเก่าชั่วโมงละครั้งพอ
+                    if last_purge is None or time.monotonic() - last_purge > 3600:
+                        self._purge_done(options['keep_days'])
+                        last_purge = time.monotonic()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('✅ Job Worker หยุดทำงาน'))
+
+    def _purge_done(self, keep_days):
+        cutoff = timezone.now() - timedelta(days=keep_days)
+        Job.objects.filter(status=Job.Status.DONE, finished_at__lt=cutoff).delete()
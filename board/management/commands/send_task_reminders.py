@@ -1,118 +1,36 @@
+import time
+
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta, datetime
-from board.models import Task, Notification
-from django.core.mail import send_mail
-from django.conf import settings
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-import requests 
+
+from board.jobs import JOB_RUN_IN_PROCESS, get_pool
+from board.reminders import REMINDER_BATCH_SIZE, send_due_reminders
+
 
 class Command(BaseCommand):
     help = 'ส่งแจ้งเตือนงานที่ใกล้ถึงกำหนด (Web, Email, Discord)'
 
-    def handle(self, *args, **kwargs):
-        today = timezone.now().date()
-        
-        tasks = Task.objects.filter(
-            is_completed=False, 
-            due_date__isnull=False, 
-            is_reminded=False
-        )
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='รันค้างไว้ ตรวจสอบทุก --interval วินาที')
+        parser.add_argument('--interval', type=float, default=60.0, help='วินาทีที่รอระหว่างรอบ (ใช้กับ --loop)')
+        parser.add_argument('--batch-size', type=int, default=REMINDER_BATCH_SIZE)
 
-        count = 0
+    def handle(self, *args, **options):
         self.stdout.write("⏳ กำลังตรวจสอบงานที่ต้องแจ้งเตือน...")
 
-        for task in tasks:
-            if task.remind_days == 0: continue 
-
-            task_due_date = task.due_date
-            if isinstance(task_due_date, datetime):
-                task_due_date = task_due_date.date()
-
-            reminder_date = task_due_date - timedelta(days=task.remind_days)
-
-            if today >= reminder_date:
-                
-                self.stdout.write(f"🔔 กำลังแจ้งเตือนงาน: {task.title}")
-                
-                assignees = task.assigned_to.all()
-                if not assignees: continue
-
-                channel_layer = get_channel_layer()
-
-                for user in assignees:
-                    # ----------------------------------------
-                    # A. แจ้งเตือน Web (Real-time) + DB
-                    # ----------------------------------------
-                    try:
-                       
-                        Notification.objects.create(
-                            recipient=user,
-                            actor=task.list.board.created_by, 
-                            task=task,
-                            message=f"⏳ เตือนความจำ! งาน '{task.title}' ครบกำหนดในอีก {task.remind_days} วัน"
-                        )
-                        
-                        unread_count = Notification.objects.filter(recipient=user, is_read=False).count()
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{user.id}",
-                            {
-                                "type": "send_notification",
-                                "message": f"⏳ ใกล้ครบกำหนด! '{task.title}'",
-                                "unread_count": unread_count
-                            }
-                        )
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Web/DB Error: {e}"))
-
-                    # ----------------------------------------
-                    # B. แจ้งเตือน Email (Gmail)
-                    # ----------------------------------------
-                    if user.email:
-                        try:
-                            formatted_date = task.due_date.strftime('%d/%m/%Y')
-                            send_mail(
-                                subject=f"แจ้งเตือนงานใกล้ครบกำหนด: {task.title}",
-                                message=(
-                                    f"สวัสดีคุณ {user.username},\n\n"
-                                    f"งาน '{task.title}' จะครบกำหนดในวันที่ {formatted_date}\n"
-                                    f"(เหลือเวลาอีก {task.remind_days} วัน)\n\n"
-                                    f"กรุณาตรวจสอบสถานะงานของคุณ\n\n"
-                                    f"ขอบคุณครับ,\nทีมงาน Work Wai D"
-                                ),
-                                from_email=settings.EMAIL_HOST_USER,
-                                recipient_list=[user.email],
-                                fail_silently=True,
-                            )
-                        except Exception as e:
-                            self.stdout.write(self.style.ERROR(f"Email Error: {e}"))
-
-                # ----------------------------------------
-                # C. แจ้งเตือน Discord
-                # ----------------------------------------
-                webhook_url = task.list.board.discord_webhook_url
-                if webhook_url:
-                    assignee_names = ", ".join([u.username for u in assignees])
-                    formatted_date = task.due_date.strftime('%d/%m/%Y')
-                    
-                    discord_msg = {
-                        "content": (
-                            f"⚠️ **Upcoming Deadline Warning!**\n"
-                            f"**Task:** {task.title}\n"
-                            f"**Due Date:** {formatted_date}\n"
-                            f"**Remaining:** {task.remind_days} Days\n"
-                            f"**Team:** {assignee_names}\n"
-                            f"---------------------------------"
-                        )
-                    }
-                    try:
-                        requests.post(webhook_url, json=discord_msg)
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Discord Error: {e}"))
-
-                task.is_reminded = True
-                task.save()
-                count += 1
-
-        self.stdout.write(self.style.SUCCESS(f'✅ ส่งแจ้งเตือนสำเร็จทั้งหมด {count} รายการ'))
\ No newline at end of file
+        try:
+            while True:
+                count = send_due_reminders(
+                    batch_size=options['batch_size'],
+                    on_task=lambda task: self.stdout.write(f"🔔 กำลังแจ้งเตือนงาน: {task.title}"),
+                )
+                if count or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f'✅ ส่งแจ้งเตือนสำเร็จทั้งหมด {count} รายการ'))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        # รอให้ Email / Discord ที่เข้าคิวไว้ส่งออกไปก่อนจบโปรเซส (ที่ส่งไม่สำเร็จ run_jobs จะ retry ต่อ)
+        if JOB_RUN_IN_PROCESS:
+            get_pool().join()
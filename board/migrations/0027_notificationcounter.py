@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_counters(apps, schema_editor):
+    Notification = apps.get_model('board', 'Notification')
+    NotificationCounter = apps.get_model('board', 'NotificationCounter')
+    rows = (
+        Notification.objects.filter(is_read=False)
+        .values('recipient_id')
+        .annotate(total=Count('id'))
+    )
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row['recipient_id'], unread_count=row['total']) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0026_task_created_by'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+POSITION_GAP = 1024
+
+
+def respace_positions(apps, schema_editor):
+    """จัด position ของ List / Task ที่มีอยู่ให้ห่างกันทีละ POSITION_GAP (คงลำดับเดิม)"""
+    List = apps.get_model('board', 'List')
+    Task = apps.get_model('board', 'Task')
+
+    def respace(queryset, group_field):
+        changed = []
+        current_group, index = None, 0
+        for obj in queryset.order_by(group_field, 'position', 'id').iterator(chunk_size=2000):
+            group = getattr(obj, group_field)
+            if group != current_group:
+                current_group, index = group, 0
+            index += 1
+            if obj.position != index * POSITION_GAP:
+                obj.position = index * POSITION_GAP
+                changed.append(obj)
+            if len(changed) >= 1000:
+                queryset.model.objects.bulk_update(changed, ['position'])
+                changed = []
+        if changed:
+            queryset.model.objects.bulk_update(changed, ['position'])
+
+    respace(List.objects.only('id', 'board_id', 'position'), 'board_id')
+    respace(Task.objects.only('id', 'list_id', 'position'), 'list_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0028_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(respace_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0029_gap_positions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['board', '-created_at'], name='activity_board_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classschedule',
+            index=models.Index(fields=['user', 'day', 'start_time'], name='schedule_user_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'is_read', '-created_at'], name='notif_recipient_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at'], name='notif_recipient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', 'is_archived', 'position'], name='task_list_archived_pos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['is_completed', 'is_reminded', 'due_date'], name='task_reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:22
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_remind_at(apps, schema_editor):
+    """คำนวณ remind_at ให้งานเดิมที่ยังรอแจ้งเตือน (ตรรกะเดียวกับ Task.compute_remind_at)"""
+    Task = apps.get_model('board', 'Task')
+    pending = Task.objects.filter(
+        is_completed=False, is_reminded=False, due_date__isnull=False,
+    ).exclude(remind_days=0).only('id', 'due_date', 'remind_days')
+
+    batch = []
+    for task in pending.iterator(chunk_size=2000):
+        due_day = timezone.localtime(task.due_date).date()
+        remind_day = due_day - timedelta(days=task.remind_days)
+        task.remind_at = timezone.make_aware(datetime.combine(remind_day, time.min))
+        batch.append(task)
+        if len(batch) >= 1000:
+            Task.objects.bulk_update(batch, ['remind_at'])
+            batch = []
+    if batch:
+        Task.objects.bulk_update(batch, ['remind_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0030_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='remind_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_remind_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0032_googlecalendarsync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('completed_high', models.IntegerField(default=0)),
+                ('completed_medium', models.IntegerField(default=0)),
+                ('completed_low', models.IntegerField(default=0)),
+                ('assignee_completed', models.JSONField(blank=True, default=dict)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='board.board')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('board', 'date'), name='unique_board_daily_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0035_activity_actor_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='from_list',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='board.list'),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='task',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activities', to='board.task'),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='to_list',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='board.list'),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='verb',
+            field=models.CharField(blank=True, choices=[('task.created', 'สร้างการ์ด'), ('task.moved', 'ย้ายการ์ด'), ('board.left', 'ออกจากบอร์ด')], max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='activitylog',
+            name='action',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['board', 'verb', 'created_at'], name='activity_board_verb_idx'),
+        ),
+    ]
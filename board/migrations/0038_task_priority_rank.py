@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+# ตรงกับ Task.PRIORITY_RANK (คัดลอกไว้ เพราะ migration ไม่ควร import ค่าจาก models ปัจจุบัน)
+PRIORITY_RANK = {'low': 1, 'medium': 2, 'high': 3}
+
+
+def fill_priority_rank(apps, schema_editor):
+    """เติม priority_rank ให้งานเดิม (UPDATE ทีละค่า priority, แถวที่ไม่รู้จักเป็น 0)"""
+    Task = apps.get_model('board', 'Task')
+    for priority, rank in PRIORITY_RANK.items():
+        Task.objects.filter(priority=priority).update(priority_rank=rank)
+    Task.objects.exclude(priority__in=list(PRIORITY_RANK)).update(priority_rank=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0037_notification_digest_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.RunPython(fill_priority_rank, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['is_completed', 'is_archived', 'due_date', '-priority_rank'], name='task_open_due_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', 'is_completed', 'due_date', '-priority_rank'], name='task_list_done_due_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0038_task_priority_rank'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', 'is_archived', 'due_date'], name='task_list_due_idx'),
+        ),
+    ]
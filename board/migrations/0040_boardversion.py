@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_versions(apps, schema_editor):
+    Board = apps.get_model('board', 'Board')
+    BoardVersion = apps.get_model('board', 'BoardVersion')
+    BoardVersion.objects.bulk_create(
+        [BoardVersion(board_id=board_id) for board_id in Board.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0039_task_calendar_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardVersion',
+            fields=[
+                ('board', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='version_row', serialize=False, to='board.board')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
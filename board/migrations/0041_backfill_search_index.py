@@ -0,0 +1,106 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:02
+
+from collections import Counter
+
+from django.db import migrations
+
+# ตรงกับค่าใน search.py (คัดลอกไว้ เพราะ migration ไม่ควรขึ้นกับ models ปัจจุบัน)
+TITLE_WEIGHT = 5
+BODY_WEIGHT = 1
+MAX_TOKEN_WEIGHT = 100
+BATCH_SIZE = 500
+
+
+def _weighted_tokens(fields):
+    # ใช้ตัวตัดคำตัวเดียวกับตอนค้นหา (ฟังก์ชันล้วน ไม่แตะ model) -> token ตรงกันแน่นอน
+    from board.search import tokenize
+
+    counts = Counter()
+    for text, weight in fields:
+        for token in tokenize(text):
+            counts[token] += weight
+    return {token: min(weight, MAX_TOKEN_WEIGHT) for token, weight in counts.items()}
+
+
+def _board_rows(apps, ids):
+    Board = apps.get_model('board', 'Board')
+    for row in Board.objects.filter(id__in=ids).values('id', 'name', 'description'):
+        yield row['id'], row['id'], None, row['name'], row['description'], [
+            (row['name'], TITLE_WEIGHT), (row['description'], BODY_WEIGHT),
+        ]
+
+
+def _task_rows(apps, ids):
+    Task = apps.get_model('board', 'Task')
+    for row in Task.objects.filter(id__in=ids).values('id', 'title', 'description', 'list__board_id'):
+        yield row['id'], row['list__board_id'], row['id'], row['title'], row['description'], [
+            (row['title'], TITLE_WEIGHT), (row['description'], BODY_WEIGHT),
+        ]
+
+
+def _child_rows(model_name):
+    def rows(apps, ids):
+        model = apps.get_model('board', model_name)
+        for row in model.objects.filter(id__in=ids).values('id', 'content', 'task_id', 'task__title', 'task__list__board_id'):
+            yield row['id'], row['task__list__board_id'], row['task_id'], row['task__title'], row['content'], [
+                (row['content'], BODY_WEIGHT),
+            ]
+    return rows
+
+
+SOURCES = [
+    ('board', 'Board', _board_rows),
+    ('task', 'Task', _task_rows),
+    ('comment', 'Comment', _child_rows('Comment')),
+    ('checklist', 'ChecklistItem', _child_rows('ChecklistItem')),
+]
+
+
+def backfill_search_index(apps, schema_editor):
+    """
+    0034 สร้างตารางดัชนีเปล่า -> ข้อมูลเดิมค้นไม่เจอจนกว่าจะรัน rebuild_search_index
+    เติมดัชนีให้ทุกแถวที่ยังไม่มีเอกสาร (แถวที่ signal index ไปแล้วข้ามไป) ทีละ batch ตาม pk
+    """
+    SearchDocument = apps.get_model('board', 'SearchDocument')
+    SearchToken = apps.get_model('board', 'SearchToken')
+
+    for kind, model_name, build_rows in SOURCES:
+        model = apps.get_model('board', model_name)
+        indexed = SearchDocument.objects.filter(kind=kind).values('object_id')
+        pending = model.objects.exclude(id__in=indexed).order_by('id').values_list('id', flat=True)
+        last_pk = 0
+        while True:
+            ids = list(pending.filter(id__gt=last_pk)[:BATCH_SIZE])
+            if not ids:
+                break
+            last_pk = ids[-1]
+
+            rows = list(build_rows(apps, ids))
+            SearchDocument.objects.bulk_create([
+                SearchDocument(kind=kind, object_id=object_id, board_id=board_id, task_id=task_id,
+                               title=(title or '')[:255], snippet=(snippet or '')[:255])
+                for object_id, board_id, task_id, title, snippet, _ in rows
+            ])
+            # MySQL ไม่คืน pk จาก bulk_create -> ดึง id กลับมาด้วย (kind, object_id)
+            document_ids = dict(
+                SearchDocument.objects.filter(kind=kind, object_id__in=ids).values_list('object_id', 'id')
+            )
+            SearchToken.objects.bulk_create(
+                [
+                    SearchToken(document_id=document_ids[object_id], token=token, weight=weight)
+                    for object_id, _, _, _, _, fields in rows
+                    for token, weight in _weighted_tokens(fields).items()
+                ],
+                batch_size=1000,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0040_boardversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
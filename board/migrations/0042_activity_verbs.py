@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:36
+
+import re
+
+from django.db import migrations, models
+
+# ข้อความของ log แบบเก่า (ก่อนมี verb) -> verb + ชื่อใน payload (ตรงกับ activity.VERB_TEMPLATES ณ ตอนนั้น)
+LEGACY_PATTERNS = [
+    ('task.created', re.compile(r"^สร้างการ์ด '(?P<task>.*)' ในรายการ '(?P<to_list>.*)'$", re.S)),
+    ('task.moved', re.compile(r"^ย้ายการ์ด '(?P<task>.*)' จาก '(?P<from_list>.*)' ไปยัง '(?P<to_list>.*)'$", re.S)),
+    ('board.left', re.compile(r"^ได้ออกจากบอร์ด '(?P<board>.*)'$", re.S)),
+]
+BATCH_SIZE = 1000
+
+
+def parse_legacy_actions(apps, schema_editor):
+    """
+    log เก่ามีแค่ข้อความใน action (verb ว่าง) -> รายงานกิจกรรมที่นับตาม verb ไม่เห็น
+    แกะข้อความที่รู้จักเป็น verb + payload (ที่แกะไม่ได้คงไว้เป็นข้อความเดิม)
+    """
+    ActivityLog = apps.get_model('board', 'ActivityLog')
+    pending = []
+    for entry in ActivityLog.objects.filter(verb='').only('id', 'action', 'payload').iterator(chunk_size=BATCH_SIZE):
+        for verb, pattern in LEGACY_PATTERNS:
+            match = pattern.match(entry.action)
+            if match:
+                entry.verb = verb
+                entry.payload = {**match.groupdict(), **(entry.payload or {})}
+                pending.append(entry)
+                break
+        if len(pending) >= BATCH_SIZE:
+            ActivityLog.objects.bulk_update(pending, ['verb', 'payload'])
+            pending = []
+    if pending:
+        ActivityLog.objects.bulk_update(pending, ['verb', 'payload'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0041_backfill_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='verb',
+            field=models.CharField(blank=True, choices=[('task.created', 'สร้างการ์ด'), ('task.moved', 'ย้ายการ์ด'), ('task.updated', 'แก้ไขการ์ด'), ('task.completed', 'ทำการ์ดเสร็จ'), ('task.reopened', 'ยกเลิกสถานะเสร็จ'), ('task.assigned', 'มอบหมายงาน'), ('task.unassigned', 'ถอนผู้รับผิดชอบ'), ('comment.added', 'แสดงความคิดเห็น'), ('member.joined', 'เข้าร่วมบอร์ด'), ('member.removed', 'นำสมาชิกออก'), ('board.left', 'ออกจากบอร์ด')], max_length=32),
+        ),
+        migrations.RunPython(parse_legacy_actions, migrations.RunPython.noop),
+    ]
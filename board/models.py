@@ -3,7 +3,10 @@ from users.models import User
 from django.conf import settings
 import os
 from django.utils import timezone  
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+
+# ฟิลด์ที่มีผลกับ Task.remind_at (save(update_fields=...) ที่แตะฟิลด์พวกนี้ต้องอัปเดต remind_at ด้วย)
+REMIND_FIELDS = {'is_completed', 'is_reminded', 'due_date', 'remind_days'}
 
 COLOR_CHOICES = [
     ('bg-red-500', 'สีแดง (Red)'),
@@ -79,6 +82,13 @@ class Task(models.Model):
         LOW = "low", "Low"
         MEDIUM = "medium", "Medium"
         HIGH = "high", "High"
+
+    # priority -> ลำดับตัวเลข (มาก = สำคัญกว่า) เก็บไว้ในคอลัมน์ priority_rank เพื่อเรียง / นับผ่าน index
+    PRIORITY_RANK = {
+        Priority.LOW: 1,
+        Priority.MEDIUM: 2,
+        Priority.HIGH: 3,
+    }
  
     list = models.ForeignKey('List', on_delete=models.CASCADE, related_name="tasks") 
     # ผู้สร้างงาน (optional) - บางจุดในโค้ดอ้างถึง task.created_by
@@ -93,7 +103,29 @@ class Task(models.Model):
             self.completed_at = timezone.now()
         elif not self.is_completed:
             self.completed_at = None
+
+        # คำนวณเวลาที่ต้องแจ้งเตือนใหม่ทุกครั้งที่บันทึก (send_task_reminders อ่านจากคอลัมน์นี้)
+        self.remind_at = self.compute_remind_at()
+        self.priority_rank = self.PRIORITY_RANK.get(self.priority, 0)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            if REMIND_FIELDS.intersection(update_fields):
+                update_fields = set(update_fields) | {'remind_at'}
+            if 'priority' in update_fields:
+                update_fields = set(update_fields) | {'priority_rank'}
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
+
+    def compute_remind_at(self):
+        """
+        เวลาที่ต้องแจ้งเตือน = ต้นวันของ (due_date - remind_days)
+        None = ไม่ต้องแจ้งเตือน (เสร็จแล้ว / แจ้งไปแล้ว / ไม่มีกำหนดส่ง / ปิดแจ้งเตือน)
+        """
+        if self.is_completed or self.is_reminded or not self.due_date or not self.remind_days:
+            return None
+        due_day = timezone.localtime(self.due_date).date() if timezone.is_aware(self.due_date) else self.due_date.date()
+        remind_day = due_day - timedelta(days=self.remind_days)
+        return timezone.make_aware(datetime.combine(remind_day, time.min))
         
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
@@ -125,8 +157,11 @@ class Task(models.Model):
         choices=Priority.choices,
         default=Priority.MEDIUM,
     )
+    # ตามค่า priority เสมอ (คำนวณใน save(); ค่า default ตรงกับ MEDIUM สำหรับ bulk_create)
+    priority_rank = models.PositiveSmallIntegerField(default=2, editable=False)
 
     is_reminded = models.BooleanField(default=False)# แจ้งเตือนแล้วหรือยัง (สำหรับระบบแจ้งเตือน)
+    remind_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)  # คำนวณจาก due_date - remind_days (ดู compute_remind_at)
     created_at = models.DateTimeField(auto_now_add=True)
     
    
@@ -136,6 +171,18 @@ class Task(models.Model):
 
     class Meta:
         ordering = ['position']
+        indexes = [
+            # การ์ดในลิสต์ (ไม่รวมที่เก็บถาวร) เรียงตาม position -> board_detail / snapshot
+            models.Index(fields=['list', 'is_archived', 'position'], name='task_list_archived_pos_idx'),
+            # งานที่ยังไม่เสร็จ + ยังไม่แจ้งเตือน ไล่ตาม due_date -> send_task_reminders
+            models.Index(fields=['is_completed', 'is_reminded', 'due_date'], name='task_reminder_due_idx'),
+            # งานค้าง เรียงกำหนดส่ง -> priority สูงก่อน -> My Tasks ของ Dashboard
+            models.Index(fields=['is_completed', 'is_archived', 'due_date', '-priority_rank'], name='task_open_due_rank_idx'),
+            # งานของบอร์ด (ผ่าน list) แยกตามสถานะเสร็จ -> รายงาน: นับตาม priority / รายการงานค้างเรียงกำหนดส่ง
+            models.Index(fields=['list', 'is_completed', 'due_date', '-priority_rank'], name='task_list_done_due_rank_idx'),
+            # งานของบอร์ดในช่วงวันที่ (ไม่รวมที่เก็บถาวร) -> ปฏิทิน (api_calendar_events)
+            models.Index(fields=['list', 'is_archived', 'due_date'], name='task_list_due_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
@@ -219,22 +266,75 @@ class Notification(models.Model):
     board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='notifications', null=True, blank=True)
     message = models.CharField(max_length=255) # ข้อความแจ้งเตือน
     is_read = models.BooleanField(default=False) # อ่านหรือยัง
+    digest_count = models.PositiveIntegerField(default=1)  # แถวนี้แทนแจ้งเตือนกี่รายการ (> 1 = ถูกรวบเป็น digest, ดู retention.py)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at'] # ใหม่สุดขึ้นก่อน
+        indexes = [
+            # ยังไม่อ่านของผู้รับ (mark all read / นับ unread)
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='notif_recipient_read_idx'),
+            # แจ้งเตือนล่าสุดของผู้รับ (dropdown กระดิ่ง)
+            models.Index(fields=['recipient', '-created_at'], name='notif_recipient_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.actor.username} -> {self.recipient.username}: {self.message}"
 
+class NotificationCounter(models.Model):
+    # ตัวนับแจ้งเตือนที่ยังไม่อ่าน (เก็บแยกไว้ จะได้ไม่ต้อง COUNT(*) ทุกครั้ง)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.unread_count} unread"
+
+class BoardVersion(models.Model):
+    # เลข version ของข้อมูลบอร์ด (เพิ่มทุกครั้งที่การ์ด/ลิสต์/สมาชิกเปลี่ยน ดู snapshot.bump_board_version)
+    # เก็บแยกจาก Board -> board.save() ที่ถือ instance เก่าไว้จะไม่เขียนทับเลขที่ process อื่นเพิ่งเพิ่ม
+    board = models.OneToOneField(Board, on_delete=models.CASCADE, primary_key=True, related_name='version_row')
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.board_id}: v{self.version}"
+
 class ActivityLog(models.Model):
+    # เก็บเป็นเหตุการณ์แบบมีโครงสร้าง แล้วค่อยแปลงเป็นข้อความตอนแสดงผล (ดู activity.py)
+    class Verb(models.TextChoices):
+        TASK_CREATED = 'task.created', 'สร้างการ์ด'
+        TASK_MOVED = 'task.moved', 'ย้ายการ์ด'
+        TASK_UPDATED = 'task.updated', 'แก้ไขการ์ด'
+        TASK_COMPLETED = 'task.completed', 'ทำการ์ดเสร็จ'
+        TASK_REOPENED = 'task.reopened', 'ยกเลิกสถานะเสร็จ'
+        TASK_ASSIGNED = 'task.assigned', 'มอบหมายงาน'
+        TASK_UNASSIGNED = 'task.unassigned', 'ถอนผู้รับผิดชอบ'
+        COMMENT_ADDED = 'comment.added', 'แสดงความคิดเห็น'
+        MEMBER_JOINED = 'member.joined', 'เข้าร่วมบอร์ด'
+        MEMBER_REMOVED = 'member.removed', 'นำสมาชิกออก'
+        BOARD_LEFT = 'board.left', 'ออกจากบอร์ด'
+
     board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='activities')
     actor = models.ForeignKey(User, on_delete=models.CASCADE)
-    action = models.CharField(max_length=255)  # เช่น "สร้างการ์ด 'ออกแบบ Logo'"
+    verb = models.CharField(max_length=32, choices=Verb.choices, blank=True)  # ว่าง = log แบบเก่า (มีแค่ action)
+    task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True, blank=True, related_name='activities')
+    from_list = models.ForeignKey(List, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    to_list = models.ForeignKey(List, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    payload = models.JSONField(default=dict, blank=True)  # ชื่อ ณ ตอนเกิดเหตุการณ์ (ใช้แสดงผลถ้าการ์ด/รายการถูกลบไปแล้ว)
+    action = models.CharField(max_length=255, blank=True)  # ข้อความสำเร็จรูปของ log แบบเก่า
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Activity ล่าสุดของบอร์ด
+            models.Index(fields=['board', '-created_at'], name='activity_board_created_idx'),
+            # กรองตามผู้กระทำในหน้าประวัติ / export
+            models.Index(fields=['board', 'actor', '-created_at'], name='activity_board_actor_idx'),
+            # รายงาน: นับตามชนิดเหตุการณ์ในช่วงเวลา (เช่น การย้ายการ์ดต่อรายการ / ต่อคน)
+            models.Index(fields=['board', 'verb', 'created_at'], name='activity_board_verb_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.actor.username} - {self.action}"
+        return f"{self.actor.username} - {self.verb or self.action}"
 
 class ClassSchedule(models.Model):
     DAYS = [
@@ -254,5 +354,121 @@ class ClassSchedule(models.Model):
     # ถ้าดึงมาจาก Google Calendar อาจจะเก็บ Event ID ไว้
     google_event_id = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # ตารางเรียนของ user เรียงตามวัน/เวลา
+            models.Index(fields=['user', 'day', 'start_time'], name='schedule_user_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject_name} ({self.day})"
+
+
+class BoardDailyStats(models.Model):
+    # สถิติรายวันของบอร์ด (rollup) -> กราฟแนวโน้มย้อนหลังยาว ๆ ไม่ต้องนับจากตาราง Task ทุกครั้ง
+    # อัปเดตทีละนิดจาก signal ของ Task (ดู stats.py) และสร้างใหม่ได้ด้วย `python manage.py rebuild_board_stats`
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    created = models.IntegerField(default=0)    # งานที่สร้างวันนี้
+    completed = models.IntegerField(default=0)  # งานที่ทำเสร็จวันนี้
+    overdue = models.IntegerField(default=0)    # งานที่ครบกำหนดวันนี้แต่ยังไม่เสร็จ
+    completed_high = models.IntegerField(default=0)
+    completed_medium = models.IntegerField(default=0)
+    completed_low = models.IntegerField(default=0)
+    assignee_completed = models.JSONField(default=dict, blank=True)  # {user_id: จำนวนงานที่เสร็จวันนี้}
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'date'], name='unique_board_daily_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.board.name} {self.date}: +{self.created} / ✓{self.completed}"
+
+
+class GoogleCalendarSync(models.Model):
+    # สถานะการ Sync ของแต่ละปฏิทิน Google (เก็บ syncToken ไว้ดึงเฉพาะส่วนที่เปลี่ยนในรอบถัดไป)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='google_calendar_syncs')
+    calendar_id = models.CharField(max_length=255)
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='google_calendar_syncs')
+    sync_token = models.TextField(blank=True, default='')
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'calendar_id'], name='unique_google_calendar_sync'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.calendar_id} -> {self.board.name}"
+
+
+class SearchDocument(models.Model):
+    # 1 แถวต่อ 1 สิ่งที่ค้นหาได้ (บอร์ด / งาน / คอมเมนต์ / เช็คลิสต์) พร้อมข้อความที่ใช้แสดงผล
+    # ดัชนีคำอยู่ใน SearchToken (ดู search.py) -> ค้นหาได้ทั้ง MySQL และ SQLite
+    class Kind(models.TextChoices):
+        BOARD = "board", "Board"
+        TASK = "task", "Task"
+        COMMENT = "comment", "Comment"
+        CHECKLIST = "checklist", "Checklist Item"
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.PositiveIntegerField()
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='search_documents')
+    task = models.ForeignKey('Task', on_delete=models.CASCADE, null=True, blank=True, related_name='search_documents')
+    title = models.CharField(max_length=255)
+    snippet = models.CharField(max_length=255, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.title}"
+
+
+class SearchToken(models.Model):
+    # Inverted index: คำ 1 คำของเอกสาร 1 ชิ้น + น้ำหนัก (คำในหัวข้อมีน้ำหนักมากกว่าเนื้อหา)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='tokens')
+    token = models.CharField(max_length=32)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # ค้นด้วย token = ... / token LIKE 'abc%' แล้ว join ไปที่เอกสาร
+            models.Index(fields=['token', 'document'], name='search_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.document_id}"
+
+
+class Job(models.Model):
+    # งานเบื้องหลัง (Email / Discord) ที่บันทึกลง DB ก่อน -> ไม่หายตอนรีสตาร์ท และ retry ได้
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=50)
+    destination = models.CharField(max_length=255, blank=True, default='')  # ใช้จำกัดจำนวนที่รันพร้อมกัน
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.subject_name} ({self.day})"
\ No newline at end of file
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,119 @@
+import base64
+from datetime import timedelta
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Task
+
+# ==========================================
+# My Tasks (งานของฉันจากทุกบอร์ด -> หน้า Dashboard)
+# ==========================================
+# - ตัวเลขของแต่ละแท็บ (ทั้งหมด / Week นี้ / เลยกำหนด) นับใน DB ด้วย conditional aggregate query เดียว
+# - เรียง: กำหนดส่งใกล้สุดก่อน (ไม่มีกำหนดส่งไว้ท้าย) -> priority สูงก่อน (คอลัมน์ Task.priority_rank) -> id
+#   ตรงกับ index task_open_due_rank_idx
+# - แบ่งหน้าแบบ keyset (cursor) บน (due_date, priority_rank, id) -> หน้าถัด ๆ ไปเร็วเท่าหน้าแรก
+
+MY_TASKS_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+BUCKETS = ('all', 'week', 'overdue')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def open_tasks(user_id):
+    """งานที่ยังไม่เสร็จ / ไม่ได้เก็บถาวร ที่ user ได้รับมอบหมาย (ทุกบอร์ด)"""
+    return Task.objects.filter(assigned_to=user_id, is_completed=False, is_archived=False)
+
+
+def _bucket_filters(now):
+    next_week = now + timedelta(days=7)
+    return {
+        'overdue': Q(due_date__lt=now),
+        'week': Q(due_date__gte=now, due_date__lte=next_week),
+    }
+
+
+def bucket_counts(user_id, now=None):
+    """{'all', 'week', 'overdue'} ใน query เดียว"""
+    filters = _bucket_filters(now or timezone.now())
+    return open_tasks(user_id).aggregate(
+        all=Count('id'),
+        week=Count('id', filter=filters['week']),
+        overdue=Count('id', filter=filters['overdue']),
+    )
+
+
+def my_tasks_queryset(user_id, bucket='all', now=None):
+    """งานของแท็บที่เลือก เรียงตามลำดับที่แสดง"""
+    tasks = open_tasks(user_id)
+    if bucket != 'all':
+        tasks = tasks.filter(_bucket_filters(now or timezone.now())[bucket])
+    return tasks.order_by(F('due_date').asc(nulls_last=True), '-priority_rank', 'id')
+
+
+# ------------------------------------------
+# Keyset Pagination
+# ------------------------------------------
+
+def encode_cursor(row):
+    due = row['due_date'].isoformat() if row['due_date'] else ''
+    raw = f"{due}|{row['priority_rank']}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """cursor -> (due_date หรือ None, priority_rank, id) ของแถวสุดท้ายในหน้าก่อน"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        due, rank, pk = raw.split('|')
+        due_date = parse_datetime(due) if due else None
+        rank, pk = int(rank), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if due and due_date is None:
+        raise InvalidCursor(cursor)
+    return due_date, rank, pk
+
+
+def _after(due_date, rank, pk):
+    # แถวที่อยู่ "หลัง" (due_date, rank, id) ตามลำดับ due ASC (NULL ท้ายสุด), rank DESC, id ASC
+    same_due = Q(priority_rank__lt=rank) | Q(priority_rank=rank, id__gt=pk)
+    if due_date is None:
+        return Q(due_date__isnull=True) & same_due
+    return Q(due_date__gt=due_date) | (Q(due_date=due_date) & same_due) | Q(due_date__isnull=True)
+
+
+def my_tasks_page(tasks, cursor=None, page_size=MY_TASKS_PAGE_SIZE):
+    """1 หน้าต่อจาก cursor -> (rows, next_cursor หรือ None ถ้าหมดแล้ว)"""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if cursor:
+        tasks = tasks.filter(_after(*decode_cursor(cursor)))
+
+    rows = list(tasks.values(
+        'id', 'title', 'status', 'priority', 'priority_rank', 'due_date',
+        'list__board_id', 'list__board__name',
+    )[:page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], encode_cursor(rows[page_size - 1])
+    return rows, None
+
+
+def serialize(row, now=None):
+    now = now or timezone.now()
+    due_date = row['due_date']
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'status': row['status'],
+        'status_display': Task.Status(row['status']).label if row['status'] in Task.Status.values else row['status'],
+        'priority': row['priority'],
+        'due_date': due_date.isoformat() if due_date else None,
+        'due_display': timezone.localtime(due_date).strftime('%d %b') if due_date else '-',
+        'is_overdue': bool(due_date and due_date < now),
+        'board_id': row['list__board_id'],
+        'board_name': row['list__board__name'],
+    }
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# Notification Dispatch (ส่งแจ้งเตือนแบบเป็นชุด)
+# ==========================================
+
+
+def notify(actor, recipients, message, push_message, task=None, board=None, skip_actor=True):
+    """
+    สร้าง Notification ให้ผู้รับทุกคนในครั้งเดียว แล้วส่ง Real-time ออกไปเป็นชุดเดียว
+
+    - บันทึกลง DB ด้วย bulk_create (1 query)
+    - เพิ่มตัวนับ unread ด้วย F() แล้วอ่านค่ากลับมา (2 query)
+    - ส่ง WebSocket ทั้งหมดใน event loop รอบเดียว
+    """
+    targets = _targets(actor, recipients, skip_actor)
+    if not targets:
+        return []
+
+    notifications = Notification.objects.bulk_create(_build(actor, targets, message, task, board))
+    adjust_unread(targets.keys(), 1)
+    push_notifications(_payloads(targets, push_message, get_unread_counts(targets.keys())))
+    return notifications
+
+
+def _targets(actor, recipients, skip_actor):
+    # ตัดคนซ้ำ + ตัดตัวเองออก (ไม่ต้องแจ้งเตือนสิ่งที่ตัวเองทำ)
+    targets = {}
+    for user in recipients:
+        if user is None:
+            continue
+        if skip_actor and actor is not None and user.pk == actor.pk:
+            continue
+        targets[user.pk] = user
+    return targets
+
+
+def _build(actor, targets, message, task, board):
+    return [
+        Notification(recipient=user, actor=actor, task=task, board=board, message=message)
+        for user in targets.values()
+    ]
+
+
+def _payloads(targets, push_message, unread_counts):
+    return {
+        user_id: {
+            "type": "send_notification",
+            "message": push_message,
+            "unread_count": unread_counts.get(user_id, 0),
+        }
+        for user_id in targets
+    }
+
+
+def push_notifications(payloads):
+    """ส่งข้อความเข้าห้อง user_<id> ของแต่ละคนพร้อมกันในรอบเดียว (payloads = {user_id: event})"""
+    if payloads:
+        async_to_sync(apush_notifications)(payloads)
+
+
+async def apush_notifications(payloads):
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not payloads:
+        return
+    try:
+        await asyncio.gather(*[
+            channel_layer.group_send(f"user_{user_id}", event)
+            for user_id, event in payloads.items()
+        ])
+    except Exception:
+        # แจ้งเตือนบันทึกลง DB แล้ว -> ส่ง real-time ไม่สำเร็จไม่ควรทำให้ request ล้ม (client sync เองตอน reconnect)
+        logger.exception("Realtime notify failed for %d recipient(s)", len(payloads))
+
+
+# ==========================================
+# Serialization (dropdown กระดิ่ง + WebSocket)
+# ==========================================
+# ใช้ตัวเดียวกันทั้ง get_notifications และ NotificationConsumer
+# select_related ครบในครั้งเดียว -> 10 แถว = 1 query (เดิมดึง actor / task / list / board ทีละแถว)
+
+RECENT_LIMIT = 10
+
+
+def recent_queryset(user_id, since_id=None):
+    notifications = (
+        Notification.objects.filter(recipient_id=user_id)
+        .select_related('actor', 'board', 'task__list__board')
+        .order_by('-created_at', '-id')
+    )
+    if since_id:
+        notifications = notifications.filter(id__gt=since_id)
+    return notifications
+
+
+def serialize(notification):
+    actor = notification.actor
+    avatar_url = None
+    if actor and getattr(actor, 'profile_image', None):
+        avatar_url = actor.profile_image.url
+
+    board = notification.board
+    if board is None and notification.task and notification.task.list:
+        board = notification.task.list.board
+
+    return {
+        'id': notification.id,
+        'actor': actor.username if actor else 'ระบบ',
+        'actor_avatar': avatar_url,
+        'message': notification.message,
+        'created_at': timezone.localtime(notification.created_at).strftime('%d/%m %H:%M'),
+        'is_read': notification.is_read,
+        'digest_count': notification.digest_count,
+        'task_id': notification.task_id,
+        'board_id': board.id if board else None,
+        'board_name': board.name if board else None,
+    }
+
+
+def recent_notifications(user_id, since_id=None, limit=RECENT_LIMIT):
+    """แจ้งเตือนล่าสุด (ใหม่กว่า since_id ถ้าระบุ) ในรูป dict พร้อมส่งให้ client"""
+    return [serialize(n) for n in recent_queryset(user_id, since_id)[:limit]]
+
+
+async def arecent_notifications(user_id, since_id=None, limit=RECENT_LIMIT):
+    return [serialize(n) async for n in recent_queryset(user_id, since_id)[:limit]]
+
+
+def push_read_state(user_id, ids=None):
+    """แจ้งทุกแท็บของ user ว่าอ่านแล้ว (ids=None คืออ่านทั้งหมด) พร้อมตัวนับล่าสุด"""
+    push_notifications({user_id: {
+        "type": "notification.read",
+        "ids": ids,
+        "unread_count": get_unread_counts([user_id]).get(user_id, 0),
+    }})
+
+
+# ==========================================
+# Unread Counter (ตัวนับที่ยังไม่อ่าน)
+# ==========================================
+
+
+def adjust_unread(user_ids, delta):
+    """บวก/ลบตัวนับ unread แบบ atomic ด้วย F() (user ที่ยังไม่มีแถว จะถูกสร้างจากยอดจริง)"""
+    user_ids = set(user_ids)
+    if not user_ids or not delta:
+        return
+
+    updated = NotificationCounter.objects.filter(user_id__in=user_ids).update(
+        unread_count=F('unread_count') + delta
+    )
+    if updated < len(user_ids) and delta > 0:
+        existing = set(
+            NotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True)
+        )
+        # ยอดจริงตอนนี้รวมการเปลี่ยนแปลงล่าสุดไปแล้ว ไม่ต้องบวก delta ซ้ำ
+        _create_counters(user_ids - existing)
+
+
+def adjust_unread_by(decrements):
+    """ลดตัวนับหลายคนพร้อมกัน ({user_id: จำนวนที่ลด}) -> คนที่ลดเท่ากันรวมเป็น UPDATE เดียว"""
+    by_count = defaultdict(list)
+    for user_id, count in decrements.items():
+        if count:
+            by_count[count].append(user_id)
+    for count, user_ids in by_count.items():
+        adjust_unread(user_ids, -count)
+
+
+def release_unread(notifications):
+    """
+    แจ้งเตือนชุดนี้กำลังจะถูกลบ (CASCADE จาก Task / Board / ...) -> ลดตัวนับของผู้รับ
+    นับด้วย GROUP BY ครั้งเดียว แทน signal ทีละแถว (Notification ไม่มี signal -> Django ลบแบบ fast delete ได้)
+    """
+    rows = notifications.filter(is_read=False).values('recipient_id').annotate(total=Count('id')).order_by()
+    adjust_unread_by({row['recipient_id']: row['total'] for row in rows})
+
+
+def get_unread_count(user):
+    """อ่านจำนวนแจ้งเตือนที่ยังไม่อ่านจากตัวนับ (O(1))"""
+    return get_unread_counts([user.pk]).get(user.pk, 0)
+
+
+def get_unread_counts(user_ids):
+    """อ่านตัวนับของหลาย User ใน query เดียว -> {user_id: count}"""
+    user_ids = set(user_ids)
+    counts = dict(
+        NotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', 'unread_count')
+    )
+    missing = user_ids - counts.keys()
+    if missing:
+        counts.update(_create_counters(missing))
+    return {user_id: max(0, count) for user_id, count in counts.items()}
+
+
+async def aget_unread_count(user):
+    return (await aget_unread_counts([user.pk])).get(user.pk, 0)
+
+
+async def aget_unread_counts(user_ids):
+    """get_unread_counts() แบบ async"""
+    user_ids = set(user_ids)
+    counts = {
+        user_id: count async for user_id, count in
+        NotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', 'unread_count')
+    }
+    missing = user_ids - counts.keys()
+    if missing:
+        counts.update(await sync_to_async(_create_counters)(missing))
+    return {user_id: max(0, count) for user_id, count in counts.items()}
+
+
+def count_unread(user_ids):
+    """นับยอดจริงจากตาราง Notification (ใช้ตอนสร้างตัวนับ / reconcile เท่านั้น)"""
+    rows = (
+        Notification.objects.filter(recipient_id__in=list(user_ids), is_read=False)
+        .values('recipient_id')
+        .annotate(total=Count('id'))
+    )
+    return {row['recipient_id']: row['total'] for row in rows}
+
+
+def _create_counters(user_ids):
+    actual = count_unread(user_ids)
+    counts = {user_id: actual.get(user_id, 0) for user_id in user_ids}
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, unread_count=count) for user_id, count in counts.items()],
+        ignore_conflicts=True,
+    )
+    return counts
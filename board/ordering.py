@@ -0,0 +1,248 @@
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Min, Value, When
+
+from .jobs import enqueue, job_handler
+from .live import event, publish
+from .models import Board, List, Task
+from .snapshot import bump_board_version
+
+# ==========================================
+# Gap-based Ordering (Task.position / List.position)
+# ==========================================
+# position เว้นช่องห่างกันทีละ POSITION_GAP -> ย้ายการ์ด/ลิสต์ แค่หาค่ากึ่งกลางระหว่างเพื่อนบ้าน
+# แล้ว UPDATE แถวเดียว ถ้าช่องเริ่มแคบจะสั่ง rebalance ทั้งคอลัมน์ในคิวงานเบื้องหลัง
+
+POSITION_GAP = 1024
+MIN_GAP = 2  # ช่องเหลือน้อยกว่านี้ -> นัด rebalance
+CASE_BATCH_SIZE = 1000  # จำนวน WHEN สูงสุดต่อ 1 UPDATE (กัน statement ยาวเกิน)
+
+
+def position_between(prev_pos, next_pos):
+    """คืนค่า position ระหว่างเพื่อนบ้าน 2 ตัว (None = ไม่มีช่องว่างเหลือ)"""
+    if prev_pos is None and next_pos is None:
+        return POSITION_GAP
+    if prev_pos is None:
+        return next_pos - POSITION_GAP
+    if next_pos is None:
+        return prev_pos + POSITION_GAP
+    if next_pos - prev_pos < 2:
+        return None
+    return (prev_pos + next_pos) // 2
+
+
+def _is_tight(prev_pos, position, next_pos):
+    return (
+        (prev_pos is not None and position - prev_pos < MIN_GAP)
+        or (next_pos is not None and next_pos - position < MIN_GAP)
+    )
+
+
+def last_position(queryset):
+    """position สำหรับต่อท้าย"""
+    current = queryset.aggregate(Max('position'))['position__max']
+    return POSITION_GAP if current is None else current + POSITION_GAP
+
+
+def first_position(queryset):
+    """position สำหรับแทรกบนสุด"""
+    current = queryset.aggregate(Min('position'))['position__min']
+    return POSITION_GAP if current is None else current - POSITION_GAP
+
+
+def _neighbour_positions(queryset, prev_id, next_id):
+    prev_id = int(prev_id) if prev_id else None
+    next_id = int(next_id) if next_id else None
+    ids = [pk for pk in (prev_id, next_id) if pk]
+    positions = dict(queryset.filter(id__in=ids).values_list('id', 'position')) if ids else {}
+    return positions.get(prev_id), positions.get(next_id)
+
+
+def _lock_list(list_id):
+    # ล็อกแถว List ก่อนอ่าน/เขียน position ของการ์ดในลิสต์ -> คำขอย้ายพร้อมกันในลิสต์เดียวกันต่อคิวกัน
+    List.objects.select_for_update().filter(pk=list_id).values_list('pk', flat=True).first()
+
+
+def _lock_board(board_id):
+    Board.objects.select_for_update().filter(pk=board_id).values_list('pk', flat=True).first()
+
+
+# ------------------------------------------
+# Move
+# ------------------------------------------
+
+def move_task(task, target_list, prev_id=None, next_id=None):
+    """ย้ายการ์ดไปไว้ระหว่าง prev_id กับ next_id ในลิสต์เป้าหมาย (เขียนแค่แถวเดียว)"""
+    with transaction.atomic():
+        _lock_list(target_list.pk)
+        siblings = Task.objects.filter(list=target_list).exclude(id=task.id)
+        prev_pos, next_pos = _neighbour_positions(siblings, prev_id, next_id)
+
+        position = position_between(prev_pos, next_pos)
+        if position is None:
+            # ช่องเต็มจริง ๆ (เกิดยาก) -> จัดใหม่ทันทีแล้วคำนวณอีกรอบ
+            rebalance_tasks(target_list.id)
+            prev_pos, next_pos = _neighbour_positions(siblings, prev_id, next_id)
+            position = position_between(prev_pos, next_pos)
+        elif _is_tight(prev_pos, position, next_pos):
+            enqueue('rebalance_tasks', {'list_id': target_list.id}, destination='rebalance')
+
+        task.list = target_list
+        task.position = position
+        task.save(update_fields=['list', 'position'])
+    return task
+
+
+def move_task_to_order(task, target_list, ordered_ids):
+    """
+    ย้ายการ์ดตามลำดับทั้งคอลัมน์ที่ฝั่ง client ส่งมา:
+    ถ้าการ์ดอื่นเรียงตรงกับใน DB อยู่แล้ว -> ย้ายแถวเดียวด้วย move_task
+    ถ้าไม่ตรง (client เห็นลำดับต่างจาก DB) -> เขียนทั้งคอลัมน์ด้วย reorder_tasks
+    """
+    with transaction.atomic():
+        # ล็อกก่อนอ่านลำดับปัจจุบัน -> ลำดับที่เทียบกับ client ไม่เปลี่ยนระหว่างตัดสินใจ
+        _lock_list(target_list.pk)
+        current = list(
+            Task.objects.filter(list=target_list).exclude(id=task.id)
+            .order_by('position', 'id').values_list('id', flat=True)
+        )
+        current_ids = set(current)
+        client_order = [pk for pk in ordered_ids if pk in current_ids]
+        visible = set(client_order)
+
+        if task.id in ordered_ids and client_order == [pk for pk in current if pk in visible]:
+            index = ordered_ids.index(task.id)
+            before = [pk for pk in ordered_ids[:index] if pk in current_ids]
+            after = [pk for pk in ordered_ids[index + 1:] if pk in current_ids]
+            return move_task(
+                task, target_list,
+                prev_id=before[-1] if before else None,
+                next_id=after[0] if after else None,
+            )
+
+        if task.list_id != target_list.pk:
+            task.list = target_list
+            task.save(update_fields=['list'])
+        reorder_tasks(target_list, ordered_ids)
+    return task
+
+
+def move_list(lst, prev_id=None, next_id=None):
+    """ย้ายลิสต์ไปไว้ระหว่าง prev_id กับ next_id ในบอร์ดเดียวกัน (เขียนแค่แถวเดียว)"""
+    with transaction.atomic():
+        _lock_board(lst.board_id)
+        siblings = List.objects.filter(board_id=lst.board_id).exclude(id=lst.id)
+        prev_pos, next_pos = _neighbour_positions(siblings, prev_id, next_id)
+
+        position = position_between(prev_pos, next_pos)
+        if position is None:
+            rebalance_lists(lst.board_id)
+            prev_pos, next_pos = _neighbour_positions(siblings, prev_id, next_id)
+            position = position_between(prev_pos, next_pos)
+        elif _is_tight(prev_pos, position, next_pos):
+            enqueue('rebalance_lists', {'board_id': lst.board_id}, destination='rebalance')
+
+        lst.position = position
+        lst.save(update_fields=['position'])
+    return lst
+
+
+# ------------------------------------------
+# Bulk reorder (UPDATE ... CASE WHEN)
+# ------------------------------------------
+
+def apply_positions(queryset, ordered_ids, current=None):
+    """
+    เขียน position ใหม่ (index * POSITION_GAP) ตามลำดับใน ordered_ids
+    ด้วย UPDATE ... CASE WHEN ครั้งเดียว (เฉพาะแถวที่ค่าเปลี่ยน) -> คืนจำนวนแถวที่แก้
+    """
+    current = current or {}
+    changed = [
+        (pk, index * POSITION_GAP)
+        for index, pk in enumerate(ordered_ids, start=1)
+        if current.get(pk) != index * POSITION_GAP
+    ]
+    updated = 0
+    for start in range(0, len(changed), CASE_BATCH_SIZE):
+        batch = changed[start:start + CASE_BATCH_SIZE]
+        updated += queryset.filter(pk__in=[pk for pk, _ in batch]).update(
+            position=Case(
+                *[When(pk=pk, then=Value(position)) for pk, position in batch],
+                output_field=IntegerField(),
+            )
+        )
+    return updated
+
+
+def _merge_order(ordered_ids, current):
+    """ลำดับที่ส่งมาก่อน ตามด้วยแถวที่ไม่อยู่ใน ordered_ids (คงลำดับเดิม) / ตัด id ที่ไม่อยู่ในกลุ่มทิ้ง"""
+    seen = set()
+    ordered = []
+    for pk in ordered_ids:
+        if pk in current and pk not in seen:
+            seen.add(pk)
+            ordered.append(pk)
+    rest = sorted((pk for pk in current if pk not in seen), key=lambda pk: (current[pk], pk))
+    return ordered + rest
+
+
+def _changed_positions(ordered_ids, current):
+    # {id: position ใหม่} เฉพาะแถวที่เปลี่ยน (key เป็น str -> ส่งผ่าน channel layer / JSON ได้)
+    return {
+        str(pk): index * POSITION_GAP
+        for index, pk in enumerate(ordered_ids, start=1)
+        if current.get(pk) != index * POSITION_GAP
+    }
+
+
+def reorder_tasks(target_list, ordered_ids):
+    """จัดลำดับการ์ดทั้งลิสต์ตาม ordered_ids (query คงที่ ไม่ขึ้นกับจำนวนการ์ด)"""
+    with transaction.atomic():
+        _lock_list(target_list.pk)
+        current = dict(Task.objects.filter(list_id=target_list.pk).values_list('id', 'position'))
+        order = _merge_order(ordered_ids, current)
+        updated = apply_positions(Task.objects.filter(list_id=target_list.pk), order, current)
+    if updated:
+        bump_board_version(target_list.board_id)
+        publish(target_list.board_id, event(
+            'list.tasks_reordered', list_id=target_list.pk, positions=_changed_positions(order, current),
+        ))
+    return updated
+
+
+def reorder_lists(board_id, ordered_ids):
+    """จัดลำดับลิสต์ทั้งบอร์ดตาม ordered_ids (query คงที่ ไม่ขึ้นกับจำนวนลิสต์)"""
+    with transaction.atomic():
+        _lock_board(board_id)
+        current = dict(List.objects.filter(board_id=board_id).values_list('id', 'position'))
+        order = _merge_order(ordered_ids, current)
+        updated = apply_positions(List.objects.filter(board_id=board_id), order, current)
+    if updated:
+        bump_board_version(board_id)
+        publish(board_id, event('list.reordered', positions=_changed_positions(order, current)))
+    return updated
+
+
+# ------------------------------------------
+# Rebalance
+# ------------------------------------------
+
+def rebalance_tasks(list_id):
+    """จัด position ของการ์ดในลิสต์ใหม่ให้ห่างกัน POSITION_GAP (คงลำดับเดิม)"""
+    target_list = List.objects.filter(pk=list_id).only('id', 'board_id').first()
+    if target_list:
+        reorder_tasks(target_list, [])
+
+
+def rebalance_lists(board_id):
+    """จัด position ของลิสต์ในบอร์ดใหม่ให้ห่างกัน POSITION_GAP (คงลำดับเดิม)"""
+    reorder_lists(board_id, [])
+
+
+@job_handler('rebalance_tasks')
+def _rebalance_tasks_job(payload):
+    rebalance_tasks(payload['list_id'])
+
+
+@job_handler('rebalance_lists')
+def _rebalance_lists_job(payload):
+    rebalance_lists(payload['board_id'])
@@ -0,0 +1,104 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Board
+
+# ==========================================
+# Board Access (สิทธิ์เข้าถึงบอร์ด)
+# ==========================================
+# ID ของบอร์ดที่ user เข้าถึงได้ (เจ้าของ + สมาชิก) คำนวณครั้งเดียวแล้ว:
+#   - จำไว้บน request.user (ใช้ซ้ำได้ทั้ง request)
+#   - เก็บใน cache ข้าม request (ล้างเมื่อสร้าง/ลบบอร์ด หรือสมาชิกเปลี่ยน ดู signals.py)
+#     ล้าง 2 รอบ: ทันที + หลัง transaction commit -> request อื่นที่อ่านค่าเก่า (ก่อน commit) ไป cache ไว้ จะถูกล้างตาม
+# View จึงเช็คสิทธิ์ด้วย `id IN (...)` / `board_id IN (...)` แทน JOIN members + DISTINCT
+#
+# กลับด้าน: ID ของสมาชิกในบอร์ด (เจ้าของ + members) ก็ cache ไว้เช่นกัน
+# ใช้ตรวจผู้รับผิดชอบในฟอร์มงาน (forms.py) โดยไม่ต้องแตะตาราง User
+
+ACCESS_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f"board_access_{user_id}"
+
+
+def accessible_board_ids(user):
+    """frozenset ของ ID บอร์ดที่ user เป็นเจ้าของหรือสมาชิก"""
+    ids = getattr(user, '_board_access_ids', None)
+    if ids is not None:
+        return ids
+
+    ids = cache.get(_cache_key(user.pk))
+    if ids is None:
+        # 2 query ตรง ๆ บน index (ไม่มี JOIN / DISTINCT)
+        ids = frozenset(Board.objects.filter(created_by_id=user.pk).values_list('id', flat=True)) | frozenset(
+            Board.members.through.objects.filter(user_id=user.pk).values_list('board_id', flat=True)
+        )
+        cache.set(_cache_key(user.pk), ids, ACCESS_CACHE_TIMEOUT)
+
+    user._board_access_ids = ids
+    return ids
+
+
+def can_access(user, board_id):
+    """user เข้าถึงบอร์ดนี้ได้ไหม (ไม่ต้อง query ถ้าเคยคำนวณไว้แล้ว)"""
+    try:
+        return int(board_id) in accessible_board_ids(user)
+    except (TypeError, ValueError):
+        return False
+
+
+def filter_accessible(queryset, user, board_field='board_id'):
+    """
+    กรอง queryset ให้เหลือเฉพาะของบอร์ดที่ user เข้าถึงได้
+    เช่น filter_accessible(Task.objects.all(), user, 'list__board_id')
+    """
+    return queryset.filter(**{f"{board_field}__in": accessible_board_ids(user)})
+
+
+def accessible_boards(user):
+    return filter_accessible(Board.objects.all(), user, 'id')
+
+
+def _delete_now_and_on_commit(keys):
+    # ลบทันที (request เดียวกันเห็นค่าใหม่) แล้วลบซ้ำตอน commit
+    # (ระหว่างนี้ request อื่นยังอ่าน DB ได้แค่ข้อมูลก่อน commit แล้วอาจ cache ค่าเก่ากลับไป)
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_board_access(*user_ids):
+    """ล้าง cache สิทธิ์ของ user (เรียกเมื่อสมาชิกบอร์ดเปลี่ยน)"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if user_ids:
+        _delete_now_and_on_commit([_cache_key(user_id) for user_id in user_ids])
+
+
+# ------------------------------------------
+# Board Members (ใครอยู่ในบอร์ดนี้)
+# ------------------------------------------
+
+def _members_cache_key(board_id):
+    return f"board_members_{board_id}"
+
+
+def board_member_ids(board):
+    """frozenset ของ ID ผู้ใช้ที่อยู่ในบอร์ด (เจ้าของ + สมาชิก) -> ส่ง Board หรือ board_id ก็ได้"""
+    board_id = getattr(board, 'pk', board)
+    ids = cache.get(_members_cache_key(board_id))
+    if ids is None:
+        if isinstance(board, Board):
+            owner_id = board.created_by_id
+        else:
+            owner_id = Board.objects.filter(pk=board_id).values_list('created_by_id', flat=True).first()
+        ids = frozenset(
+            Board.members.through.objects.filter(board_id=board_id).values_list('user_id', flat=True)
+        ) | ({owner_id} if owner_id else set())
+        cache.set(_members_cache_key(board_id), ids, ACCESS_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_board_members(*board_ids):
+    board_ids = {board_id for board_id in board_ids if board_id}
+    if board_ids:
+        _delete_now_and_on_commit([_members_cache_key(board_id) for board_id in board_ids])
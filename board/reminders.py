@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, prefetch_related_objects
+from django.utils import timezone
+
+from .jobs import enqueue_discord, enqueue_email
+from .models import Task
+from .notifications import notify
+
+# ==========================================
+# Task Reminders
+# ==========================================
+# Task.remind_at ถูกคำนวณตอน save() -> ดึงเฉพาะงานที่ remind_at <= ตอนนี้ผ่าน index
+# claim ทีละชุดด้วย select_for_update(skip_locked) แล้วค่อยส่งแจ้งเตือน (Email / Discord เข้าคิวงาน)
+
+REMINDER_BATCH_SIZE = 200
+
+
+def _has_assignee():
+    return Exists(Task.assigned_to.through.objects.filter(task_id=OuterRef('pk')))
+
+
+def due_reminders(now=None):
+    """งานที่ถึงเวลาแจ้งเตือนแล้ว (ต้องมีผู้รับผิดชอบอย่างน้อย 1 คน)"""
+    now = now or timezone.now()
+    return Task.objects.filter(_has_assignee(), remind_at__lte=now).order_by('remind_at', 'id')
+
+
+def disarm_unassigned(now=None):
+    """
+    งานที่ถึงเวลาแต่ไม่มีผู้รับผิดชอบ -> ล้าง remind_at (ไม่ค้างอยู่ใน index ให้สแกนทุกรอบ)
+    ไม่ mark is_reminded -> มอบหมายงานทีหลังจะคำนวณ remind_at ใหม่ (ดู signals.task_assignees_changed)
+    """
+    now = now or timezone.now()
+    return Task.objects.filter(~_has_assignee(), remind_at__lte=now).update(remind_at=None)
+
+
+def claim_due_reminders(batch_size=REMINDER_BATCH_SIZE, now=None):
+    """
+    ล็อกงานที่ถึงเวลาแล้ว 1 ชุด แล้ว mark is_reminded ใน transaction เดียวกัน
+    (งานที่ถูกแก้ไข/ติ๊กเสร็จระหว่างนี้ save() จะรอ lock แล้วคำนวณ remind_at ใหม่เอง)
+    """
+    with transaction.atomic():
+        disarm_unassigned(now)
+        tasks = list(
+            due_reminders(now)
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('list__board__created_by')[:batch_size]
+        )
+        if tasks:
+            Task.objects.filter(id__in=[task.id for task in tasks]).update(is_reminded=True, remind_at=None)
+
+    prefetch_related_objects(tasks, 'assigned_to')
+    return tasks
+
+
+def dispatch_reminder(task):
+    """ส่งแจ้งเตือน 1 งาน: Web (DB + Real-time) ทันที, Email / Discord เข้าคิวงานเบื้องหลัง"""
+    board = task.list.board
+    assignees = list(task.assigned_to.all())
+    formatted_date = timezone.localtime(task.due_date).strftime('%d/%m/%Y')
+
+    # A. แจ้งเตือน Web (Real-time) + DB
+    try:
+        notify(
+            board.created_by,
+            assignees,
+            message=f"⏳ เตือนความจำ! งาน '{task.title}' ครบกำหนดในอีก {task.remind_days} วัน",
+            push_message=f"⏳ ใกล้ครบกำหนด! '{task.title}'",
+            task=task,
+            skip_actor=False,
+        )
+    except Exception as e:
+        print(f"Reminder Notify Error ({task.pk}): {e}")
+
+    # B. แจ้งเตือน Email
+    for user in assignees:
+        enqueue_email(
+            f"แจ้งเตือนงานใกล้ครบกำหนด: {task.title}",
+            (
+                f"สวัสดีคุณ {user.username},\n\n"
+                f"งาน '{task.title}' จะครบกำหนดในวันที่ {formatted_date}\n"
+                f"(เหลือเวลาอีก {task.remind_days} วัน)\n\n"
+                f"กรุณาตรวจสอบสถานะงานของคุณ\n\n"
+                f"ขอบคุณครับ,\nทีมงาน Work Wai D"
+            ),
+            [user.email],
+        )
+
+    # C. แจ้งเตือน Discord
+    if board.discord_webhook_url:
+        assignee_names = ", ".join([u.username for u in assignees])
+        enqueue_discord(
+            (
+                f"⚠️ **Upcoming Deadline Warning!**\n"
+                f"**Task:** {task.title}\n"
+                f"**Due Date:** {formatted_date}\n"
+                f"**Remaining:** {task.remind_days} Days\n"
+                f"**Team:** {assignee_names}\n"
+                f"---------------------------------"
+            ),
+            board.discord_webhook_url,
+        )
+
+
+def still_open(task):
+    # claim แล้วแต่ยังไม่ได้ส่ง -> ถ้าระหว่างนี้มีคนติ๊กเสร็จไปแล้ว ก็ไม่ต้องเตือน
+    return Task.objects.filter(pk=task.pk, is_completed=False).exists()
+
+
+def send_due_reminders(batch_size=REMINDER_BATCH_SIZE, now=None, on_task=None):
+    """ส่งแจ้งเตือนงานที่ถึงเวลาทั้งหมด (ทีละชุด) -> คืนจำนวนงานที่แจ้งเตือน"""
+    now = now or timezone.now()
+    count = 0
+    while True:
+        tasks = claim_due_reminders(batch_size, now)
+        for task in tasks:
+            if not still_open(task):
+                continue
+            if on_task:
+                on_task(task)
+            dispatch_reminder(task)
+            count += 1
+        if len(tasks) < batch_size:
+            return count
@@ -0,0 +1,163 @@
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import ActivityLog, Task
+from .snapshot import get_board_versions
+from .stats import TREND_RANGES, trend
+
+# ==========================================
+# Reporting Engine
+# ==========================================
+# KPI ทั้งหมดคำนวณใน query เดียวด้วย Count(filter=Q(...)) + กราฟอีก 4 query (สมาชิก / ลิสต์ / แนวโน้ม / กิจกรรม)
+# กราฟแนวโน้ม (7 / 30 / 90 / 365 วัน) อ่านจากตาราง BoardDailyStats (ดู stats.py)
+# กิจกรรมของทีมนับจาก ActivityLog.verb (GROUP BY บน index board + verb + created_at ไม่ต้องแกะข้อความ)
+# Cache ตาม user + version ของทุกบอร์ดที่เกี่ยวข้อง (version ถูก bump ทุกครั้งที่ข้อมูลบอร์ดเปลี่ยน ดู signals.py)
+# ส่วนรายการงานใน Modal ดึงทีละหน้าผ่าน JSON (report_task_page)
+
+REPORT_CACHE_TIMEOUT = 5 * 60  # งานล่าช้า / กราฟรายวัน ขึ้นกับเวลาปัจจุบัน -> ไม่ cache นานเกินไป
+REPORT_PAGE_SIZE = 50
+ACTIVITY_TOP_MEMBERS = 10
+ACTIVITY_VERBS = [
+    ActivityLog.Verb.TASK_CREATED, ActivityLog.Verb.TASK_MOVED,
+    ActivityLog.Verb.TASK_COMPLETED, ActivityLog.Verb.COMMENT_ADDED,
+]
+TREND_DAYS = 7  # ค่าเริ่มต้น (เลือกได้จาก TREND_RANGES)
+
+
+def report_tasks(board_ids):
+    # ใช้ IN แทนการ join สมาชิก -> ไม่ต้อง .distinct()
+    return Task.objects.filter(list__board_id__in=board_ids)
+
+
+def _cache_key(user_id, board_ids, trend_days):
+    versions = get_board_versions(board_ids)
+    raw = ",".join(f"{board_id}:{versions[board_id]}" for board_id in board_ids)
+    return f"report_{user_id}_{trend_days}_{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def get_report(user, board_ids, trend_days=TREND_DAYS):
+    """รายงานของบอร์ดที่เลือก (อ่านจาก cache ก่อน)"""
+    if trend_days not in TREND_RANGES:
+        trend_days = TREND_DAYS
+    key = _cache_key(user.id, board_ids, trend_days)
+    report = cache.get(key)
+    if report is None:
+        report = build_report(board_ids, trend_days)
+        cache.set(key, report, REPORT_CACHE_TIMEOUT)
+    return report
+
+
+def build_report(board_ids, trend_days=TREND_DAYS):
+    """คำนวณ KPI + ข้อมูลกราฟ (5 query คงที่ ไม่ขึ้นกับจำนวนงาน)"""
+    tasks = report_tasks(board_ids)
+    now = timezone.now()
+
+    open_tasks = Q(is_completed=False)
+    has_assignee = Task.assigned_to.through.objects.filter(task_id=OuterRef('pk'))
+
+    # 1. KPI + Priority (query เดียว)
+    kpi = tasks.aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(is_completed=True)),
+        remaining=Count('id', filter=open_tasks),
+        overdue=Count('id', filter=open_tasks & Q(due_date__lt=now)),
+        high=Count('id', filter=open_tasks & Q(priority_rank=Task.PRIORITY_RANK[Task.Priority.HIGH])),
+        medium=Count('id', filter=open_tasks & Q(priority_rank=Task.PRIORITY_RANK[Task.Priority.MEDIUM])),
+        low=Count('id', filter=open_tasks & Q(priority_rank=Task.PRIORITY_RANK[Task.Priority.LOW])),
+        unassigned=Count('id', filter=~Q(Exists(has_assignee))),
+    )
+
+    # 2. Member Workload
+    member_stats = list(
+        Task.assigned_to.through.objects.filter(task__list__board_id__in=board_ids)
+        .values('user__username')
+        .annotate(total=Count('task_id'))
+        .order_by('-total', 'user__username')
+    )
+    if kpi['unassigned']:
+        member_stats.append({'user__username': None, 'total': kpi['unassigned']})
+        member_stats.sort(key=lambda m: -m['total'])
+
+    # 3. Task Distribution (รวมลิสต์ชื่อเดียวกันข้ามบอร์ด เรียงตาม position)
+    list_counts = {}
+    for row in tasks.values('list__title', 'list__position').annotate(count=Count('id')).order_by('list__position'):
+        list_counts[row['list__title']] = list_counts.get(row['list__title'], 0) + row['count']
+
+    # 4. Trend (จาก rollup รายวัน)
+    trend_data = trend(board_ids, trend_days)
+
+    # 5. กิจกรรมของทีมในช่วงเดียวกับกราฟแนวโน้ม
+    activity = activity_by_member(board_ids, now - timedelta(days=trend_days))
+
+    total = kpi['total']
+    return {
+        'total_tasks': total,
+        'completed_tasks': kpi['completed'],
+        'remaining_count': kpi['remaining'],
+        'overdue_tasks': kpi['overdue'],
+        'completion_rate': round((kpi['completed'] / total * 100), 1) if total > 0 else 0,
+        'priority_data': {'high': kpi['high'], 'medium': kpi['medium'], 'low': kpi['low']},
+        'trend_days': trend_days,
+        'trend_labels': trend_data['labels'],
+        'trend_data': trend_data['completed'],
+        'trend_created': trend_data['created'],
+        'trend_overdue': trend_data['overdue'],
+        'member_labels': [m['user__username'] or 'Unassigned' for m in member_stats],
+        'member_data': [m['total'] for m in member_stats],
+        'list_labels': list(list_counts),
+        'list_data': list(list_counts.values()),
+        'activity_labels': activity['labels'],
+        'activity_created': activity[ActivityLog.Verb.TASK_CREATED],
+        'activity_moved': activity[ActivityLog.Verb.TASK_MOVED],
+        'activity_completed': activity[ActivityLog.Verb.TASK_COMPLETED],
+        'activity_commented': activity[ActivityLog.Verb.COMMENT_ADDED],
+    }
+
+
+def activity_by_member(board_ids, since):
+    """จำนวนการสร้าง / ย้าย / ทำเสร็จ / คอมเมนต์ต่อคน ตั้งแต่ since (query เดียว) -> {labels, <verb>: [จำนวนตาม labels]}"""
+    rows = (
+        ActivityLog.objects.filter(board_id__in=board_ids, verb__in=ACTIVITY_VERBS, created_at__gte=since)
+        .values('actor__username', 'verb')
+        .annotate(count=Count('id'))
+    )
+    counts = {}
+    for row in rows:
+        counts.setdefault(row['actor__username'], {})[row['verb']] = row['count']
+
+    labels = sorted(counts, key=lambda username: (-sum(counts[username].values()), username))[:ACTIVITY_TOP_MEMBERS]
+    result = {'labels': labels}
+    for verb in ACTIVITY_VERBS:
+        result[verb] = [counts[username].get(verb, 0) for username in labels]
+    return result
+
+
+# ------------------------------------------
+# รายการงานใน Modal (แบ่งหน้า)
+# ------------------------------------------
+
+def _task_list_filter(kind):
+    # งานค้างเรียงกำหนดส่ง -> priority สูงก่อน (index task_list_done_due_rank_idx)
+    if kind == 'remaining':
+        return Q(is_completed=False), ['due_date', '-priority_rank', 'id']
+    if kind == 'completed':
+        return Q(is_completed=True), ['-completed_at', '-id']
+    if kind == 'overdue':
+        return Q(is_completed=False, due_date__lt=timezone.now()), ['due_date', '-priority_rank', 'id']
+    return Q(), ['-created_at', '-id']
+
+
+def report_task_page(board_ids, kind, page=1, page_size=REPORT_PAGE_SIZE):
+    """งาน 1 หน้าของหมวด kind (all / remaining / completed / overdue) -> (rows, has_next)"""
+    condition, ordering = _task_list_filter(kind)
+    offset = (page - 1) * page_size
+    rows = list(
+        report_tasks(board_ids).filter(condition).order_by(*ordering)
+        .values('id', 'title', 'due_date', 'list__title', 'list__board_id', 'list__board__name')
+        [offset:offset + page_size + 1]
+    )
+    return rows[:page_size], len(rows) > page_size
@@ -0,0 +1,183 @@
+import gzip
+import json
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import Notification
+from .notifications import adjust_unread, adjust_unread_by
+
+# ==========================================
+# Notification Retention (เก็บ / รวบ / ลบแจ้งเตือนเก่า)
+# ==========================================
+# ตาราง Notification โตขึ้นทุกครั้งที่ assign / เตือนความจำ -> รันเป็นรอบ ๆ ด้วย `python manage.py prune_notifications`
+#   1. ลบแจ้งเตือนที่อ่านแล้วและเก่ากว่า NOTIFICATION_READ_TTL_DAYS วัน
+#   2. แจ้งเตือนเก่ากว่า NOTIFICATION_DIGEST_AFTER_DAYS วันที่ซ้ำงานเดียวกัน (ผู้รับเดียวกัน)
+#      -> เหลือแถวล่าสุดแถวเดียว (digest_count = จำนวนที่รวบไว้), ยังไม่อ่านสักแถว = digest ยังไม่อ่าน
+#   ลบทีละ batch (transaction สั้น ๆ ไม่ล็อกตารางนาน) และเขียนแถวที่ลบลงไฟล์ archive (NDJSON.gz) ก่อนลบได้
+#   ลบแบบ raw DELETE (ไม่ยิง signal notification_deleted ทีละแถว) -> ปรับตัวนับ unread เองครั้งเดียวต่อ batch
+
+NOTIFICATION_READ_TTL_DAYS = getattr(settings, 'NOTIFICATION_READ_TTL_DAYS', 30)
+NOTIFICATION_DIGEST_AFTER_DAYS = getattr(settings, 'NOTIFICATION_DIGEST_AFTER_DAYS', 1)
+NOTIFICATION_ARCHIVE_DIR = getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', None)  # None = ไม่เก็บไฟล์
+RETENTION_BATCH_SIZE = 1000
+
+ARCHIVE_FIELDS = ('id', 'recipient_id', 'actor_id', 'task_id', 'board_id', 'message', 'is_read', 'digest_count', 'created_at')
+
+
+# ------------------------------------------
+# เลือกแถว
+# ------------------------------------------
+
+def expired_read(now, read_ttl_days):
+    """แจ้งเตือนที่อ่านแล้วและหมดอายุ"""
+    return Notification.objects.filter(is_read=True, created_at__lt=now - timedelta(days=read_ttl_days))
+
+
+def digest_candidates(now, digest_after_days, read_ttl_days):
+    """แจ้งเตือนของงานที่เก่าพอจะรวบได้ (ไม่นับแถวที่ถูกลบเพราะหมดอายุอยู่แล้ว)"""
+    return (
+        Notification.objects.filter(task__isnull=False, created_at__lt=now - timedelta(days=digest_after_days))
+        .exclude(is_read=True, created_at__lt=now - timedelta(days=read_ttl_days))
+    )
+
+
+def digest_groups(candidates):
+    """(ผู้รับ, งาน) ที่มีมากกว่า 1 แถว -> rows, newest, unread, represented (GROUP BY เดียว)"""
+    return (
+        candidates.values('recipient_id', 'task_id')
+        .annotate(
+            rows=Count('id'),
+            newest=Max('id'),
+            unread=Count('id', filter=Q(is_read=False)),
+            represented=Sum('digest_count'),
+        )
+        .filter(rows__gt=1)
+        .order_by()
+    )
+
+
+# ------------------------------------------
+# Archive
+# ------------------------------------------
+
+class Archive:
+    """เขียนแถวที่กำลังจะลบลงไฟล์ NDJSON (gzip) ทีละ batch -> ไฟล์เดียวต่อการรัน 1 ครั้ง"""
+
+    def __init__(self, directory, now):
+        self.path = os.path.join(directory, f"notifications-{now:%Y%m%d-%H%M%S}.ndjson.gz")
+        self.file = None
+        self.count = 0
+
+    def write(self, queryset):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = gzip.open(self.path, 'at', encoding='utf-8')
+        for row in queryset.values(*ARCHIVE_FIELDS).iterator():
+            row['created_at'] = row['created_at'].isoformat()
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+            self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def _delete_in_batches(queryset, batch_size, archive=None, pause=0):
+    """ลบทีละ batch_size แถว (เรียงตาม id) -> จำนวนที่ลบ"""
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        batch = Notification.objects.filter(id__in=ids)
+        if archive is not None:
+            archive.write(batch)
+        with transaction.atomic():
+            _delete_batch(batch)
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def _delete_batch(batch):
+    # ล็อกแถวที่ยังไม่อ่านก่อนนับ (กันกด "อ่านแล้ว" แทรกระหว่างนับกับลบ -> ตัวนับลดซ้ำ)
+    unread = Counter(batch.select_for_update().filter(is_read=False).values_list('recipient_id', flat=True))
+    batch._raw_delete(batch.db)
+    adjust_unread_by(unread)  # ผู้รับที่ลดเท่ากันรวมเป็น UPDATE เดียว (ส่วนใหญ่ทั้ง batch มีไม่กี่ค่า)
+
+
+# ------------------------------------------
+# Run
+# ------------------------------------------
+
+def retention_stats(now=None, read_ttl_days=NOTIFICATION_READ_TTL_DAYS, digest_after_days=NOTIFICATION_DIGEST_AFTER_DAYS):
+    """ตัวเลขของสิ่งที่จะเกิดขึ้น (สำหรับ --dry-run) โดยไม่แก้ข้อมูล"""
+    now = now or timezone.now()
+    stats = {
+        'total': Notification.objects.count(),
+        'expired': expired_read(now, read_ttl_days).count(),
+        'digests': 0,
+        'collapsed': 0,
+    }
+    if digest_after_days is not None:
+        stats.update(_group_totals(digest_candidates(now, digest_after_days, read_ttl_days)))
+    stats['remaining'] = stats['total'] - stats['expired'] - stats['collapsed']
+    return stats
+
+
+def _group_totals(candidates):
+    digests = collapsed = 0
+    for group in digest_groups(candidates).iterator():
+        digests += 1
+        collapsed += group['rows'] - 1
+    return {'digests': digests, 'collapsed': collapsed}
+
+
+def prune_notifications(now=None, read_ttl_days=NOTIFICATION_READ_TTL_DAYS,
+                        digest_after_days=NOTIFICATION_DIGEST_AFTER_DAYS,
+                        batch_size=RETENTION_BATCH_SIZE, archive_dir=NOTIFICATION_ARCHIVE_DIR, pause=0):
+    """ลบที่หมดอายุ + รวบ digest -> dict สรุปผล (expired, digests, collapsed, archive)"""
+    now = now or timezone.now()
+    archive = Archive(archive_dir, now) if archive_dir else None
+    result = {'expired': 0, 'digests': 0, 'collapsed': 0, 'archive': None}
+
+    try:
+        # 1. อ่านแล้ว + หมดอายุ
+        result['expired'] = _delete_in_batches(expired_read(now, read_ttl_days), batch_size, archive, pause)
+
+        # 2. รวบแจ้งเตือนซ้ำของงานเดียวกันเป็น digest
+        if digest_after_days is not None:
+            candidates = digest_candidates(now, digest_after_days, read_ttl_days)
+            for group in list(digest_groups(candidates)):
+                result['collapsed'] += _collapse(candidates, group, batch_size, archive, pause)
+                result['digests'] += 1
+    finally:
+        if archive is not None:
+            archive.close()
+            result['archive'] = archive.path if archive.count else None
+
+    return result
+
+
+def _collapse(candidates, group, batch_size, archive, pause):
+    newest = group['newest']
+    kept_is_read = Notification.objects.filter(id=newest).values_list('is_read', flat=True).first()
+    if kept_is_read is None:  # ถูกลบไปก่อนแล้ว
+        return 0
+
+    older = candidates.filter(recipient_id=group['recipient_id'], task_id=group['task_id'], id__lt=newest)
+    deleted = _delete_in_batches(older, batch_size, archive, pause)
+
+    # แถวที่ยังไม่อ่านที่ถูกลบ ลดตัวนับไปแล้ว (_delete_batch) -> ถ้า digest กลายเป็นยังไม่อ่าน ต้องบวกคืน 1
+    is_read = group['unread'] == 0
+    Notification.objects.filter(id=newest).update(digest_count=group['represented'], is_read=is_read)
+    if kept_is_read and not is_read:
+        adjust_unread([group['recipient_id']], 1)
+    return deleted
@@ -0,0 +1,242 @@
+import operator
+import re
+from collections import Counter
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+from django.urls import reverse
+
+from .models import Board, ChecklistItem, Comment, List, SearchDocument, SearchToken, Task
+from .permissions import accessible_board_ids
+
+# ==========================================
+# Search Index (Inverted Index)
+# ==========================================
+# ทุกครั้งที่บันทึก Board / Task / Comment / ChecklistItem -> ตัดคำแล้วเก็บลง SearchToken (ดู signals.py)
+# ตอนค้นหา: token = ... (หรือ LIKE 'abc%' สำหรับคำสุดท้าย) ใช้ index ได้ ต่างจาก icontains ('%abc%')
+# จัดอันดับ + กรองสิทธิ์ + ต้องเจอครบทุกคำ ใน query เดียว (GROUP BY เอกสาร)
+#
+# ภาษาไทยไม่มีช่องว่างคั่นคำ -> ตัดเป็นคู่ตัวอักษรซ้อนกัน (bigram) เช่น "งานบ้าน" -> งา, าน, นบ, บ้ ...
+# ไม่ต้องพึ่งพจนานุกรม และค้นส่วนกลางของคำได้ (ทั้งตอน index และตอนค้นใช้วิธีเดียวกัน)
+
+TOKEN_MAX_LENGTH = 32
+MAX_FIELD_LENGTH = 5000   # ตัดเนื้อหายาว ๆ (คำอธิบายงาน) ไม่ให้ index บวม
+MAX_QUERY_TERMS = 12
+MAX_TOKEN_WEIGHT = 100
+SEARCH_LIMIT = 20
+INDEX_BATCH_SIZE = 500
+
+TITLE_WEIGHT = 5
+BODY_WEIGHT = 1
+
+_TOKEN_RE = re.compile(r'([\u0E00-\u0E7F]+)|([^\W_\u0E00-\u0E7F]+)')  # (ภาษาไทย) | (คำอื่น ๆ)
+
+Kind = SearchDocument.Kind
+
+
+# ------------------------------------------
+# Tokenizer
+# ------------------------------------------
+
+def _thai_tokens(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text):
+    """ข้อความ -> list ของ token (ตัวพิมพ์เล็ก, ภาษาไทยเป็น bigram)"""
+    tokens = []
+    for thai, word in _TOKEN_RE.findall((text or '')[:MAX_FIELD_LENGTH].casefold()):
+        if thai:
+            tokens.extend(_thai_tokens(thai))
+        else:
+            tokens.append(word[:TOKEN_MAX_LENGTH])
+    return tokens
+
+
+def query_terms(query):
+    """
+    คำค้น -> [(token, is_prefix)]
+    คำภาษาอังกฤษ/ตัวเลขคำสุดท้ายค้นแบบขึ้นต้นด้วย (พิมพ์ยังไม่จบ), ภาษาไทยตัวเดียวก็ค้นแบบขึ้นต้นด้วย
+    """
+    matches = _TOKEN_RE.findall((query or '').casefold())
+    terms = []
+    for index, (thai, word) in enumerate(matches):
+        if thai:
+            terms.extend((token, len(thai) == 1) for token in _thai_tokens(thai))
+        else:
+            terms.append((word[:TOKEN_MAX_LENGTH], index == len(matches) - 1))
+    return list(dict.fromkeys(terms))[:MAX_QUERY_TERMS]
+
+
+def _weighted_tokens(fields):
+    """[(text, weight)] -> Counter(token -> น้ำหนักรวม)"""
+    counts = Counter()
+    for text, weight in fields:
+        for token in tokenize(text):
+            counts[token] += weight
+    return Counter({token: min(weight, MAX_TOKEN_WEIGHT) for token, weight in counts.items()})
+
+
+# ------------------------------------------
+# Indexing
+# ------------------------------------------
+
+def _snippet(text):
+    return (text or '')[:255]
+
+
+def _documents(kind, objects):
+    """object ของ model -> [(SearchDocument, [(text, weight)])] (ดึงข้อมูลบอร์ด/งานที่ขาดด้วย query เดียว)"""
+    if kind == Kind.BOARD:
+        return [
+            (SearchDocument(kind=kind, object_id=board.pk, board_id=board.pk,
+                            title=board.name[:255], snippet=_snippet(board.description)),
+             [(board.name, TITLE_WEIGHT), (board.description, BODY_WEIGHT)])
+            for board in objects
+        ]
+
+    if kind == Kind.TASK:
+        board_ids = dict(List.objects.filter(id__in={task.list_id for task in objects}).values_list('id', 'board_id'))
+        return [
+            (SearchDocument(kind=kind, object_id=task.pk, board_id=board_ids[task.list_id], task_id=task.pk,
+                            title=task.title[:255], snippet=_snippet(task.description)),
+             [(task.title, TITLE_WEIGHT), (task.description, BODY_WEIGHT)])
+            for task in objects
+            if task.list_id in board_ids
+        ]
+
+    # Comment / ChecklistItem -> แสดงชื่องานเป็นหัวข้อ
+    tasks = {
+        row['id']: row
+        for row in Task.objects.filter(id__in={obj.task_id for obj in objects}).values('id', 'title', 'list__board_id')
+    }
+    return [
+        (SearchDocument(kind=kind, object_id=obj.pk, board_id=tasks[obj.task_id]['list__board_id'], task_id=obj.task_id,
+                        title=tasks[obj.task_id]['title'][:255], snippet=_snippet(obj.content)),
+         [(obj.content, BODY_WEIGHT)])
+        for obj in objects
+        if obj.task_id in tasks
+    ]
+
+
+def index_objects(kind, objects):
+    """สร้าง/อัปเดตดัชนีของ object หลายชิ้นพร้อมกัน (ลบของเดิมแล้วเขียนใหม่)"""
+    objects = [obj for obj in objects if obj.pk]
+    if not objects:
+        return
+    documents = _documents(kind, objects)
+    object_ids = [obj.pk for obj in objects]
+
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        SearchDocument.objects.bulk_create([document for document, _ in documents])
+        # MySQL ไม่คืน pk จาก bulk_create -> ดึง id กลับมาด้วย (kind, object_id)
+        document_ids = dict(
+            SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).values_list('object_id', 'id')
+        )
+        SearchToken.objects.bulk_create(
+            [
+                SearchToken(document_id=document_ids[document.object_id], token=token, weight=weight)
+                for document, fields in documents
+                for token, weight in _weighted_tokens(fields).items()
+            ],
+            batch_size=1000,
+        )
+
+        if kind == Kind.TASK:
+            _sync_task_children([document for document, _ in documents])
+
+
+def _sync_task_children(task_documents):
+    # คอมเมนต์/เช็คลิสต์แสดงชื่องาน + อยู่บอร์ดเดียวกับงาน -> ตามให้ทันเมื่อเปลี่ยนชื่อหรือย้ายบอร์ด
+    children = SearchDocument.objects.filter(kind__in=[Kind.COMMENT, Kind.CHECKLIST])
+    by_task = {document.task_id: document for document in task_documents}
+    stale_task_ids = set(
+        children.filter(task_id__in=list(by_task)).values_list('task_id', flat=True).distinct()
+    )
+    for task_id in stale_task_ids:
+        document = by_task[task_id]
+        children.filter(task_id=task_id).update(board_id=document.board_id, title=document.title)
+
+
+def remove_objects(kind, object_ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+INDEXED_MODELS = {
+    Kind.BOARD: Board,
+    Kind.TASK: Task,
+    Kind.COMMENT: Comment,
+    Kind.CHECKLIST: ChecklistItem,
+}
+
+
+def rebuild_index(kind, batch_size=INDEX_BATCH_SIZE):
+    """สร้างดัชนีของ model ทั้งตารางใหม่ (ไล่ตาม pk ทีละ batch) -> จำนวนที่ index"""
+    model = INDEXED_MODELS[kind]
+    total, last_pk = 0, 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return total
+        index_objects(kind, batch)
+        total += len(batch)
+        last_pk = batch[-1].pk
+
+
+# ------------------------------------------
+# Query
+# ------------------------------------------
+
+def _result_url(row):
+    url = reverse('board_detail', args=[row['document__board_id']])
+    if row['document__kind'] != Kind.BOARD:
+        url += f"?task_id={row['document__task_id']}"
+    return url
+
+
+def search(user, query, kinds=None, limit=SEARCH_LIMIT):
+    """
+    ค้นหาในทุกบอร์ดที่ user มีสิทธิ์ (เจ้าของ/สมาชิก) -> list ของผลลัพธ์เรียงตามคะแนน
+    ทุกคำในคำค้นต้องพบในเอกสาร, คะแนน = ผลรวมน้ำหนักของคำที่พบ (หัวข้อ > เนื้อหา)
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    conditions = [Q(token__startswith=token) if prefix else Q(token=token) for token, prefix in terms]
+    matched_terms = reduce(operator.add, [
+        Max(Case(When(condition, then=1), default=0, output_field=IntegerField())) for condition in conditions
+    ])
+    matches = SearchToken.objects.filter(
+        reduce(operator.or_, conditions), document__board_id__in=accessible_board_ids(user),
+    )
+    if kinds:
+        matches = matches.filter(document__kind__in=kinds)
+
+    rows = (
+        matches.values(
+            'document_id', 'document__kind', 'document__object_id', 'document__title', 'document__snippet',
+            'document__board_id', 'document__board__name', 'document__task_id', 'document__updated_at',
+        )
+        .annotate(score=Sum('weight'), matched=matched_terms)
+        .filter(matched=len(terms))
+        .order_by('-score', '-document__updated_at', '-document_id')
+    )
+    if limit:
+        rows = rows[:limit]
+
+    return [{
+        'type': row['document__kind'],
+        'id': row['document__object_id'],
+        'title': row['document__title'],
+        'snippet': row['document__snippet'],
+        'board_id': row['document__board_id'],
+        'board_name': row['document__board__name'],
+        'task_id': row['document__task_id'],
+        'score': row['score'],
+        'url': _result_url(row),
+    } for row in rows]
@@ -0,0 +1,372 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Q, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import User
+
+from .models import Attachment, Board, ChecklistItem, ClassSchedule, Comment, Label, List, Notification, SearchDocument, Task
+from .ics import bump_schedule_version
+from .live import event, publish, task_data
+from .notifications import release_unread
+from .permissions import invalidate_board_access, invalidate_board_members
+from .search import index_objects, remove_objects
+from .snapshot import bump_board_version, create_board_versions
+from .stats import STATS_FIELDS, apply_delta, contribution, diff, task_assignee_ids, task_state
+
+
+# ------------------------------------------
+# Unread Counter: แจ้งเตือนที่ถูกลบตาม (CASCADE)
+# ------------------------------------------
+# ไม่ผูก signal กับ Notification เอง (ทำให้ Django โหลด + ยิง signal ทีละแถว และปิด fast delete)
+# -> ตอนลบตัวแม่ นับแจ้งเตือนที่ยังไม่อ่านที่จะหายไปด้วย GROUP BY ครั้งเดียว (release_unread)
+# ลบจากตัวแม่ชั้นนอกสุดเท่านั้น (เช่น ลบบอร์ด -> ไม่นับซ้ำทีละรายการ/การ์ด)
+# ลบ Notification ตรง ๆ ต้องปรับตัวนับเอง (ดู retention._delete_batch)
+
+NOTIFICATION_PARENTS = [User, Board, List, Task]  # ชั้นนอก -> ชั้นใน
+
+
+def _deleted_with_parent(sender, origin):
+    """origin (สิ่งที่สั่งลบ) เป็นตัวแม่ชั้นนอกกว่า sender -> ตัวแม่จัดการตัวนับไปแล้ว"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in NOTIFICATION_PARENTS and NOTIFICATION_PARENTS.index(model) < NOTIFICATION_PARENTS.index(sender)
+
+
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=Board)
+@receiver(pre_delete, sender=List)
+@receiver(pre_delete, sender=Task)
+def notifications_released(sender, instance, origin=None, **kwargs):
+    if _deleted_with_parent(sender, origin):
+        return
+    if sender is User:
+        # ตัวนับของผู้รับที่ถูกลบหายไปพร้อมกัน -> นับเฉพาะของคนอื่น
+        doomed = (
+            Q(actor=instance) | Q(board__created_by=instance) | Q(task__list__board__created_by=instance)
+        ) & ~Q(recipient=instance)
+    elif sender is Board:
+        doomed = Q(board=instance) | Q(task__list__board=instance)
+    elif sender is List:
+        doomed = Q(task__list=instance)
+    else:
+        doomed = Q(task=instance)
+    release_unread(Notification.objects.filter(doomed))
+
+
+# ------------------------------------------
+# Board Snapshot Invalidation
+# ------------------------------------------
+
+def _task_board_id(task):
+    try:
+        return task.list.board_id
+    except List.DoesNotExist:
+        return None
+
+
+@receiver([post_save, post_delete], sender=Board)
+def board_changed(sender, instance, created=False, raw=False, **kwargs):
+    if created:
+        create_board_versions(instance.pk)
+    else:
+        bump_board_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=List)
+@receiver([post_save, post_delete], sender=Label)
+def board_child_changed(sender, instance, **kwargs):
+    bump_board_version(instance.board_id)
+
+
+@receiver([post_save, post_delete], sender=Task)
+def task_changed(sender, instance, **kwargs):
+    bump_board_version(_task_board_id(instance))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=ChecklistItem)
+@receiver([post_save, post_delete], sender=Attachment)
+def task_child_changed(sender, instance, **kwargs):
+    try:
+        task = instance.task
+    except Task.DoesNotExist:
+        return
+    bump_board_version(_task_board_id(task))
+
+
+@receiver(m2m_changed, sender=Task.assigned_to.through)
+@receiver(m2m_changed, sender=Task.labels.through)
+def task_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_board_version(_task_board_id(instance))
+    elif pk_set:
+        board_ids = set(Task.objects.filter(pk__in=pk_set).values_list('list__board_id', flat=True))
+        bump_board_version(*board_ids)
+
+
+@receiver(m2m_changed, sender=Board.members.through)
+def board_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_board_version(instance.pk)
+    elif pk_set:
+        bump_board_version(*pk_set)
+
+
+@receiver([post_save, post_delete], sender=ClassSchedule)
+def class_schedule_changed(sender, instance, **kwargs):
+    # ตารางเรียนอยู่ใน .ics feed ของ user -> เปลี่ยน ETag (ดู ics.py)
+    bump_schedule_version(instance.user_id)
+
+
+# ------------------------------------------
+# Live Updates (ดู live.py / consumers.BoardConsumer)
+# ------------------------------------------
+
+MOVE_FIELDS = {'list', 'position'}
+
+
+@receiver(post_save, sender=Task)
+def task_live_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    board_id = _task_board_id(instance)
+    if created:
+        publish(board_id, event('task.created', **task_data(instance)))
+    elif update_fields is not None and set(update_fields) <= MOVE_FIELDS:
+        publish(board_id, event('task.moved', id=instance.pk, list_id=instance.list_id, position=instance.position))
+    elif update_fields is not None and set(update_fields) == {'is_archived'}:
+        publish(board_id, event('task.archived', id=instance.pk, is_archived=instance.is_archived))
+    else:
+        publish(board_id, event('task.updated', **task_data(instance)))
+
+
+@receiver(post_delete, sender=Task)
+def task_live_deleted(sender, instance, **kwargs):
+    publish(_task_board_id(instance), event('task.deleted', id=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=ChecklistItem)
+@receiver([post_save, post_delete], sender=Attachment)
+def task_child_live_changed(sender, instance, raw=False, **kwargs):
+    # จำนวนคอมเมนต์ / ความคืบหน้าเช็คลิสต์ / ไฟล์แนบ แสดงบนการ์ด -> การ์ดต้องอัปเดต
+    try:
+        task = instance.task
+    except Task.DoesNotExist:
+        return
+    if not raw:
+        publish(_task_board_id(task), event('task.updated', **task_data(task)))
+
+
+@receiver(m2m_changed, sender=Task.assigned_to.through)
+@receiver(m2m_changed, sender=Task.labels.through)
+def task_relations_live_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # เช่น ลบ Label ออกจากหลายการ์ดพร้อมกัน -> ให้ client โหลดบอร์ดใหม่
+        board_id = getattr(instance, 'board_id', None)
+        if board_id:
+            publish(board_id, event('board.changed'))
+        return
+    publish(_task_board_id(instance), event('task.updated', **task_data(instance)))
+
+
+@receiver(post_save, sender=List)
+def list_live_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if not created and update_fields is not None and set(update_fields) == {'position'}:
+        publish(instance.board_id, event('list.reordered', positions={str(instance.pk): instance.position}))
+    else:
+        publish(instance.board_id, event('list.updated', id=instance.pk, title=instance.title, position=instance.position))
+
+
+@receiver(post_delete, sender=List)
+def list_live_deleted(sender, instance, **kwargs):
+    publish(instance.board_id, event('list.deleted', id=instance.pk))
+
+
+# ------------------------------------------
+# Board Access Cache (ดู permissions.py)
+# ------------------------------------------
+
+@receiver(pre_save, sender=Board)
+def board_owner_before_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    # จำเจ้าของเดิมไว้ (เปลี่ยนเจ้าของ -> เจ้าของเดิมต้องเสียสิทธิ์ทันที)
+    instance._old_owner_id = None
+    if raw or not instance.pk or (update_fields is not None and 'created_by' not in update_fields):
+        return
+    instance._old_owner_id = Board.objects.filter(pk=instance.pk).values_list('created_by_id', flat=True).first()
+
+
+@receiver(post_save, sender=Board)
+def board_access_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_board_members(instance.pk)  # เผื่อเปลี่ยนเจ้าของบอร์ด
+    old_owner_id = getattr(instance, '_old_owner_id', None)
+    if created:
+        invalidate_board_access(instance.created_by_id)
+    elif old_owner_id and old_owner_id != instance.created_by_id:
+        invalidate_board_access(old_owner_id, instance.created_by_id)
+
+
+@receiver(pre_delete, sender=Board)
+def board_access_deleted(sender, instance, **kwargs):
+    member_ids = Board.members.through.objects.filter(board_id=instance.pk).values_list('user_id', flat=True)
+    invalidate_board_access(instance.created_by_id, *member_ids)
+    invalidate_board_members(instance.pk)
+
+
+@receiver(m2m_changed, sender=Board.members.through)
+def board_access_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        invalidate_board_access(instance.pk)  # instance = User
+        board_ids = list(pk_set or ()) if action != 'pre_clear' else list(
+            Board.members.through.objects.filter(user_id=instance.pk).values_list('board_id', flat=True)
+        )
+        invalidate_board_members(*board_ids)
+        if action != 'post_add':
+            for board_id in pk_set or ():
+                publish(board_id, event('member.removed', user_ids=[instance.pk]))
+        return
+
+    user_ids = list(instance.members.values_list('id', flat=True)) if action == 'pre_clear' else list(pk_set or ())
+    invalidate_board_access(*user_ids)
+    invalidate_board_members(instance.pk)
+    if action != 'post_add':
+        # ตัด WebSocket ของคนที่ไม่มีสิทธิ์แล้ว (BoardConsumer ปิดการเชื่อมต่อเอง)
+        publish(instance.pk, event('member.removed', user_ids=user_ids))
+
+
+# ------------------------------------------
+# Board Daily Stats (Rollup)
+# ------------------------------------------
+
+def _stats_relevant(update_fields):
+    return update_fields is None or bool(STATS_FIELDS.intersection(update_fields))
+
+
+@receiver(pre_save, sender=Task)
+def task_stats_before_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    # จำค่าเดิมไว้ก่อนบันทึก (ข้ามถ้าแก้แค่ฟิลด์ที่ไม่เกี่ยวกับสถิติ เช่น position)
+    instance._stats_old = None
+    if raw or not instance.pk or not _stats_relevant(update_fields):
+        return
+    instance._stats_old = (
+        Task.objects.filter(pk=instance.pk)
+        .values('list__board_id', 'created_at', 'completed_at', 'is_completed', 'due_date', 'priority')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Task)
+def task_stats_after_save(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or not (created or _stats_relevant(update_fields)):
+        return
+    old = getattr(instance, '_stats_old', None)
+    if not created and old is None:
+        return
+    new_board_id = _task_board_id(instance)
+    new_state = task_state(instance)
+
+    assignee_ids = ()
+    if not created and (new_state['is_completed'] or old['is_completed']):
+        assignee_ids = task_assignee_ids(instance.pk)
+
+    before = contribution(old.pop('list__board_id'), old, assignee_ids) if old else {}
+    after = contribution(new_board_id, new_state, assignee_ids)
+    apply_delta(diff(before, after))
+
+
+@receiver(pre_delete, sender=Task)
+def task_stats_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Board):
+        return  # ลบทั้งบอร์ด -> แถวสถิติถูกลบตาม (CASCADE) อยู่แล้ว
+    assignee_ids = task_assignee_ids(instance.pk) if instance.is_completed else ()
+    removed = contribution(_task_board_id(instance), task_state(instance), assignee_ids)
+    apply_delta(diff(removed, {}))
+
+
+@receiver(m2m_changed, sender=Task.assigned_to.through)
+def task_stats_assignees_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # ผู้รับผิดชอบของงานที่เสร็จแล้วเปลี่ยน -> ย้ายยอด "งานที่เสร็จต่อคน"
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    sign = 1 if action == 'post_add' else -1
+
+    if not reverse:
+        if not (instance.is_completed and instance.completed_at):
+            return
+        user_ids = pk_set if action != 'pre_clear' else task_assignee_ids(instance.pk)
+        pairs = [(instance, user_id) for user_id in user_ids or ()]
+    else:
+        if action == 'pre_clear':
+            tasks = Task.objects.filter(assigned_to=instance, is_completed=True)
+        else:
+            tasks = Task.objects.filter(pk__in=pk_set or (), is_completed=True)
+        pairs = [(task, instance.pk) for task in tasks.select_related('list')]
+
+    delta = defaultdict(Counter)
+    for task, user_id in pairs:
+        if task.completed_at:
+            delta[(_task_board_id(task), timezone.localdate(task.completed_at))][f"user:{user_id}"] += sign
+    apply_delta(delta)
+
+
+# ------------------------------------------
+# Task Reminders
+# ------------------------------------------
+
+@receiver(m2m_changed, sender=Task.assigned_to.through)
+def task_assignees_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # งานที่เลยเวลาเตือนตอนยังไม่มีคนรับผิดชอบถูกล้าง remind_at ไว้ (reminders.disarm_unassigned)
+    # -> มอบหมายคนแล้วคำนวณใหม่ รอบถัดไปของ send_task_reminders จะเตือนตามปกติ
+    if action != 'post_add':
+        return
+    task_ids = (pk_set or ()) if reverse else [instance.pk]
+    tasks = Task.objects.filter(pk__in=task_ids, remind_at__isnull=True, is_reminded=False, is_completed=False)
+    for task in tasks.exclude(due_date__isnull=True):
+        remind_at = task.compute_remind_at()
+        if remind_at:
+            Task.objects.filter(pk=task.pk).update(remind_at=remind_at)
+
+
+# ------------------------------------------
+# Search Index
+# ------------------------------------------
+
+SEARCH_FIELDS = {
+    Board: (SearchDocument.Kind.BOARD, {'name', 'description'}),
+    Task: (SearchDocument.Kind.TASK, {'title', 'description', 'list'}),
+    Comment: (SearchDocument.Kind.COMMENT, {'content'}),
+    ChecklistItem: (SearchDocument.Kind.CHECKLIST, {'content'}),
+}
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=ChecklistItem)
+def search_index_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    # index ใหม่เฉพาะเมื่อข้อความเปลี่ยน (การลากย้ายการ์ด / ติ๊กเสร็จ ไม่ต้อง index ใหม่)
+    kind, fields = SEARCH_FIELDS[sender]
+    if raw or (update_fields is not None and not fields.intersection(update_fields)):
+        return
+    index_objects(kind, [instance])
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=ChecklistItem)
+def search_index_deleted(sender, instance, **kwargs):
+    # Board / Task ถูกลบ -> เอกสารหายตาม FK (CASCADE) เอง
+    remove_objects(SEARCH_FIELDS[sender][0], [instance.pk])
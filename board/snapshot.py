@@ -0,0 +1,203 @@
+import os
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from users.models import User
+from .models import Attachment, Board, BoardVersion, ChecklistItem, Comment, Label, List, Task
+
+# ==========================================
+# Board Snapshot (ข้อมูลทั้งบอร์ดในรูป JSON + Cache)
+# ==========================================
+# สร้างจาก query จำนวนคงที่ (ไม่ขึ้นกับจำนวนการ์ด) แล้ว cache ไว้ตาม version ของบอร์ด
+# ทุกครั้งที่ Task / List / Label / สมาชิก เปลี่ยน -> bump_board_version() (ดู signals.py)
+# version เก็บใน DB (BoardVersion) ไม่ใช่ใน cache -> job ที่รันใน process อื่น (เช่น rebalance) ก็ทำให้ snapshot หมดอายุได้
+
+SNAPSHOT_TIMEOUT = 60 * 60  # กันข้อมูลที่ไม่ได้ผูก signal (เช่น ชื่อ/รูป user) ค้างนานเกินไป
+
+
+def get_board_version(board_id):
+    """version ปัจจุบันของบอร์ด (อ่านจาก DB -> ทุก process เห็นค่าเดียวกัน)"""
+    return get_board_versions([board_id])[board_id]
+
+
+def get_board_versions(board_ids):
+    """version ของหลายบอร์ดใน query เดียว -> {board_id: version}"""
+    board_ids = set(board_ids)
+    versions = dict(BoardVersion.objects.filter(board_id__in=board_ids).values_list('board_id', 'version'))
+    missing = board_ids - versions.keys()
+    if missing:
+        create_board_versions(*missing)
+        versions.update(dict.fromkeys(missing, 0))
+    return versions
+
+
+def create_board_versions(*board_ids):
+    """สร้างแถว version ให้บอร์ด (เรียกตอนสร้างบอร์ด / ข้ามบอร์ดที่มีแถวแล้วหรือถูกลบไปแล้ว)"""
+    existing = Board.objects.filter(id__in=board_ids).values_list('id', flat=True)
+    BoardVersion.objects.bulk_create(
+        [BoardVersion(board_id=board_id) for board_id in existing], ignore_conflicts=True,
+    )
+
+
+def bump_board_version(*board_ids):
+    """ทำให้ snapshot เดิมของบอร์ดใช้ไม่ได้ (เรียกหลังมีการแก้ไขข้อมูลบอร์ด)"""
+    board_ids = {board_id for board_id in board_ids if board_id is not None}
+    if not board_ids:
+        return
+    # เพิ่มใน DB ด้วย F() -> อยู่ใน transaction เดียวกับการแก้ไข (process อื่นเห็น version ใหม่พร้อมข้อมูลใหม่)
+    # ไม่สร้างแถวที่นี่: ระหว่างลบบอร์ด signal ของการ์ด/ลิสต์ยังเรียกมา หลังแถว version ถูกลบไปแล้ว
+    BoardVersion.objects.filter(board_id__in=board_ids).update(version=F('version') + 1)
+
+
+def get_board_snapshot(board):
+    """อ่าน snapshot จาก cache (ถ้าไม่มีค่อยสร้างใหม่)"""
+    version = get_board_version(board.pk)
+    key = f"board_snapshot_{board.pk}_v{version}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_board_snapshot(board, version)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def build_board_snapshot(board, version=None):
+    """สร้าง snapshot ของบอร์ด (9 query คงที่) คืนค่าเป็น dict ที่ serialize เป็น JSON ได้"""
+    board_id = board.pk
+    active_tasks = {'task__list__board_id': board_id, 'task__is_archived': False}
+
+    lists = list(
+        List.objects.filter(board_id=board_id).order_by('position').values('id', 'title', 'position')
+    )
+
+    comment_count = (
+        Comment.objects.filter(task=OuterRef('pk'))
+        .order_by()
+        .values('task')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    tasks = list(
+        Task.objects.filter(list__board_id=board_id, is_archived=False)
+        .order_by('position', 'id')
+        .annotate(comment_count=Subquery(comment_count, output_field=IntegerField()))
+        .values(
+            'id', 'list_id', 'title', 'description', 'priority', 'due_date', 'remind_days',
+            'is_completed', 'position', 'comment_count',
+        )
+    )
+
+    assignees = defaultdict(list)
+    for task_id, user_id in Task.assigned_to.through.objects.filter(**active_tasks).values_list('task_id', 'user_id'):
+        assignees[task_id].append(user_id)
+
+    task_labels = defaultdict(list)
+    for task_id, label_id in Task.labels.through.objects.filter(**active_tasks).values_list('task_id', 'label_id'):
+        task_labels[task_id].append(label_id)
+
+    checklists = defaultdict(list)
+    for item in ChecklistItem.objects.filter(**active_tasks).values('id', 'task_id', 'content', 'is_completed'):
+        checklists[item.pop('task_id')].append(item)
+
+    file_storage = Attachment._meta.get_field('file').storage
+    attachments = defaultdict(list)
+    for att in Attachment.objects.filter(**active_tasks).order_by('id').values('id', 'task_id', 'file', 'uploaded_at'):
+        filename = os.path.basename(att['file'])
+        attachments[att['task_id']].append({
+            'id': att['id'],
+            'filename': filename,
+            'url': file_storage.url(att['file']),
+            'is_image': filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')),
+            'uploaded_at': timezone.localtime(att['uploaded_at']).strftime('%d/%m/%Y %H:%M'),
+        })
+
+    member_ids = [board.created_by_id] + [
+        user_id for user_id in Board.members.through.objects.filter(board_id=board_id).values_list('user_id', flat=True)
+        if user_id != board.created_by_id
+    ]
+    user_ids = set(member_ids)
+    for ids in assignees.values():
+        user_ids.update(ids)
+
+    image_storage = User._meta.get_field('profile_image').storage
+    users = {}
+    for u in User.objects.filter(id__in=user_ids).values('id', 'username', 'profile_image'):
+        users[u['id']] = {
+            'id': u['id'],
+            'username': u['username'],
+            'initial': u['username'][:1].upper(),
+            'avatar': image_storage.url(u['profile_image']) if u['profile_image'] else None,
+        }
+
+    labels = list(Label.objects.filter(board_id=board_id).order_by('id').values('id', 'name', 'color'))
+
+    tasks_by_list = defaultdict(list)
+    for task in tasks:
+        task_id = task['id']
+        task['due_date'] = task['due_date'].isoformat() if task['due_date'] else None
+        task['comment_count'] = task['comment_count'] or 0
+        task['assignees'] = assignees.get(task_id, [])
+        task['labels'] = task_labels.get(task_id, [])
+        task['checklist'] = checklists.get(task_id, [])
+        task['attachments'] = attachments.get(task_id, [])
+        tasks_by_list[task.pop('list_id')].append(task)
+
+    for lst in lists:
+        lst['tasks'] = tasks_by_list.get(lst['id'], [])
+
+    return {
+        'board_id': board_id,
+        'version': version if version is not None else get_board_version(board_id),
+        'lists': lists,
+        'members': member_ids,
+        'users': {str(user_id): user for user_id, user in users.items()},
+        'labels': labels,
+    }
+
+
+def hydrate_snapshot(snapshot):
+    """
+    แปลง snapshot (เก็บแค่ ID) ให้พร้อมใช้ใน Template:
+    แทน ID ด้วย dict ของ user/label, แปลง due_date กลับเป็น datetime และคำนวณ due_status ตามเวลาปัจจุบัน
+    """
+    users = snapshot['users']
+    labels = {label['id']: label for label in snapshot['labels']}
+    now = timezone.now()
+    soon = now + timedelta(days=1)
+
+    lists = []
+    for lst in snapshot['lists']:
+        tasks = []
+        for task in lst['tasks']:
+            due_date = parse_datetime(task['due_date']) if task['due_date'] else None
+            if not due_date:
+                due_status = 'no_date'
+            elif due_date < now:
+                due_status = 'overdue'
+            elif due_date < soon:
+                due_status = 'soon'
+            else:
+                due_status = 'future'
+
+            tasks.append({
+                **task,
+                'due_date': due_date,
+                'due_status': due_status,
+                'assignee_ids': task['assignees'],
+                'assignees': [users[str(user_id)] for user_id in task['assignees'] if str(user_id) in users],
+                'label_ids': task['labels'],
+                'labels': [labels[label_id] for label_id in task['labels'] if label_id in labels],
+            })
+        lists.append({**lst, 'tasks': tasks})
+
+    return {
+        'board_id': snapshot['board_id'],
+        'version': snapshot['version'],
+        'lists': lists,
+        'members': [users[str(user_id)] for user_id in snapshot['members'] if str(user_id) in users],
+        'labels': snapshot['labels'],
+    }
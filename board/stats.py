@@ -0,0 +1,210 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import BoardDailyStats, Task
+
+# ==========================================
+# Board Daily Stats (Rollup)
+# ==========================================
+# งาน 1 ชิ้นนับเข้าแถวสถิติได้สูงสุด 3 วัน: วันที่สร้าง / วันที่เสร็จ / วันครบกำหนด (ถ้ายังไม่เสร็จ)
+# ทุกครั้งที่ Task เปลี่ยน -> คำนวณส่วนที่นับ "ก่อน" กับ "หลัง" แล้วบวก/ลบเฉพาะส่วนต่าง
+# งานที่เขียนแบบ bulk (update / bulk_update) ไม่ผ่าน signal -> rebuild_board_stats จะจัดให้ตรงอีกที
+
+STATS_FIELDS = {'list', 'created_at', 'completed_at', 'is_completed', 'due_date', 'priority'}
+COUNT_FIELDS = ['created', 'completed', 'overdue', 'completed_high', 'completed_medium', 'completed_low']
+TREND_RANGES = [7, 30, 90, 365]
+
+
+def _day(dt):
+    return timezone.localdate(dt) if timezone.is_aware(dt) else dt.date()
+
+
+def task_state(task):
+    """ค่าที่มีผลต่อสถิติของ task (ใช้เทียบก่อน/หลังแก้ไข)"""
+    return {
+        'created_at': task.created_at,
+        'completed_at': task.completed_at,
+        'is_completed': task.is_completed,
+        'due_date': task.due_date,
+        'priority': task.priority,
+    }
+
+
+def contribution(board_id, state, assignee_ids=()):
+    """ส่วนที่ task นับเข้าไปในสถิติ -> {(board_id, date): Counter}"""
+    result = defaultdict(Counter)
+    if board_id is None or state is None:
+        return result
+    if state['created_at']:
+        result[(board_id, _day(state['created_at']))]['created'] += 1
+    if state['is_completed'] and state['completed_at']:
+        counts = result[(board_id, _day(state['completed_at']))]
+        counts['completed'] += 1
+        counts[f"completed_{state['priority']}"] += 1
+        for user_id in assignee_ids:
+            counts[f"user:{user_id}"] += 1
+    elif state['due_date']:
+        result[(board_id, _day(state['due_date']))]['overdue'] += 1
+    return result
+
+
+def diff(old, new):
+    """new - old (ตัดค่าที่เป็น 0 ทิ้ง)"""
+    delta = defaultdict(Counter)
+    for key in set(old) | set(new):
+        counts = Counter(new.get(key, {}))
+        counts.subtract(old.get(key, {}))
+        counts = Counter({field: value for field, value in counts.items() if value})
+        if counts:
+            delta[key] = counts
+    return delta
+
+
+def apply_delta(delta):
+    """บวก/ลบค่าลงแถวสถิติ (สร้างแถวใหม่เฉพาะเมื่อมีค่าบวก กันสร้างแถวให้บอร์ดที่กำลังถูกลบ)"""
+    for (board_id, date), counts in delta.items():
+        with transaction.atomic():
+            row = BoardDailyStats.objects.select_for_update().filter(board_id=board_id, date=date).first()
+            if row is None:
+                if not any(value > 0 for value in counts.values()):
+                    continue
+                try:
+                    with transaction.atomic():
+                        row = BoardDailyStats.objects.create(board_id=board_id, date=date)
+                except IntegrityError:
+                    row = BoardDailyStats.objects.select_for_update().get(board_id=board_id, date=date)
+
+            for field, value in counts.items():
+                if field.startswith('user:'):
+                    user_id = field.split(':', 1)[1]
+                    total = row.assignee_completed.get(user_id, 0) + value
+                    if total > 0:
+                        row.assignee_completed[user_id] = total
+                    else:
+                        row.assignee_completed.pop(user_id, None)
+                else:
+                    setattr(row, field, max(getattr(row, field) + value, 0))
+
+            if row.assignee_completed or any(getattr(row, field) for field in COUNT_FIELDS):
+                row.save()
+            else:
+                row.delete()  # ไม่เหลือค่าแล้ว -> ลบแถวทิ้ง (ตรงกับผลของ rebuild)
+
+
+def task_assignee_ids(task_id):
+    return list(Task.assigned_to.through.objects.filter(task_id=task_id).values_list('user_id', flat=True))
+
+
+def record_new_tasks(tasks, board_id):
+    """นับงานที่สร้างด้วย bulk_create (ไม่ผ่าน signal) -> assignee นับตอนเสร็จภายหลัง"""
+    delta = defaultdict(Counter)
+    for task in tasks:
+        for key, counts in contribution(board_id, task_state(task)).items():
+            delta[key].update(counts)
+    apply_delta(delta)
+
+
+def record_changed_tasks(changes, board_id):
+    """
+    นับส่วนต่างของงานที่แก้ด้วย bulk_update (ไม่ผ่าน signal) -> changes = [(state เดิม, task)]
+    สถานะเสร็จไม่เปลี่ยนในการแก้แบบนี้ -> ยอดต่อ assignee หักล้างกันเอง ไม่ต้องดึงมา
+    """
+    delta = defaultdict(Counter)
+    for old_state, task in changes:
+        for key, counts in diff(contribution(board_id, old_state), contribution(board_id, task_state(task))).items():
+            delta[key].update(counts)
+    apply_delta(delta)
+
+
+# ------------------------------------------
+# Read (Trend)
+# ------------------------------------------
+
+def trend(board_ids, days):
+    """
+    แนวโน้มย้อนหลัง `days` วัน จากตาราง rollup (1 query, ไม่ขึ้นกับจำนวนงาน)
+    -> {'labels', 'created', 'completed', 'overdue'}
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = {
+        row['date']: row
+        for row in BoardDailyStats.objects.filter(board_id__in=board_ids, date__gte=start, date__lte=today)
+        .values('date')
+        .annotate(created=Sum('created'), completed=Sum('completed'), overdue=Sum('overdue'))
+    }
+
+    result = {'labels': [], 'created': [], 'completed': [], 'overdue': []}
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day, {})
+        result['labels'].append(day.strftime('%d/%m') if days <= 90 else day.strftime('%d/%m/%y'))
+        for field in ('created', 'completed', 'overdue'):
+            result[field].append(row.get(field) or 0)
+    return result
+
+
+# ------------------------------------------
+# Rebuild (Backfill)
+# ------------------------------------------
+
+def rebuild(board_ids, since=None):
+    """คำนวณแถวสถิติของบอร์ดใหม่ทั้งหมดจากตาราง Task (ตั้งแต่วันที่ since ถ้าระบุ) -> จำนวนแถว"""
+    tasks = Task.objects.filter(list__board_id__in=board_ids)
+    rows = defaultdict(Counter)
+
+    def group(queryset, date_field, **extra):
+        if since:
+            queryset = queryset.filter(**{f"{date_field}__date__gte": since})
+        return (
+            queryset.annotate(day=TruncDate(date_field))
+            .values('list__board_id', 'day', *extra.get('values', []))
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+
+    for row in group(tasks, 'created_at'):
+        rows[(row['list__board_id'], row['day'])]['created'] += row['total']
+    for row in group(tasks.filter(is_completed=True, completed_at__isnull=False), 'completed_at', values=['priority']):
+        counts = rows[(row['list__board_id'], row['day'])]
+        counts['completed'] += row['total']
+        counts[f"completed_{row['priority']}"] += row['total']
+    for row in group(tasks.filter(is_completed=False, due_date__isnull=False), 'due_date'):
+        rows[(row['list__board_id'], row['day'])]['overdue'] += row['total']
+
+    completed_assignments = Task.assigned_to.through.objects.filter(
+        task__list__board_id__in=board_ids, task__is_completed=True, task__completed_at__isnull=False,
+    )
+    if since:
+        completed_assignments = completed_assignments.filter(task__completed_at__date__gte=since)
+    for row in (
+        completed_assignments.annotate(day=TruncDate('task__completed_at'))
+        .values('task__list__board_id', 'day', 'user_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    ):
+        rows[(row['task__list__board_id'], row['day'])][f"user:{row['user_id']}"] += row['total']
+
+    objects = []
+    for (board_id, date), counts in rows.items():
+        objects.append(BoardDailyStats(
+            board_id=board_id,
+            date=date,
+            assignee_completed={
+                field.split(':', 1)[1]: value for field, value in counts.items() if field.startswith('user:')
+            },
+            **{field: counts.get(field, 0) for field in COUNT_FIELDS},
+        ))
+
+    with transaction.atomic():
+        existing = BoardDailyStats.objects.filter(board_id__in=board_ids)
+        if since:
+            existing = existing.filter(date__gte=since)
+        existing.delete()
+        BoardDailyStats.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
@@ -1,3 +1,2218 @@
-from django.test import TestCase
+import base64
+import importlib
+import json
+import re
+import threading
+import time as clock
+from datetime import time, timedelta
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httplib2
+from googleapiclient.errors import HttpError
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import User
+from . import google_calendar, ics, jobs, live, permissions, reporting, search, stats
+from .activity import (
+    EXPORT_FIELDS, activity_queryset, export_lines as export_activity_lines, log as log_activity, render_action,
+    serialize as serialize_activity,
+)
+from .forms import TaskForm
+from .models import (
+    ActivityLog, Board, BoardDailyStats, BoardInvitation, ChecklistItem, ClassSchedule, Comment, GoogleCalendarSync, Job, Label, List,
+    Notification, NotificationCounter, SearchDocument, Task,
+)
+from .my_tasks import bucket_counts, my_tasks_page, my_tasks_queryset
+from .notifications import RECENT_LIMIT, adjust_unread, count_unread, get_unread_counts, notify, recent_queryset
+from .ordering import POSITION_GAP, reorder_lists, reorder_tasks
+from .routing import websocket_urlpatterns
+from .reminders import claim_due_reminders, due_reminders, send_due_reminders
+from .retention import _delete_in_batches, prune_notifications, retention_stats
+from .snapshot import bump_board_version, get_board_snapshot, get_board_version, get_board_versions
+
+
+# ==========================================
+# Helpers
+# ==========================================
+
+# cache แยกของเทสต์ (ไม่ไปล้าง cache กลางที่ใช้ร่วมกับ process อื่น)
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'board-tests'}}
+
+
+def make_board(name='Board', user=None):
+    user = user or User.objects.create_user(username=f"owner-{name}", password='pass')
+    return Board.objects.create(name=name, created_by=user)
+
+
+def make_tasks(target_list, count, **fields):
+    # bulk_create -> ไม่ผ่าน signal ทีละแถว (fixture ขนาด 1000 แถวสร้างเร็ว)
+    return Task.objects.bulk_create([
+        Task(list=target_list, title=f"Task {index}", position=index * POSITION_GAP, **fields)
+        for index in range(1, count + 1)
+    ])
+
+
+# ==========================================
+# Ordering: reorder ใช้ query คงที่ ไม่ขึ้นกับจำนวนแถว
+# ==========================================
+
+class ReorderQueryCountTests(TestCase):
+    SIZES = (10, 100, 1000)
+    # SAVEPOINT + ล็อกแถวแม่ + อ่าน position เดิม + UPDATE ... CASE WHEN + RELEASE + bump version
+    REORDER_QUERIES = 6
+
+    def test_reorder_tasks_query_count_is_constant(self):
+        board = make_board()
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                target_list = List.objects.create(board=board, title=f"List {size}", position=size)
+                ids = [task.id for task in make_tasks(target_list, size)]
+
+                with self.assertNumQueries(self.REORDER_QUERIES):
+                    updated = reorder_tasks(target_list, ids[::-1])
+
+                self.assertEqual(updated, size)
+                self.assertEqual(
+                    list(Task.objects.filter(list=target_list).order_by('position').values_list('id', flat=True)),
+                    ids[::-1],
+                )
+
+    def test_reorder_lists_query_count_is_constant(self):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                board = make_board(f"Board {size}")
+                lists = List.objects.bulk_create([
+                    List(board=board, title=f"List {index}", position=index * POSITION_GAP)
+                    for index in range(1, size + 1)
+                ])
+                ids = [lst.id for lst in lists]
+
+                with self.assertNumQueries(self.REORDER_QUERIES):
+                    reorder_lists(board.id, ids[::-1])
+
+                self.assertEqual(
+                    list(List.objects.filter(board=board).order_by('position').values_list('id', flat=True)),
+                    ids[::-1],
+                )
+
+    def test_reorder_without_changes_skips_update(self):
+        board = make_board()
+        target_list = List.objects.create(board=board, title='List', position=POSITION_GAP)
+        ids = [task.id for task in make_tasks(target_list, 100)]
+
+        # ลำดับเดิม -> ไม่มีแถวไหนเปลี่ยน: ไม่ UPDATE และไม่ bump version
+        with self.assertNumQueries(4):
+            self.assertEqual(reorder_tasks(target_list, ids), 0)
+
+
+# ==========================================
+# Indexes: query ที่ใช้บ่อยต้องไม่ full scan (ตรวจด้วย EXPLAIN บน DB ที่มีข้อมูล)
+# ==========================================
+
+def _mysql_full_scans(node):
+    # EXPLAIN FORMAT=JSON ของ MySQL: ตารางที่ access_type = ALL คือ full table scan
+    if isinstance(node, list):
+        return [scan for item in node for scan in _mysql_full_scans(item)]
+    if not isinstance(node, dict):
+        return []
+    scans = [f"ALL {node.get('table_name')}"] if node.get('access_type') == 'ALL' else []
+    return scans + [scan for value in node.values() for scan in _mysql_full_scans(value)]
+
+
+def full_scans(queryset):
+    """ขั้นตอนใน EXPLAIN ที่อ่านทั้งตาราง (รองรับ SQLite / MySQL / PostgreSQL)"""
+    if connection.vendor == 'mysql':
+        return _mysql_full_scans(json.loads(queryset.explain(format='json')))
+    plan = queryset.explain()
+    if connection.vendor == 'postgresql':
+        return [line.strip() for line in plan.splitlines() if 'Seq Scan' in line]
+    # SQLite: "SCAN <table>" = อ่านทั้งตาราง / "SEARCH <table> USING INDEX ..." = ใช้ index
+    return [line.strip() for line in plan.splitlines() if re.search(r'\bSCAN\b', line)]
+
+
+class HotQueryIndexTests(TestCase):
+    USERS = 20
+    PER_USER = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username=f"user{index}") for index in range(cls.USERS)])
+        cls.user = users[0]
+        cls.board = make_board('Indexed', cls.user)
+        boards = [cls.board] + [make_board(f"Other {index}", user) for index, user in enumerate(users[1:])]
+
+        now = timezone.now()
+        tasks = []
+        for board in boards:
+            for list_index in range(3):
+                lst = List.objects.create(board=board, title=f"List {list_index}", position=list_index)
+                tasks += make_tasks(
+                    lst, 10, due_date=now + timedelta(days=list_index), remind_at=now + timedelta(days=list_index - 1),
+                )
+        cls.list = cls.board.lists.first()
+
+        Notification.objects.bulk_create([
+            Notification(recipient=user, actor=cls.user, board=cls.board, message='msg', is_read=index % 3 == 0)
+            for user in users for index in range(cls.PER_USER)
+        ])
+        ActivityLog.objects.bulk_create([
+            ActivityLog(board=board, actor=cls.user, verb=ActivityLog.Verb.TASK_CREATED)
+            for board in boards for _ in range(cls.PER_USER)
+        ])
+        ClassSchedule.objects.bulk_create([
+            ClassSchedule(user=user, subject_name=f"Subject {index}", day=day,
+                          start_time=time(8 + index), end_time=time(9 + index))
+            for user in users for day, _ in ClassSchedule.DAYS for index in range(3)
+        ])
+        Task.assigned_to.through.objects.bulk_create([
+            Task.assigned_to.through(task_id=task.id, user_id=cls.user.id) for task in tasks[::2]
+        ])
+        # ให้ planner มีสถิติจริงของข้อมูล (เหมือน production ที่ ANALYZE แล้ว)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoFullScan(self, queryset):
+        scans = full_scans(queryset)
+        self.assertEqual(scans, [], f"full scan:\n{queryset.explain()}")
+
+    def test_unread_count_uses_index(self):
+        unread = Notification.objects.filter(recipient_id__in=[self.user.id], is_read=False)
+        self.assertNoFullScan(unread.values('recipient_id').order_by())
+        self.assertEqual(count_unread([self.user.id]), {self.user.id: self.PER_USER - len(range(0, self.PER_USER, 3))})
+
+    def test_recent_notifications_uses_index(self):
+        self.assertNoFullScan(recent_queryset(self.user.id)[:RECENT_LIMIT])
+
+    def test_tasks_of_list_use_index(self):
+        self.assertNoFullScan(Task.objects.filter(list=self.list, is_archived=False).order_by('position'))
+        self.assertNoFullScan(
+            Task.objects.filter(list__board_id=self.board.id, is_archived=False).order_by('position', 'id')
+        )
+
+    def test_reminder_scan_uses_index(self):
+        self.assertNoFullScan(due_reminders())
+
+    def test_board_activity_uses_index(self):
+        self.assertNoFullScan(activity_queryset(self.board.id)[:50])
+        self.assertNoFullScan(activity_queryset(self.board.id, actor_id=self.user.id)[:50])
+
+    def test_class_schedule_uses_index(self):
+        self.assertNoFullScan(ClassSchedule.objects.filter(user=self.user).order_by('day', 'start_time'))
+
+
+# ==========================================
+# Calendar API: query คงที่ + ตรวจช่วงวันที่
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES)
+class CalendarEventsTests(TestCase):
+    # session + user + งานในช่วง (รวมชื่อบอร์ด) + ตารางเรียน / บอร์ดที่เข้าถึงได้อ่านจาก cache
+    CALENDAR_QUERIES = 4
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='calendar', password='pass')
+        self.client.force_login(self.user)
+        self.now = timezone.now()
+        self.url = reverse('api_calendar_events')
+
+    def add_board(self, count):
+        board = make_board(f"Board {count}", self.user)
+        lst = List.objects.create(board=board, title='List', position=POSITION_GAP)
+        # ครึ่งหนึ่งอยู่ในช่วง 1 สัปดาห์ที่ขอ อีกครึ่งอยู่นอกช่วง
+        make_tasks(lst, count, due_date=self.now)
+        make_tasks(lst, count, due_date=self.now + timedelta(days=60))
+        return board
+
+    def get_events(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [event for event in response.json() if event['extendedProps'].get('type') == 'task']
+
+    def test_query_count_does_not_grow_with_tasks_or_boards(self):
+        params = {
+            'board_id': 'all',
+            'start': (self.now - timedelta(days=3)).date().isoformat(),
+            'end': (self.now + timedelta(days=4)).date().isoformat(),
+        }
+        expected = 0
+        for count in (10, 200):
+            with self.subTest(count=count):
+                self.add_board(count)
+                expected += count
+                self.get_events(**params)  # อุ่น cache บอร์ดที่เข้าถึงได้ (ถูกล้างตอนสร้างบอร์ดใหม่)
+
+                with self.assertNumQueries(self.CALENDAR_QUERIES):
+                    events = self.get_events(**params)
+                self.assertEqual(len(events), expected)
+
+    def test_default_range_excludes_far_tasks(self):
+        board = self.add_board(5)
+        lst = board.lists.get()
+        make_tasks(lst, 3, due_date=self.now + timedelta(days=800))
+        self.assertEqual(len(self.get_events()), 10)
+
+    def test_invalid_range_returns_400(self):
+        start = self.now.date().isoformat()
+        end = (self.now + timedelta(days=7)).date().isoformat()
+        cases = {
+            'unparseable start': {'start': 'not-a-date', 'end': end},
+            'unparseable end': {'start': start, 'end': '2026-13-45'},
+            'inverted': {'start': end, 'end': start},
+            'empty range': {'start': start, 'end': start},
+        }
+        for name, params in cases.items():
+            with self.subTest(name):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
+
+
+# ==========================================
+# Job Queue: retry + exponential backoff ผ่าน WorkerPool
+# ==========================================
+
+class StubWebhook(BaseHTTPRequestHandler):
+    """HTTP server ในเครื่องแทน Discord: ตอบตาม status ใน `statuses` ทีละครั้ง (หมดแล้วตอบ 204)"""
+    statuses = []
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.received.append(json.loads(body))
+        self.send_response(self.statuses.pop(0) if self.statuses else 204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', DEFAULT_FROM_EMAIL='board@example.com',
+)
+class WorkerPoolRetryTests(TransactionTestCase):
+    # worker เป็น thread แยก (connection แยก) -> ต้องเห็นข้อมูลที่ commit แล้ว จึงใช้ TransactionTestCase
+    RETRY_BASE = 0.05
+
+    def setUp(self):
+        # ส่งงานเข้า pool ของเทสต์เอง (ไม่ให้ enqueue ส่งเข้า pool กลางของโปรเซสด้วย)
+        for name, value in (('JOB_RETRY_BASE_SECONDS', self.RETRY_BASE), ('JOB_RUN_IN_PROCESS', False)):
+            patcher = mock.patch.object(jobs, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.pool = jobs.WorkerPool(max_workers=2)
+
+    def start_webhook(self, *statuses):
+        StubWebhook.statuses = list(statuses)
+        StubWebhook.received = []
+        server = HTTPServer(('127.0.0.1', 0), StubWebhook)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/api/webhooks/1/token"
+
+    def submit(self, job):
+        self.pool.submit(job.pk, job.destination)
+        self.pool.join()
+        job.refresh_from_db()
+        return job
+
+    def wait_for(self, job, status, timeout=5):
+        # retry ถูกนัดด้วย Timer (join() ไม่รอ) -> poll จนสถานะเปลี่ยน
+        deadline = clock.monotonic() + timeout
+        while clock.monotonic() < deadline:
+            job.refresh_from_db()
+            if job.status == status and job.locked_at is None:
+                self.pool.join()
+                return job
+            clock.sleep(0.02)
+        self.fail(f"{job} did not reach {status}")
+
+    def test_retry_delay_doubles_and_is_capped(self):
+        self.assertEqual(
+            [jobs.retry_delay(attempt) for attempt in range(1, 5)],
+            [self.RETRY_BASE, self.RETRY_BASE * 2, self.RETRY_BASE * 4, self.RETRY_BASE * 8],
+        )
+        self.assertEqual(jobs.retry_delay(100), 3600)
+
+    def test_failed_webhook_is_retried_after_backoff(self):
+        url = self.start_webhook(500)
+        job = jobs.enqueue_discord('hello', url)
+
+        before = timezone.now()
+        job = self.submit(job)
+        # ครั้งแรกได้ 500 -> กลับเป็น pending พร้อม run_at เลื่อนไปตาม backoff
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+        self.assertIn('500', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=self.RETRY_BASE))
+
+        job = self.wait_for(job, Job.Status.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual([payload['content'] for payload in StubWebhook.received], ['hello', 'hello'])
+
+    def test_job_gives_up_after_max_attempts(self):
+        url = self.start_webhook(500, 500, 500)
+        job = jobs.enqueue('discord', {'webhook_url': url, 'content': 'x'}, destination='discord:test', max_attempts=2)
+
+        self.submit(job)
+        job = self.wait_for(job, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(len(StubWebhook.received), 2)
+
+    def test_email_job_sends_through_mail_backend(self):
+        job = self.submit(jobs.enqueue_email('Subject', 'Body', ['member@example.com', '']))
+
+        self.assertEqual((job.status, job.attempts), (Job.Status.DONE, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['member@example.com'])
+
+
+# ==========================================
+# Google Calendar: ยิงหลายปฏิทินพร้อมกัน + cache
+# ==========================================
+
+class FakeCalendarService:
+    """แทน service ที่ build() คืนมา: events().list(...).execute() คืน Event ตาม calendarId"""
+
+    def __init__(self, events, calls, barrier=None, failing=()):
+        self.events_by_calendar = events
+        self.calls = calls
+        self.barrier = barrier
+        self.failing = failing
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        # service ตัวเดียวถูกใช้จากหลาย thread -> แต่ละ request ถือ params ของตัวเอง
+        return mock.Mock(execute=lambda: self._execute(params))
+
+    def _execute(self, params):
+        self.calls.append((params['calendarId'], threading.current_thread().name))
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)  # ผ่านได้ก็ต่อเมื่อทุกปฏิทินถูกยิงพร้อมกัน
+        if params['calendarId'] in self.failing:
+            raise RuntimeError('quota exceeded')
+        return {'items': self.events_by_calendar.get(params['calendarId'], [])}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FetchEventsTests(TestCase):
+    CALENDARS = ['work', 'class', 'club']
+
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        self.events = {cal_id: [{'id': f"{cal_id}-1", 'summary': cal_id}] for cal_id in self.CALENDARS}
+        # token ต่างกันทุกเทสต์ -> thread ใน pool ไม่ใช้ service ที่ cache ไว้จากเทสต์ก่อน
+        self.creds = {'token': f"token-{self._testMethodName}"}
+        self.time_min = timezone.now()
+
+    def patch_build(self, **kwargs):
+        service = FakeCalendarService(self.events, self.calls, **kwargs)
+        patcher = mock.patch.object(google_calendar, 'build', return_value=service)
+        build = patcher.start()
+        self.addCleanup(patcher.stop)
+        return build
+
+    def fetch(self):
+        return google_calendar.fetch_events(1, self.creds, self.CALENDARS, self.time_min)
+
+    def test_calendars_are_fetched_concurrently(self):
+        self.patch_build(barrier=threading.Barrier(len(self.CALENDARS)))
+
+        self.assertEqual(self.fetch(), self.events)
+        self.assertEqual(sorted(cal_id for cal_id, _ in self.calls), sorted(self.CALENDARS))
+        self.assertTrue(all(name.startswith('google-calendar') for _, name in self.calls))
+
+    def test_second_fetch_is_served_from_cache(self):
+        build = self.patch_build()
+
+        first = self.fetch()
+        self.assertEqual(len(self.calls), len(self.CALENDARS))
+        self.assertEqual(self.fetch(), first)
+        self.assertEqual(len(self.calls), len(self.CALENDARS))  # ไม่ยิง Google ซ้ำ
+        self.assertTrue(all(call.args[:2] == ('calendar', 'v3') for call in build.call_args_list))
+
+    def test_failed_calendar_is_skipped_and_not_cached(self):
+        self.patch_build(failing={'club'})
+
+        self.assertEqual(set(self.fetch()), {'work', 'class'})
+        self.calls.clear()
+        self.fetch()
+        self.assertEqual([cal_id for cal_id, _ in self.calls], ['club'])  # รอบหน้าลองเฉพาะตัวที่ error
+
+
+# ==========================================
+# Notification Retention: ลบเป็น batch + ปรับตัวนับ unread ครั้งเดียวต่อ batch
+# ==========================================
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+        self.board = make_board('Retention', self.alice)
+        lst = List.objects.create(board=self.board, title='List', position=POSITION_GAP)
+        self.task = Task.objects.create(list=lst, title='Task', position=POSITION_GAP)
+
+    def notify(self, recipient, count, is_read=False, days_ago=0, task=None):
+        rows = Notification.objects.bulk_create([
+            Notification(recipient=recipient, actor=self.alice, board=self.board, task=task,
+                         message='msg', is_read=is_read)
+            for _ in range(count)
+        ])
+        Notification.objects.filter(id__in=[row.id for row in rows]).update(
+            created_at=timezone.now() - timedelta(days=days_ago),
+        )
+
+    def assertCountersMatch(self):
+        users = [self.alice.id, self.bob.id]
+        real = count_unread(users)
+        self.assertEqual(get_unread_counts(users), {user_id: real.get(user_id, 0) for user_id in users})
+
+    def test_delete_queries_do_not_grow_with_rows(self):
+        for count in (10, 300):
+            with self.subTest(count=count):
+                self.notify(self.alice, count)
+                self.notify(self.bob, count * 2)
+                get_unread_counts([self.alice.id, self.bob.id])  # สร้างแถวตัวนับไว้ก่อน
+
+                # id + savepoint + ล็อก/อ่านแถวยังไม่อ่าน + DELETE + UPDATE ตัวนับ 2 ค่า + release + id (ว่าง)
+                with self.assertNumQueries(8):
+                    deleted = _delete_in_batches(Notification.objects.all(), batch_size=1000)
+                self.assertEqual(deleted, count * 3)
+                self.assertCountersMatch()
+
+    def test_prune_keeps_unread_counters_in_sync(self):
+        self.notify(self.alice, 5, is_read=True, days_ago=60)      # หมดอายุ -> ลบ
+        self.notify(self.alice, 3, days_ago=5, task=self.task)     # digest ยังไม่อ่าน
+        self.notify(self.bob, 2, days_ago=5, task=self.task)
+        self.notify(self.bob, 1, is_read=True, days_ago=2, task=self.task)  # แถวล่าสุดอ่านแล้ว -> digest ยังไม่อ่าน
+        self.assertEqual(get_unread_counts([self.alice.id, self.bob.id]), {self.alice.id: 3, self.bob.id: 2})
+
+        with mock.patch('board.signals.release_unread') as cascade_release:
+            result = prune_notifications(batch_size=2)
+
+        cascade_release.assert_not_called()  # ลบแบบ raw -> ปรับตัวนับเองต่อ batch ไม่ผ่าน signal
+        self.assertEqual((result['expired'], result['digests'], result['collapsed']), (5, 2, 4))
+        self.assertEqual(get_unread_counts([self.alice.id, self.bob.id]), {self.alice.id: 1, self.bob.id: 1})
+        self.assertCountersMatch()
+
+    def digest_row(self, recipient, task):
+        return Notification.objects.get(recipient=recipient, task=task)
+
+    def test_digest_keeps_newest_row_with_count_and_read_state(self):
+        other = Task.objects.create(list=self.task.list, title='Other', position=2 * POSITION_GAP)
+        self.notify(self.alice, 3, is_read=True, days_ago=5, task=self.task)   # อ่านครบ -> digest อ่านแล้ว
+        self.notify(self.alice, 2, is_read=True, days_ago=4, task=other)
+        self.notify(self.alice, 1, days_ago=3, task=other)                     # มีแถวยังไม่อ่าน -> digest ยังไม่อ่าน
+        self.notify(self.bob, 1, days_ago=5, task=self.task)                   # แถวเดียว -> ไม่ต้องรวบ
+        newest = {
+            task.id: Notification.objects.filter(recipient=self.alice, task=task).latest('id').id
+            for task in (self.task, other)
+        }
+        self.assertEqual(retention_stats(), {'total': 7, 'expired': 0, 'digests': 2, 'collapsed': 4, 'remaining': 3})
+
+        result = prune_notifications()
+
+        self.assertEqual((result['digests'], result['collapsed']), (2, 4))
+        read_digest = self.digest_row(self.alice, self.task)
+        unread_digest = self.digest_row(self.alice, other)
+        self.assertEqual((read_digest.id, read_digest.digest_count, read_digest.is_read), (newest[self.task.id], 3, True))
+        self.assertEqual((unread_digest.id, unread_digest.digest_count, unread_digest.is_read), (newest[other.id], 3, False))
+        self.assertEqual(self.digest_row(self.bob, self.task).digest_count, 1)
+        self.assertCountersMatch()
+
+    def test_digest_count_accumulates_across_runs(self):
+        self.notify(self.alice, 3, days_ago=5, task=self.task)
+        prune_notifications()
+        self.notify(self.alice, 2, is_read=True, days_ago=2, task=self.task)  # มาใหม่หลังรวบรอบแรก (ล่าสุดอ่านแล้ว)
+
+        result = prune_notifications()
+
+        digest = self.digest_row(self.alice, self.task)
+        self.assertEqual(result['collapsed'], 2)
+        self.assertEqual((digest.digest_count, digest.is_read), (5, False))  # digest เดิมยังไม่อ่าน -> ยังไม่อ่าน
+        self.assertEqual(get_unread_counts([self.alice.id]), {self.alice.id: 1})
+        self.assertEqual(prune_notifications()['digests'], 0)  # รันซ้ำไม่เปลี่ยนอะไร
+        self.assertCountersMatch()
+
+    def test_collapsing_unread_rows_leaves_one_unread(self):
+        # แถวล่าสุดอ่านแล้วแต่แถวเก่ายังไม่อ่าน -> ลบแถวเก่า (ลดตัวนับ) แล้วบวกคืน 1 ให้ digest
+        self.notify(self.alice, 4, days_ago=5, task=self.task)
+        self.notify(self.alice, 1, is_read=True, days_ago=3, task=self.task)
+        # แถวล่าสุดยังไม่อ่าน -> ไม่ต้องบวกคืน
+        self.notify(self.bob, 3, days_ago=5, task=self.task)
+        # อ่านหมดแล้ว -> ตัวนับไม่ขยับ
+        self.notify(self.bob, 2, is_read=True, days_ago=5)
+        self.assertEqual(get_unread_counts([self.alice.id, self.bob.id]), {self.alice.id: 4, self.bob.id: 3})
+
+        with mock.patch('board.retention.adjust_unread', wraps=adjust_unread) as add_back:
+            prune_notifications(batch_size=3)
+
+        add_back.assert_called_once_with([self.alice.id], 1)
+        self.assertEqual(get_unread_counts([self.alice.id, self.bob.id]), {self.alice.id: 1, self.bob.id: 1})
+        self.assertCountersMatch()
+
+
+# ==========================================
+# JSON endpoint ที่ถูกเรียกบ่อย (แจ้งเตือน / ติ๊กเสร็จ / ย้ายการ์ด): สิทธิ์ + 404 + บันทึกเฉพาะฟิลด์ที่เปลี่ยน
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES)
+class TaskToggleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='toggler', password='pass')
+        self.client.force_login(self.user)
+        board = make_board('Toggle', self.user)
+        lst = List.objects.create(board=board, title='List', position=POSITION_GAP)
+        self.task = Task.objects.create(
+            list=lst, title='Write report', position=POSITION_GAP,
+            due_date=timezone.now() + timedelta(days=3), remind_days=1,
+        )
+        self.assertIsNotNone(self.task.remind_at)
+
+    def test_toggle_completion_skips_search_reindex(self):
+        with mock.patch('board.signals.index_objects') as index_objects:
+            response = self.client.post(reverse('task_toggle_complete', args=[self.task.id]))
+
+        self.assertTrue(response.json()['is_completed'])
+        index_objects.assert_not_called()
+        self.task.refresh_from_db()
+        self.assertIsNotNone(self.task.completed_at)
+        self.assertIsNone(self.task.remind_at)  # เสร็จแล้ว -> ไม่ต้องเตือน (Task.save เติม remind_at ให้เอง)
+
+    def test_toggle_archive_sends_archived_event_only(self):
+        with mock.patch('board.signals.index_objects') as index_objects, \
+                mock.patch('board.signals.publish') as publish:
+            response = self.client.post(reverse('toggle_task_archive', args=[self.task.id]))
+
+        self.assertTrue(response.json()['is_archived'])
+        index_objects.assert_not_called()
+        events = [ev for call in publish.call_args_list for ev in call.args[1:]]
+        self.assertEqual([ev['type'] for ev in events], ['task.archived'])
+
+    def test_toggle_completion_checks_access(self):
+        outsider = User.objects.create_user(username='outsider', password='pass')
+        self.client.force_login(outsider)
+        url = reverse('task_toggle_complete', args=[self.task.id])
+
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(reverse('task_toggle_complete', args=[self.task.id + 999])).status_code, 404)
+        self.task.refresh_from_db()
+        self.assertFalse(self.task.is_completed)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TaskMoveViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mover', password='pass')
+        board = make_board('Move', self.user)
+        self.todo = List.objects.create(board=board, title='Todo', position=POSITION_GAP)
+        self.done = List.objects.create(board=board, title='Done', position=POSITION_GAP * 2)
+        self.task = make_tasks(self.todo, 1)[0]
+        self.other_list = List.objects.create(board=make_board('Other'), title='Other', position=POSITION_GAP)
+        self.url = reverse('task_move')
+
+    def move(self, task_id, list_id):
+        return self.client.post(self.url, {'task_id': task_id, 'list_id': list_id})
+
+    def test_requires_login(self):
+        response = self.move(self.task.id, self.done.id)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response['Location'])
+
+    def test_moves_task_between_lists_of_same_board(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.move(self.task.id, self.done.id).json(), {'success': True})
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.list_id, self.done.id)
+
+    def test_inaccessible_task_or_foreign_list_is_404(self):
+        self.client.force_login(self.user)
+        foreign_task = make_tasks(self.other_list, 1)[0]
+
+        self.assertEqual(self.move(foreign_task.id, self.todo.id).status_code, 404)
+        self.assertEqual(self.move(self.task.id, self.other_list.id).status_code, 404)
+        self.assertEqual(self.move(self.task.id + 999, self.done.id).status_code, 404)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.list_id, self.todo.id)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class NotificationEndpointTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.mine = Notification.objects.bulk_create([
+            Notification(recipient=self.user, actor=self.other, message=f"msg {index}") for index in range(3)
+        ])
+        self.theirs = Notification.objects.create(recipient=self.other, actor=self.user, message='theirs')
+
+    def test_requires_login(self):
+        for url in (reverse('get_notifications'), reverse('mark_all_read'), reverse('read_notification', args=[1])):
+            with self.subTest(url=url):
+                response = self.client.post(url)
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('login', response['Location'])
+
+    def test_lists_only_own_notifications(self):
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('get_notifications')).json()
+
+        self.assertEqual({row['id'] for row in data['notifications']}, {n.id for n in self.mine})
+        self.assertEqual(data['unread_count'], 3)
+
+        data = self.client.get(reverse('get_notifications'), {'since': self.mine[1].id}).json()
+        self.assertEqual([row['id'] for row in data['notifications']], [self.mine[2].id])
+
+    def test_reading_someone_elses_notification_is_404(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('read_notification', args=[self.theirs.id]))
+
+        self.assertEqual(response.status_code, 404)
+        self.theirs.refresh_from_db()
+        self.assertFalse(self.theirs.is_read)
+        self.assertEqual(self.client.get(reverse('read_notification', args=[self.mine[0].id])).status_code, 400)
+
+    def test_read_and_mark_all_read_update_counter(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('read_notification', args=[self.mine[0].id]))
+        self.client.post(reverse('read_notification', args=[self.mine[0].id]))  # กดซ้ำ -> ไม่ลดซ้ำ
+        self.assertEqual(get_unread_counts([self.user.id]), {self.user.id: 2})
+
+        self.client.post(reverse('mark_all_read'))
+        self.assertEqual(get_unread_counts([self.user.id, self.other.id]), {self.user.id: 0, self.other.id: 1})
+
+
+# ==========================================
+# Board Access Cache: เสียสิทธิ์ทันทีหลัง commit (แม้ request อื่นจะ cache ค่าเก่าไว้ระหว่างนั้น)
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES)
+class BoardAccessInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='access-owner', password='pass')
+        self.member = User.objects.create_user(username='access-member', password='pass')
+        self.board = make_board('Access', self.owner)
+        self.board.members.add(self.member)
+
+    def can_access(self, user):
+        # โหลด user ใหม่ทุกครั้ง -> ไม่ใช้ค่าที่จำไว้บน instance (เหมือน request ใหม่)
+        return permissions.can_access(User.objects.get(pk=user.pk), self.board.pk)
+
+    def change_then_recache_stale(self, change, *users):
+        """แก้ข้อมูลใน transaction แล้วจำลอง request อื่นที่ cache สิทธิ์ก่อน commit ไว้"""
+        stale = {user.pk: permissions.accessible_board_ids(User.objects.get(pk=user.pk)) for user in users}
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+            for user_id, ids in stale.items():
+                cache.set(permissions._cache_key(user_id), ids)
+
+    def test_removed_member_loses_access(self):
+        self.assertTrue(self.can_access(self.member))
+        self.change_then_recache_stale(lambda: self.board.members.remove(self.member), self.member)
+        self.assertFalse(self.can_access(self.member))
+
+    def test_removed_from_user_side_loses_access(self):
+        self.assertTrue(self.can_access(self.member))
+        self.change_then_recache_stale(lambda: self.member.joined_boards.remove(self.board), self.member)
+        self.assertFalse(self.can_access(self.member))
+
+    def test_clear_members_revokes_everyone(self):
+        other = User.objects.create_user(username='access-other', password='pass')
+        self.board.members.add(other)
+        self.assertTrue(self.can_access(other))
+        self.change_then_recache_stale(self.board.members.clear, self.member, other)
+        self.assertFalse(self.can_access(self.member))
+        self.assertFalse(self.can_access(other))
+        self.assertTrue(self.can_access(self.owner))
+
+    def test_owner_change_moves_access(self):
+        new_owner = User.objects.create_user(username='access-new', password='pass')
+        self.assertFalse(self.can_access(new_owner))
+
+        def transfer():
+            self.board.created_by = new_owner
+            self.board.save()
+
+        self.change_then_recache_stale(transfer, self.owner, new_owner)
+        self.assertFalse(self.can_access(self.owner))
+        self.assertTrue(self.can_access(new_owner))
+        self.assertEqual(permissions.board_member_ids(self.board), {new_owner.pk, self.member.pk})
+
+
+
+# ==========================================
+# Search Index: ตัดคำ / ต้องเจอครบทุกคำ / กรองสิทธิ์ / เติมดัชนีข้อมูลเดิม
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='search-owner', password='pass')
+        self.board = make_board('Search', self.owner)
+        self.list = List.objects.create(board=self.board, title='TO DO', position=POSITION_GAP)
+
+    def titles(self, query, user=None):
+        return [result['title'] for result in search.search(user or self.owner, query)]
+
+    def test_thai_text_is_split_into_bigrams(self):
+        self.assertEqual(search.tokenize('งานบ้าน'), ['งา', 'าน', 'นบ', 'บ้', '้า', 'าน'])
+        self.assertEqual(search.tokenize('ก'), ['ก'])
+        self.assertEqual(search.tokenize('Fix งาน Login'), ['fix', 'งา', 'าน', 'login'])
+
+    def test_only_last_latin_term_is_prefix(self):
+        self.assertEqual(search.query_terms('Fix Log'), [('fix', False), ('log', True)])
+        self.assertEqual(search.query_terms('ก'), [('ก', True)])
+
+    def test_thai_substring_and_latin_prefix_match(self):
+        Task.objects.create(list=self.list, title='ทำงานบ้านวันเสาร์', position=POSITION_GAP)
+        Task.objects.create(list=self.list, title='Deploy backend', position=2 * POSITION_GAP)
+
+        self.assertEqual(self.titles('งานบ้าน'), ['ทำงานบ้านวันเสาร์'])
+        self.assertEqual(self.titles('back'), ['Deploy backend'])
+        self.assertEqual(self.titles('backend dep'), ['Deploy backend'])
+        self.assertEqual(self.titles('ack'), [])
+
+    def test_every_term_must_match(self):
+        Task.objects.create(list=self.list, title='Fix login page', position=POSITION_GAP)
+        Task.objects.create(list=self.list, title='Fix signup page', position=2 * POSITION_GAP)
+
+        self.assertEqual(sorted(self.titles('fix page')), ['Fix login page', 'Fix signup page'])
+        self.assertEqual(self.titles('fix login'), ['Fix login page'])
+        self.assertEqual(self.titles('login signup'), [])
+
+    def test_results_are_limited_to_accessible_boards(self):
+        outsider = User.objects.create_user(username='search-outsider', password='pass')
+        task = Task.objects.create(list=self.list, title='Secret roadmap', position=POSITION_GAP)
+        Comment.objects.create(task=task, author=self.owner, content='roadmap review')
+
+        self.assertEqual(len(search.search(self.owner, 'roadmap')), 2)
+        self.assertEqual(search.search(outsider, 'roadmap'), [])
+
+        self.board.members.add(outsider)
+        outsider = User.objects.get(pk=outsider.pk)  # สิทธิ์ถูกจำไว้บน instance -> โหลดใหม่เหมือน request ใหม่
+        self.assertEqual({result['type'] for result in search.search(outsider, 'roadmap')}, {'task', 'comment'})
+
+    def test_migration_backfills_rows_created_before_the_index(self):
+        backfill = importlib.import_module('board.migrations.0041_backfill_search_index').backfill_search_index
+        task = Task.objects.create(list=self.list, title='Legacy invoice', position=POSITION_GAP)
+        Comment.objects.create(task=task, author=self.owner, content='ส่งใบแจ้งหนี้แล้ว')
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.titles('invoice'), [])
+
+        backfill(django_apps, None)
+        backfill(django_apps, None)  # รันซ้ำไม่สร้างเอกสารซ้ำ
+
+        self.assertEqual(self.titles('invoice'), ['Legacy invoice'])
+        self.assertEqual(self.titles('ใบแจ้งหนี้'), ['Legacy invoice'])
+        self.assertEqual(
+            search.search(self.owner, 'search', kinds=[SearchDocument.Kind.BOARD])[0]['board_id'], self.board.pk,
+        )
+        self.assertEqual(SearchDocument.objects.count(), 3)
+
+
+# ==========================================
+# Task Reminders: งานที่ไม่มีคนรับผิดชอบไม่ค้างในคิว / งานที่เสร็จระหว่างส่งไม่ถูกเตือน
+# ==========================================
+
+@mock.patch.object(jobs, 'JOB_RUN_IN_PROCESS', False)
+class ReminderTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='remind-owner', password='pass', email='owner@example.com')
+        self.assignee = User.objects.create_user(username='remind-user', password='pass', email='user@example.com')
+        board = make_board('Remind', self.owner)
+        self.list = List.objects.create(board=board, title='TO DO', position=POSITION_GAP)
+
+    def make_due_task(self, title, assignees=()):
+        # ครบกำหนดพรุ่งนี้ เตือนล่วงหน้า 2 วัน -> remind_at ผ่านมาแล้ว
+        task = Task.objects.create(
+            list=self.list, title=title, position=POSITION_GAP,
+            due_date=timezone.now() + timedelta(days=1), remind_days=2,
+        )
+        task.assigned_to.add(*assignees)
+        return task
+
+    def reminded_task_ids(self):
+        return set(Notification.objects.filter(recipient=self.assignee).values_list('task_id', flat=True))
+
+    def test_unassigned_due_task_is_disarmed_until_assigned(self):
+        task = self.make_due_task('Nobody')
+        self.assertIsNotNone(task.remind_at)
+
+        self.assertEqual(claim_due_reminders(), [])
+        task.refresh_from_db()
+        self.assertIsNone(task.remind_at)
+        self.assertFalse(task.is_reminded)
+
+        task.assigned_to.add(self.assignee)
+        task.refresh_from_db()
+        self.assertIsNotNone(task.remind_at)
+        self.assertEqual(send_due_reminders(), 1)
+        self.assertEqual(self.reminded_task_ids(), {task.pk})
+
+    def test_task_completed_after_claim_is_not_sent(self):
+        kept = self.make_due_task('Still open', [self.assignee])
+        done = self.make_due_task('Done meanwhile', [self.assignee])
+        claim = claim_due_reminders
+
+        def claim_then_complete(*args, **kwargs):
+            tasks = claim(*args, **kwargs)
+            # อีก request ติ๊กเสร็จหลัง claim แต่ก่อนส่ง (ตัว task ในชุดที่ claim ยังเป็นค่าเก่า)
+            task = Task.objects.get(pk=done.pk)
+            task.is_completed = True
+            task.save(update_fields=['is_completed', 'completed_at'])
+            return tasks
+
+        with mock.patch('board.reminders.claim_due_reminders', side_effect=claim_then_complete):
+            self.assertEqual(send_due_reminders(), 1)
+
+        self.assertEqual(self.reminded_task_ids(), {kept.pk})
+        self.assertEqual(Job.objects.count(), 1)  # อีเมลถึงผู้รับผิดชอบ 1 ฉบับ (ของงานที่ยังไม่เสร็จ)
+
+
+# ==========================================
+# Google Calendar Sync: รอบแรก / รอบ delta / token หมดอายุ (410) / Event ถูกยกเลิก
+# ==========================================
+
+class FakeSyncService:
+    """แทน service ที่ build() คืนมา: events().list(**params).execute() ส่งต่อให้ respond(params)"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.requests.append(params)
+        return mock.Mock(execute=lambda: self.respond(params))
+
+
+def calendar_event(event_id, summary, day, status='confirmed'):
+    return {'id': event_id, 'summary': summary, 'status': status, 'start': {'date': day.isoformat()}}
+
+
+class CalendarSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sync-user', password='pass')
+        self.board = make_board('Sync', self.user)
+        self.todo = List.objects.create(board=self.board, title='TO DO', position=POSITION_GAP)
+        self.creds = {'token': f"token-{self._testMethodName}"}
+        self.today = timezone.localdate()
+        self.pages = {}  # (syncToken, pageToken) -> response
+        # get_service จำ service ไว้ต่อ thread/token -> ใช้ตัวเดียวตลอดเทสต์
+        self.service = FakeSyncService(self.respond)
+
+    def respond(self, params):
+        key = (params.get('syncToken', ''), params.get('pageToken'))
+        response = self.pages[key]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def sync(self):
+        self.service.requests.clear()
+        with mock.patch.object(google_calendar, 'build', return_value=self.service):
+            return google_calendar.sync_calendar(self.user, self.creds, 'primary', self.board, self.todo)
+
+    def tasks(self):
+        return {task.google_event_id: task for task in Task.objects.filter(list__board=self.board)}
+
+    def assertStatsMatchRebuild(self):
+        def rows():
+            return sorted(BoardDailyStats.objects.filter(board=self.board).values_list(
+                'date', 'created', 'completed', 'overdue', 'completed_high', 'completed_medium', 'completed_low',
+            ))
+
+        live_rows = rows()
+        stats.rebuild([self.board.id])
+        self.assertEqual(live_rows, rows())
+
+    def first_sync(self):
+        self.pages[('', None)] = {
+            'items': [calendar_event('e1', 'Quiz', self.today + timedelta(days=3))], 'nextPageToken': 'p2',
+        }
+        self.pages[('', 'p2')] = {
+            'items': [calendar_event('e2', 'Lab', self.today + timedelta(days=5))], 'nextSyncToken': 't1',
+        }
+        return self.sync()
+
+    def test_first_sync_pulls_every_page(self):
+        self.assertEqual(self.first_sync(), {'created': 2, 'updated': 0, 'cancelled': 0})
+
+        first, second = self.service.requests
+        self.assertIn('timeMin', first)
+        self.assertNotIn('syncToken', first)
+        self.assertEqual(second['pageToken'], 'p2')
+        tasks = self.tasks()
+        self.assertEqual(set(tasks), {'e1', 'e2'})
+        self.assertEqual([list(task.assigned_to.all()) for task in tasks.values()], [[self.user], [self.user]])
+        self.assertEqual(GoogleCalendarSync.objects.get(user=self.user).sync_token, 't1')
+        self.assertStatsMatchRebuild()
+
+    def test_delta_sync_applies_changes_only(self):
+        self.first_sync()
+        self.pages[('t1', None)] = {
+            'items': [
+                calendar_event('e1', 'Quiz (moved)', self.today + timedelta(days=7)),
+                calendar_event('e3', 'Project', self.today + timedelta(days=9)),
+            ],
+            'nextSyncToken': 't2',
+        }
+
+        self.assertEqual(self.sync(), {'created': 1, 'updated': 1, 'cancelled': 0})
+        self.assertEqual(self.service.requests[0]['syncToken'], 't1')
+        self.assertNotIn('timeMin', self.service.requests[0])
+        tasks = self.tasks()
+        self.assertEqual(tasks['e1'].title, 'Quiz (moved)')
+        self.assertEqual(timezone.localtime(tasks['e1'].due_date).date(), self.today + timedelta(days=7))
+        self.assertEqual(len(tasks), 3)
+        self.assertEqual(GoogleCalendarSync.objects.get(user=self.user).sync_token, 't2')
+        self.assertStatsMatchRebuild()
+
+    def test_expired_sync_token_falls_back_to_full_pull(self):
+        self.first_sync()
+        self.pages[('t1', None)] = HttpError(httplib2.Response({'status': 410}), b'Sync token is no longer valid')
+        self.pages[('', None)] = {
+            'items': [calendar_event('e1', 'Quiz', self.today + timedelta(days=3))], 'nextSyncToken': 'fresh',
+        }
+
+        self.assertEqual(self.sync(), {'created': 0, 'updated': 0, 'cancelled': 0})
+        expired, full = self.service.requests
+        self.assertEqual(expired['syncToken'], 't1')
+        self.assertNotIn('syncToken', full)
+        self.assertIn('timeMin', full)
+        self.assertEqual(GoogleCalendarSync.objects.get(user=self.user).sync_token, 'fresh')
+
+    def test_cancelled_event_archives_task(self):
+        self.first_sync()
+        self.pages[('t1', None)] = {
+            'items': [calendar_event('e2', 'Lab', self.today + timedelta(days=5), status='cancelled')],
+            'nextSyncToken': 't2',
+        }
+
+        self.assertEqual(self.sync(), {'created': 0, 'updated': 0, 'cancelled': 1})
+        tasks = self.tasks()
+        self.assertTrue(tasks['e2'].is_archived)
+        self.assertFalse(tasks['e1'].is_archived)
+        self.assertStatsMatchRebuild()
+
+    def test_event_imported_elsewhere_meanwhile_is_not_counted(self):
+        other_list = List.objects.create(board=make_board('Other'), title='TO DO', position=POSITION_GAP)
+        self.pages[('', None)] = {
+            'items': [
+                calendar_event('e1', 'Quiz', self.today + timedelta(days=3)),
+                calendar_event('taken', 'Shared', self.today + timedelta(days=4)),
+            ],
+            'nextSyncToken': 't1',
+        }
+        first_position = google_calendar.first_position
+
+        def import_elsewhere(queryset):
+            # อีก sync นำ Event เดียวกันเข้าบอร์ดอื่นหลังเช็คซ้ำ แต่ก่อน bulk_create
+            make_tasks(other_list, 1, google_event_id='taken')
+            return first_position(queryset)
+
+        with mock.patch.object(google_calendar, 'first_position', side_effect=import_elsewhere):
+            self.assertEqual(self.sync(), {'created': 1, 'updated': 0, 'cancelled': 0})
+
+        self.assertEqual(set(self.tasks()), {'e1'})
+        self.assertEqual(sum(BoardDailyStats.objects.filter(board=self.board).values_list('created', flat=True)), 1)
+        self.assertStatsMatchRebuild()
+
+
+# ==========================================
+# Activity Verbs: บันทึกเหตุการณ์ที่ call site / แสดงผล / นับในรายงาน / log แบบเก่า
+# ==========================================
+
+Verb = ActivityLog.Verb
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ActivityVerbTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='verb-owner', password='pass')
+        self.member = User.objects.create_user(username='verb-member', password='pass')
+        self.board = make_board('Verbs', self.owner)
+        self.board.members.add(self.member)
+        self.list = List.objects.create(board=self.board, title='TO DO', position=POSITION_GAP)
+        self.task = Task.objects.create(list=self.list, title='Write report', position=POSITION_GAP)
+        self.client.force_login(self.owner)
+
+    def logged(self):
+        return [
+            (verb, render_action(verb, action, payload))
+            for verb, action, payload in self.board.activities.order_by('id').values_list('verb', 'action', 'payload')
+        ]
+
+    def test_completion_and_comment_are_logged(self):
+        url = reverse('task_toggle_complete', args=[self.task.id])
+        self.client.post(url)
+        self.client.post(url)
+        self.client.post(
+            reverse('add_comment', args=[self.task.id]), json.dumps({'content': 'ok'}), content_type='application/json',
+        )
+
+        self.assertEqual(self.logged(), [
+            (Verb.TASK_COMPLETED, "ทำการ์ด 'Write report' เสร็จแล้ว"),
+            (Verb.TASK_REOPENED, "ยกเลิกสถานะเสร็จของการ์ด 'Write report'"),
+            (Verb.COMMENT_ADDED, "แสดงความคิดเห็นในการ์ด 'Write report'"),
+        ])
+
+    def test_edit_logs_assignment_changes(self):
+        self.task.assigned_to.add(self.owner)
+        self.client.post(reverse('task_update', args=[self.task.id]), {
+            'title': 'Write final report', 'description': '', 'assigned_to': [self.member.id],
+            'due_date': '', 'priority': Task.Priority.HIGH, 'remind_days': 1,
+        })
+
+        self.assertEqual(self.logged(), [
+            (Verb.TASK_UPDATED, "แก้ไขการ์ด 'Write final report'"),
+            (Verb.TASK_ASSIGNED, "มอบหมายการ์ด 'Write final report' ให้ verb-member"),
+            (Verb.TASK_UNASSIGNED, "นำ verb-owner ออกจากการ์ด 'Write final report'"),
+        ])
+
+    def test_membership_changes_are_logged(self):
+        guest = User.objects.create_user(username='verb-guest', password='pass')
+        invite = BoardInvitation.objects.create(board=self.board, sender=self.owner, recipient=guest)
+        self.client.post(reverse('remove_member', args=[self.board.id, self.member.id]))
+        self.client.force_login(guest)
+        self.client.get(reverse('respond_invitation', args=[invite.id, 'accept']))
+        self.client.post(reverse('leave_board', args=[self.board.id]))
+
+        self.assertEqual(self.logged(), [
+            (Verb.MEMBER_REMOVED, "นำ verb-member ออกจากบอร์ด 'Verbs'"),
+            (Verb.MEMBER_JOINED, "เข้าร่วมบอร์ด 'Verbs'"),
+            (Verb.BOARD_LEFT, "ได้ออกจากบอร์ด 'Verbs'"),
+        ])
+        self.assertEqual(
+            list(self.board.activities.order_by('id').values_list('actor__username', flat=True)),
+            ['verb-owner', 'verb-guest', 'verb-guest'],
+        )
+
+    def test_rendering_prefers_current_names_and_tolerates_missing_ones(self):
+        ActivityLog.objects.create(
+            board=self.board, actor=self.owner, verb=Verb.TASK_ASSIGNED, task=self.task,
+            payload={'task': 'Old title', 'users': 'verb-member'},
+        )
+        self.task.title = 'Renamed'
+        self.task.save()
+        entry = activity_queryset(self.board.id).get()
+
+        self.assertEqual(serialize_activity(entry)['action'], "มอบหมายการ์ด 'Renamed' ให้ verb-member")
+        self.assertEqual(render_action(Verb.TASK_UNASSIGNED, payload={'task': 'X'}), "นำ  ออกจากการ์ด 'X'")
+        self.assertEqual(render_action('', 'ข้อความเดิม'), 'ข้อความเดิม')
+
+    def test_report_counts_each_verb_per_member(self):
+        for actor, verb in [
+            (self.owner, Verb.TASK_CREATED), (self.owner, Verb.TASK_COMPLETED), (self.owner, Verb.TASK_COMPLETED),
+            (self.member, Verb.COMMENT_ADDED), (self.member, Verb.TASK_MOVED), (self.member, Verb.TASK_UPDATED),
+        ]:
+            ActivityLog.objects.create(board=self.board, actor=actor, verb=verb)
+
+        result = reporting.activity_by_member([self.board.id], timezone.now() - timedelta(days=1))
+
+        self.assertEqual(result['labels'], ['verb-owner', 'verb-member'])
+        self.assertEqual(result[Verb.TASK_CREATED], [1, 0])
+        self.assertEqual(result[Verb.TASK_COMPLETED], [2, 0])
+        self.assertEqual(result[Verb.COMMENT_ADDED], [0, 1])
+        self.assertEqual(result[Verb.TASK_MOVED], [0, 1])
+        self.assertNotIn(Verb.TASK_UPDATED, result)
+
+    def test_legacy_rows_are_parsed_into_verbs(self):
+        parse = importlib.import_module('board.migrations.0042_activity_verbs').parse_legacy_actions
+        for action in [
+            "สร้างการ์ด 'Logo' ในรายการ 'TO DO'",
+            "ย้ายการ์ด 'Logo' จาก 'TO DO' ไปยัง 'Done'",
+            "ได้ออกจากบอร์ด 'Verbs'",
+            'ข้อความที่ไม่รู้จัก',
+        ]:
+            ActivityLog.objects.create(board=self.board, actor=self.member, action=action)
+
+        parse(django_apps, None)
+
+        self.assertEqual(self.logged(), [
+            (Verb.TASK_CREATED, "สร้างการ์ด 'Logo' ในรายการ 'TO DO'"),
+            (Verb.TASK_MOVED, "ย้ายการ์ด 'Logo' จาก 'TO DO' ไปยัง 'Done'"),
+            (Verb.BOARD_LEFT, "ได้ออกจากบอร์ด 'Verbs'"),
+            ('', 'ข้อความที่ไม่รู้จัก'),
+        ])
+        moved = self.board.activities.get(verb=Verb.TASK_MOVED)
+        self.assertEqual(moved.payload, {'task': 'Logo', 'from_list': 'TO DO', 'to_list': 'Done'})
+
+
+# ==========================================
+# Board Live (WebSocket): สิทธิ์ตอน connect / รวม event ต่อ tick / presence นับแบบ atomic
+# ==========================================
+
+TEST_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(CACHES=TEST_CACHES, CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+class BoardConsumerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='live-owner', password='pass')
+        self.member = User.objects.create_user(username='live-member', password='pass')
+        self.board = make_board('Live', self.owner)
+        self.board.members.add(self.member)
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/board/{self.board.id}/")
+        communicator.scope['user'] = user
+        return communicator
+
+    async def connect(self, user):
+        communicator = self.communicator(user)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        frame = await communicator.receive_json_from()  # presence ของตัวเอง
+        self.assertEqual(frame['events'][0]['type'], 'presence')
+        return communicator
+
+    async def send_events(self, *events):
+        await get_channel_layer().group_send(
+            live.board_group(self.board.id), {'type': 'board.events', 'events': list(events)},
+        )
+
+    async def test_non_member_is_rejected(self):
+        outsider = await User.objects.acreate(username='live-outsider')
+        connected, _ = await self.communicator(outsider).connect()
+        self.assertFalse(connected)
+
+    async def test_events_within_a_tick_arrive_as_one_frame(self):
+        communicator = await self.connect(self.member)
+
+        await self.send_events(live.event('task.moved', id=1, list_id=10, position=100))
+        await self.send_events(live.event('task.moved', id=1, list_id=11, position=200))
+        await self.send_events(live.event('task.deleted', id=2))
+
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame, {'type': 'board.delta', 'events': [
+            {'type': 'task.moved', 'id': 1, 'list_id': 11, 'position': 200},
+            {'type': 'task.deleted', 'id': 2},
+        ]})
+        self.assertTrue(await communicator.receive_nothing(timeout=live.LIVE_TICK * 2))
+        await communicator.disconnect()
+
+    async def test_removed_member_is_disconnected(self):
+        communicator = await self.connect(self.member)
+
+        await self.send_events(live.event('member.removed', user_ids=[self.member.id]))
+
+        self.assertEqual((await communicator.receive_output())['type'], 'websocket.close')
+
+    async def test_presence_counts_every_open_tab(self):
+        first = await self.connect(self.member)
+        second = await self.connect(self.member)
+        await first.disconnect()
+
+        members = [user['username'] for user in await sync_to_async(live.presence_list)(self.board.id)]
+        self.assertEqual(members, ['live-member'])
+        await second.disconnect()
+        self.assertEqual(await sync_to_async(live.presence_list)(self.board.id), [])
+
+    def test_concurrent_joins_are_not_lost(self):
+        permissions.board_member_ids(self.board)  # thread ย่อยอ่านรายชื่อสมาชิกจาก cache (ไม่แตะ DB ของเทสต์)
+        barrier = threading.Barrier(8)
+
+        def join():
+            barrier.wait(timeout=5)
+            live.join_presence(self.board.id, self.member)
+
+        threads = [threading.Thread(target=join) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get(live._presence_key(self.board.id, self.member.id)), 8)
+
+        for _ in range(7):
+            live.leave_presence(self.board.id, self.member)
+        self.assertEqual([user['id'] for user in live.presence_list(self.board.id)], [self.member.id])
+        live.leave_presence(self.board.id, self.member)
+        self.assertEqual(live.presence_list(self.board.id), [])
+
+
+# ==========================================
+# Unread Counter: notify / ลบตามตัวแม่ (GROUP BY ครั้งเดียว) / อ่านทั้งหมด / reconcile
+# ==========================================
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='count-owner', password='pass')
+        self.alice = User.objects.create_user(username='count-alice', password='pass')
+        self.bob = User.objects.create_user(username='count-bob', password='pass')
+        self.board = make_board('Counter', self.owner)
+        self.list = List.objects.create(board=self.board, title='TO DO', position=POSITION_GAP)
+
+    def counts(self):
+        return get_unread_counts([self.alice.id, self.bob.id])
+
+    def notifications(self, recipient, count, is_read=False, **fields):
+        Notification.objects.bulk_create([
+            Notification(recipient=recipient, actor=self.owner, message='m', is_read=is_read, **fields)
+            for _ in range(count)
+        ])
+
+    def test_notify_increments_each_recipient_once(self):
+        self.counts()  # สร้างแถวตัวนับไว้ก่อน -> notify บวกด้วย F()
+        notify(self.owner, [self.alice, self.bob, self.alice, self.owner], 'hi', 'hi')
+        notify(self.owner, [self.alice], 'hi', 'hi')
+
+        self.assertEqual(self.counts(), {self.alice.id: 2, self.bob.id: 1})
+        self.assertFalse(Notification.objects.filter(recipient=self.owner).exists())
+
+    def test_deleting_task_releases_unread_with_constant_queries(self):
+        queries = []
+        for size in (3, 30):
+            with self.subTest(size=size):
+                task = Task.objects.create(list=self.list, title=f"Task {size}", position=size)
+                self.notifications(self.alice, size, task=task)
+                self.notifications(self.bob, size, task=task)
+                self.notifications(self.bob, 2, task=task, is_read=True)
+                self.notifications(self.alice, 1)  # ไม่เกี่ยวกับงานนี้
+                NotificationCounter.objects.all().delete()  # bulk_create ไม่ผ่าน notify -> สร้างตัวนับจากยอดจริง
+                before = self.counts()
+
+                with CaptureQueriesContext(connection) as ctx:
+                    task.delete()
+
+                queries.append(len(ctx.captured_queries))
+                self.assertEqual(self.counts(), {self.alice.id: before[self.alice.id] - size, self.bob.id: 0})
+        self.assertEqual(queries[0], queries[1])
+
+    def test_deleting_board_counts_each_notification_once(self):
+        task = Task.objects.create(list=self.list, title='Task', position=POSITION_GAP)
+        self.notifications(self.alice, 2, task=task, board=self.board)
+        self.notifications(self.alice, 1, board=self.board)
+        self.notifications(self.bob, 3, task=task)
+        self.notifications(self.bob, 1)
+        self.counts()
+
+        self.board.delete()
+
+        self.assertEqual(self.counts(), {self.alice.id: 0, self.bob.id: 1})
+
+    def test_deleting_actor_releases_their_notifications(self):
+        self.notifications(self.alice, 2)
+        Notification.objects.create(recipient=self.alice, actor=self.bob, message='from bob')
+        self.counts()
+
+        self.bob.delete()
+
+        self.assertEqual(get_unread_counts([self.alice.id]), {self.alice.id: 2})
+
+    def test_mark_all_read_zeroes_only_own_counter(self):
+        notify(self.owner, [self.alice, self.bob], 'hi', 'hi')
+        self.client.force_login(self.alice)
+        self.client.post(reverse('mark_all_read'))
+
+        self.assertEqual(self.counts(), {self.alice.id: 0, self.bob.id: 1})
+
+    def test_reconcile_command_fixes_drift(self):
+        self.notifications(self.alice, 3)
+        self.counts()
+        NotificationCounter.objects.filter(user=self.alice).update(unread_count=99)
+        NotificationCounter.objects.filter(user=self.bob).delete()
+
+        call_command('reconcile_notification_counts', '--dry-run', stdout=StringIO())
+        self.assertEqual(NotificationCounter.objects.get(user=self.alice).unread_count, 99)
+
+        out = StringIO()
+        call_command('reconcile_notification_counts', stdout=out)
+        self.assertEqual(
+            dict(NotificationCounter.objects.filter(user__in=[self.alice, self.bob]).values_list('user_id', 'unread_count')),
+            {self.alice.id: 3, self.bob.id: 0},
+        )
+        self.assertIn(f"User {self.alice.id}: 99 -> 3", out.getvalue())
+
+
+# ==========================================
+# notify(): ผู้รับ N คน = bulk_create 1 ครั้ง + group_send ชุดเดียว
+# ==========================================
+
+class NotifyBatchTests(TestCase):
+    # bulk_create + UPDATE ตัวนับด้วย F() + อ่านตัวนับกลับ
+    NOTIFY_QUERIES = 3
+
+    def setUp(self):
+        self.actor = User.objects.create_user(username='batch-actor', password='pass')
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch('board.notifications.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def recipients(self, count, prefix):
+        users = User.objects.bulk_create([User(username=f"{prefix}-{index}") for index in range(count)])
+        get_unread_counts([user.id for user in users])  # มีแถวตัวนับแล้ว (กรณีปกติ)
+        return users
+
+    def test_queries_and_pushes_do_not_grow_per_recipient(self):
+        for size in (3, 30):
+            with self.subTest(size=size):
+                users = self.recipients(size, f"batch{size}")
+                self.layer.group_send.reset_mock()
+
+                with self.assertNumQueries(self.NOTIFY_QUERIES), \
+                        mock.patch('board.notifications.async_to_sync', wraps=async_to_sync) as bridge:
+                    created = notify(self.actor, users, 'งานใหม่', 'งานเข้า!')
+
+                self.assertEqual(len(created), size)
+                bridge.assert_called_once()  # event loop รอบเดียวสำหรับทุกคน
+                self.assertEqual(
+                    sorted(call.args[0] for call in self.layer.group_send.await_args_list),
+                    sorted(f"user_{user.id}" for user in users),
+                )
+                self.assertEqual({call.args[1]['unread_count'] for call in self.layer.group_send.await_args_list}, {1})
+
+    def test_push_failure_is_logged_not_raised(self):
+        users = self.recipients(2, 'broken')
+        self.layer.group_send.side_effect = ConnectionError('redis down')
+
+        with self.assertLogs('board.notifications', level='ERROR') as logs:
+            created = notify(self.actor, users, 'งานใหม่', 'งานเข้า!')
+
+        self.assertEqual(len(created), 2)
+        self.assertIn('redis down', logs.output[0])
+        self.assertEqual(Notification.objects.filter(recipient__in=users).count(), 2)
+
+
+# ==========================================
+# Board Snapshot: query คงที่ / cache ตาม version / ETag
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES)
+class BoardSnapshotTests(TestCase):
+    # lists, tasks, assignees, labels ของการ์ด, checklist, attachments, สมาชิก, users, labels ของบอร์ด
+    BUILD_QUERIES = 9
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='snap-owner', password='pass')
+        self.member = User.objects.create_user(username='snap-member', password='pass')
+
+    def make_filled_board(self, name, size):
+        board = make_board(name, self.owner)
+        board.members.add(self.member)
+        target_list = List.objects.create(board=board, title='Todo', position=POSITION_GAP)
+        label = Label.objects.create(board=board, name='bug')
+        tasks = make_tasks(target_list, size)
+        Task.assigned_to.through.objects.bulk_create([
+            Task.assigned_to.through(task_id=task.id, user_id=self.member.id) for task in tasks
+        ])
+        Task.labels.through.objects.bulk_create([
+            Task.labels.through(task_id=task.id, label_id=label.id) for task in tasks
+        ])
+        ChecklistItem.objects.bulk_create([ChecklistItem(task=task, content='ขั้นตอน') for task in tasks])
+        Comment.objects.bulk_create([Comment(task=task, author=self.owner, content='ok') for task in tasks])
+        return board
+
+    def test_query_count_does_not_grow_with_board_size(self):
+        for size in (3, 40):
+            with self.subTest(size=size):
+                board = self.make_filled_board(f"snap{size}", size)
+                get_board_version(board.id)  # มีแถว version แล้ว (กรณีปกติ)
+
+                with self.assertNumQueries(1 + self.BUILD_QUERIES):  # อ่าน version + สร้าง snapshot
+                    snapshot = get_board_snapshot(board)
+                with self.assertNumQueries(1):  # ครั้งถัดไปอ่าน version อย่างเดียว ที่เหลือมาจาก cache
+                    self.assertEqual(get_board_snapshot(board), snapshot)
+
+                tasks = snapshot['lists'][0]['tasks']
+                self.assertEqual(len(tasks), size)
+                self.assertEqual({tuple(task['assignees']) for task in tasks}, {(self.member.id,)})
+                self.assertEqual({task['comment_count'] for task in tasks}, {1})
+                self.assertEqual({len(task['checklist']) for task in tasks}, {1})
+                self.assertEqual(snapshot['members'], [self.owner.id, self.member.id])
+
+    def test_version_bump_invalidates_cached_snapshot(self):
+        board = self.make_filled_board('snapbump', 2)
+        before = get_board_snapshot(board)
+
+        # แก้ผ่าน .update() -> ไม่มี signal -> snapshot เดิมยังมาจาก cache
+        Task.objects.filter(list__board=board).update(title='เปลี่ยนชื่อ')
+        self.assertEqual(get_board_snapshot(board), before)
+
+        bump_board_version(board.id)
+        after = get_board_snapshot(board)
+        self.assertEqual(after['version'], before['version'] + 1)
+        self.assertEqual({task['title'] for task in after['lists'][0]['tasks']}, {'เปลี่ยนชื่อ'})
+
+        # แก้ผ่าน model ปกติ -> signal bump ให้เอง
+        Task.objects.create(list=List.objects.get(board=board), title='ใบใหม่', position=99 * POSITION_GAP)
+        latest = get_board_snapshot(board)
+        self.assertGreater(latest['version'], after['version'])
+        self.assertIn('ใบใหม่', [task['title'] for task in latest['lists'][0]['tasks']])
+
+    def test_snapshot_api_returns_304_for_current_etag(self):
+        board = self.make_filled_board('snapetag', 2)
+        self.client.force_login(self.member)
+        url = reverse('board_snapshot_api', args=[board.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{response.json()["version"]}"')
+
+        with mock.patch('board.views.get_board_snapshot') as build:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        build.assert_not_called()  # 304 ไม่ต้องแตะ snapshot เลย
+
+        bump_board_version(board.id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_snapshot_api_hidden_from_non_members(self):
+        board = self.make_filled_board('snapprivate', 1)
+        self.client.force_login(User.objects.create_user(username='snap-outsider', password='pass'))
+        self.assertEqual(self.client.get(reverse('board_snapshot_api', args=[board.id])).status_code, 404)
+
+
+# ==========================================
+# Board Daily Stats: ยอดที่ signal บวก/ลบสดๆ ต้องเท่ากับ rebuild() เสมอ
+# ==========================================
+
+class StatsRollupTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='stats-owner', password='pass')
+        self.alice = User.objects.create_user(username='stats-alice', password='pass')
+        self.bob = User.objects.create_user(username='stats-bob', password='pass')
+        self.board = make_board('stats', self.owner)
+        self.other_board = make_board('stats-other', self.owner)
+        self.todo = List.objects.create(board=self.board, title='Todo', position=POSITION_GAP)
+        self.done = List.objects.create(board=self.board, title='Done', position=2 * POSITION_GAP)
+        self.elsewhere = List.objects.create(board=self.other_board, title='Todo', position=POSITION_GAP)
+        self.now = timezone.now()
+
+    def rows(self):
+        return sorted(
+            BoardDailyStats.objects.filter(board__in=[self.board, self.other_board]).values_list(
+                'board_id', 'date', 'created', 'completed', 'overdue',
+                'completed_high', 'completed_medium', 'completed_low', 'assignee_completed',
+            ),
+            key=lambda row: (row[0], row[1]),
+        )
+
+    def assertLiveMatchesRebuild(self):
+        live_rows = self.rows()
+        stats.rebuild([self.board.id, self.other_board.id])
+        self.assertEqual(live_rows, self.rows())
+        return live_rows
+
+    def create(self, title, target_list=None, **fields):
+        return Task.objects.create(list=target_list or self.todo, title=title, position=POSITION_GAP, **fields)
+
+    def test_live_rows_match_rebuild_through_task_lifecycle(self):
+        quiz = self.create('Quiz', priority=Task.Priority.HIGH, due_date=self.now + timedelta(days=2))
+        lab = self.create('Lab', priority=Task.Priority.LOW, due_date=self.now + timedelta(days=5))
+        essay = self.create('Essay', due_date=self.now - timedelta(days=1))
+        quiz.assigned_to.add(self.alice)
+        lab.assigned_to.add(self.alice, self.bob)
+        with self.subTest('create'):
+            self.assertLiveMatchesRebuild()
+
+        # เสร็จ (ทั้งวันนี้ และย้อนหลังเมื่อวาน) -> ย้ายยอดจาก overdue ไป completed ต่อ priority / ต่อคน
+        quiz.is_completed = True
+        quiz.save()
+        lab.is_completed = True
+        lab.completed_at = self.now - timedelta(days=1)
+        lab.save()
+        with self.subTest('complete'):
+            rows = self.assertLiveMatchesRebuild()
+            self.assertEqual(sum(row[3] for row in rows), 2)
+            self.assertEqual(sum(row[5] for row in rows), 1)
+
+        # เปลี่ยนผู้รับผิดชอบของงานที่เสร็จแล้ว (ทั้งฝั่ง task และฝั่ง user) + ย้ายงานไปอีกบอร์ด
+        quiz.assigned_to.remove(self.alice)
+        quiz.assigned_to.add(self.bob)
+        self.bob.tasks.remove(lab)
+        self.alice.tasks.clear()
+        essay.assigned_to.set([self.alice])
+        essay.list = self.elsewhere
+        essay.save()
+        with self.subTest('reassign'):
+            rows = self.assertLiveMatchesRebuild()
+            self.assertEqual(
+                {user_id for row in rows for user_id in row[8]}, {str(self.bob.id)},
+            )
+
+        # แก้ priority ของงานที่เสร็จแล้ว / ยกเลิกเสร็จ / ลบงาน / ลบทั้งลิสต์
+        quiz.priority = Task.Priority.MEDIUM
+        quiz.save(update_fields=['priority'])
+        lab.is_completed = False
+        lab.save()
+        essay.delete()
+        self.create('Draft', target_list=self.done, due_date=self.now + timedelta(days=3))
+        with self.subTest('delete'):
+            self.assertLiveMatchesRebuild()
+            self.done.delete()
+            quiz.delete()
+            rows = self.assertLiveMatchesRebuild()
+            self.assertEqual([row[2:5] for row in rows], [(1, 0, 0), (0, 0, 1)])
+
+
+# ==========================================
+# Reporting: KPI ใน aggregate เดียว / cache ตาม version / แบ่งหน้ารายการงาน
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportingTests(TestCase):
+    AUTH_QUERIES = 2  # session + user
+    # หน้า report ตอน cache ว่าง: บอร์ดใน dropdown + version + KPI, สมาชิก, ลิสต์, แนวโน้ม, กิจกรรม
+    COLD_QUERIES = 7
+    # ตอน cache อุ่นแล้ว: session + user + version + บอร์ดใน dropdown
+    WARM_QUERIES = 4
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='report-owner', password='pass')
+        self.alice = User.objects.create_user(username='report-alice', password='pass')
+        self.board = make_board('report', self.owner)
+        self.other_board = make_board('report-other', self.owner)
+        self.todo = List.objects.create(board=self.board, title='Todo', position=POSITION_GAP)
+        self.other_todo = List.objects.create(board=self.other_board, title='Todo', position=POSITION_GAP)
+        now = timezone.now()
+
+        done = Task.objects.create(list=self.todo, title='Done', position=1, priority=Task.Priority.HIGH, is_completed=True)
+        late = Task.objects.create(list=self.todo, title='Late', position=2, priority=Task.Priority.HIGH,
+                                   due_date=now - timedelta(days=1))
+        Task.objects.create(list=self.todo, title='Later', position=3, priority=Task.Priority.MEDIUM,
+                            due_date=now + timedelta(days=3))
+        Task.objects.create(list=self.other_todo, title='Elsewhere', position=1, priority=Task.Priority.LOW)
+        done.assigned_to.add(self.alice)
+        late.assigned_to.add(self.alice, self.owner)
+
+        for verb in (ActivityLog.Verb.TASK_CREATED, ActivityLog.Verb.TASK_CREATED, ActivityLog.Verb.TASK_MOVED,
+                     ActivityLog.Verb.TASK_COMPLETED, ActivityLog.Verb.COMMENT_ADDED):
+            log_activity(self.board, self.alice, verb)
+        log_activity(self.board, self.owner, ActivityLog.Verb.COMMENT_ADDED)
+        log_activity(self.board, self.owner, ActivityLog.Verb.TASK_UPDATED)  # ไม่อยู่ในกราฟ
+
+        self.board_ids = [self.board.id, self.other_board.id]
+
+    def test_kpi_and_charts_from_constant_queries(self):
+        get_board_versions(self.board_ids)  # มีแถว version แล้ว (กรณีปกติ)
+        with self.assertNumQueries(self.COLD_QUERIES - 1):  # ไม่มีบอร์ดใน dropdown
+            report = reporting.get_report(self.owner, self.board_ids)
+
+        self.assertEqual(
+            (report['total_tasks'], report['completed_tasks'], report['remaining_count'], report['overdue_tasks']),
+            (4, 1, 3, 1),
+        )
+        self.assertEqual(report['completion_rate'], 25.0)
+        self.assertEqual(report['priority_data'], {'high': 1, 'medium': 1, 'low': 1})  # นับเฉพาะงานค้าง
+        self.assertEqual(
+            dict(zip(report['member_labels'], report['member_data'])),
+            {'report-alice': 2, 'report-owner': 1, 'Unassigned': 2},
+        )
+        self.assertEqual(dict(zip(report['list_labels'], report['list_data'])), {'Todo': 4})  # ลิสต์ชื่อเดียวกันรวมกัน
+        self.assertEqual(report['activity_labels'], ['report-alice', 'report-owner'])
+        self.assertEqual(
+            [report[f"activity_{name}"] for name in ('created', 'moved', 'completed', 'commented')],
+            [[2, 0], [1, 0], [1, 0], [1, 1]],
+        )
+        self.assertEqual(len(report['trend_labels']), reporting.TREND_DAYS)
+        self.assertEqual(sum(report['trend_created']), 4)
+
+    def test_report_view_query_budget(self):
+        self.client.force_login(self.owner)
+        url = reverse('reporting')
+        self.client.get(url)  # ID บอร์ดที่เข้าถึงได้อยู่ใน cache แล้ว
+
+        bump_board_version(self.board.id)  # report เดิมใช้ไม่ได้ -> สร้างใหม่
+        with self.assertNumQueries(self.AUTH_QUERIES + self.COLD_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total_tasks'], 4)
+
+        with self.assertNumQueries(self.WARM_QUERIES):
+            self.client.get(url)
+
+    def test_board_version_invalidates_cached_report(self):
+        before = reporting.get_report(self.owner, self.board_ids)
+
+        # แก้แบบ .update() (ไม่มี signal) -> ยังได้ค่าจาก cache
+        Task.objects.filter(title='Later').update(is_completed=True)
+        self.assertEqual(reporting.get_report(self.owner, self.board_ids), before)
+
+        bump_board_version(self.board.id)
+        self.assertEqual(reporting.get_report(self.owner, self.board_ids)['completed_tasks'], 2)
+
+        # บอร์ดอื่น bump ก็ใช้ cache ไม่ได้เฉพาะ report ที่รวมบอร์ดนั้น
+        only_board = reporting.get_report(self.owner, [self.board.id])
+        Task.objects.create(list=self.other_todo, title='Another', position=2)
+        self.assertEqual(reporting.get_report(self.owner, [self.board.id]), only_board)
+        self.assertEqual(reporting.get_report(self.owner, self.board_ids)['total_tasks'], 5)
+
+    def test_tasks_api_pages_and_scopes_to_accessible_boards(self):
+        make_tasks(self.other_todo, reporting.REPORT_PAGE_SIZE)
+        self.client.force_login(self.owner)
+        url = reverse('reporting_tasks_api')
+
+        first = self.client.get(url, {'type': 'all', 'page': 1}).json()
+        second = self.client.get(url, {'type': 'all', 'page': 2}).json()
+        bad = self.client.get(url, {'type': 'all', 'page': 'x'}).json()
+
+        self.assertEqual([len(first['tasks']), len(second['tasks'])], [reporting.REPORT_PAGE_SIZE, 4])
+        self.assertEqual([first['has_next'], second['has_next']], [True, False])
+        ids = [task['id'] for page in (first, second) for task in page['tasks']]
+        self.assertEqual(len(set(ids)), reporting.REPORT_PAGE_SIZE + 4)  # ไม่มีงานซ้ำหรือตกหล่นระหว่างหน้า
+        self.assertEqual((bad['page'], bad['tasks']), (1, first['tasks']))
+
+        remaining = self.client.get(url, {'type': 'remaining', 'board_id': self.board.id}).json()
+        self.assertEqual([task['title'] for task in remaining['tasks']], ['Late', 'Later'])
+        overdue = self.client.get(url, {'type': 'overdue'}).json()
+        self.assertEqual([task['title'] for task in overdue['tasks']], ['Late'])
+
+        self.client.force_login(User.objects.create_user(username='report-outsider', password='pass'))
+        self.assertEqual(self.client.get(url, {'board_id': self.board.id}).json()['tasks'], [])
+
+
+# ==========================================
+# TaskForm: ผู้รับผิดชอบ / ป้าย ต้องมาจากบอร์ดนี้ + เขียน M2M เฉพาะส่วนต่าง
+# ==========================================
+
+class TaskFormScopeTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='form-owner', password='pass')
+        self.alice = User.objects.create_user(username='form-alice', password='pass')
+        self.bob = User.objects.create_user(username='form-bob', password='pass')
+        self.stranger = User.objects.create_user(username='form-stranger', password='pass')
+        self.board = make_board('form', self.owner)
+        self.board.members.add(self.alice, self.bob)
+        other_board = make_board('form-other', self.stranger)
+        self.bug = Label.objects.create(board=self.board, name='bug')
+        self.idea = Label.objects.create(board=self.board, name='idea')
+        self.foreign_label = Label.objects.create(board=other_board, name='secret')
+
+        target_list = List.objects.create(board=self.board, title='Todo', position=POSITION_GAP)
+        self.task = Task.objects.create(list=target_list, title='Essay', position=POSITION_GAP)
+        self.task.assigned_to.add(self.owner, self.alice)
+        self.task.labels.add(self.bug)
+
+        self.m2m_writes = []
+
+        def record(sender, action, pk_set, **kwargs):
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                self.m2m_writes.append((sender, action, pk_set))
+
+        m2m_changed.connect(record, weak=False, dispatch_uid='task-form-scope-tests')
+        self.addCleanup(m2m_changed.disconnect, dispatch_uid='task-form-scope-tests')
+
+    def form(self, **data):
+        task = Task.objects.get(pk=self.task.pk)
+        return TaskForm({'title': 'Essay', 'priority': Task.Priority.MEDIUM, 'remind_days': 1, **data},
+                        instance=task, board=self.board)
+
+    def test_rejects_assignee_and_label_from_another_board(self):
+        form = self.form(assigned_to=[self.alice.id, self.stranger.id], labels=[self.bug.id])
+        self.assertFalse(form.is_valid())
+        self.assertIn('assigned_to', form.errors)
+
+        form = self.form(assigned_to=[self.alice.id], labels=[self.bug.id, self.foreign_label.id])
+        self.assertFalse(form.is_valid())
+        self.assertIn('labels', form.errors)
+
+        form = self.form(assigned_to=['abc'])
+        self.assertFalse(form.is_valid())
+
+    def test_validation_uses_id_sets_not_choice_queries(self):
+        form = self.form(assigned_to=[self.alice.id], labels=[self.bug.id])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(form.is_valid(), form.errors)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'users_user' in q['sql']])
+
+    def test_save_writes_only_changed_rows(self):
+        form = self.form(assigned_to=[self.alice.id, self.bob.id], labels=[self.bug.id, self.idea.id])
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        self.assertEqual(sorted(self.m2m_writes, key=lambda write: write[1]), [
+            (Task.assigned_to.through, 'post_add', {self.bob.id}),
+            (Task.labels.through, 'post_add', {self.idea.id}),
+            (Task.assigned_to.through, 'post_remove', {self.owner.id}),
+        ])
+        self.assertEqual((form.added_assignee_ids, form.removed_assignee_ids), ({self.bob.id}, {self.owner.id}))
+        self.assertEqual(set(self.task.assigned_to.values_list('id', flat=True)), {self.alice.id, self.bob.id})
+        self.assertEqual(set(self.task.labels.values_list('id', flat=True)), {self.bug.id, self.idea.id})
+
+    def test_unchanged_relations_are_not_written(self):
+        form = self.form(assigned_to=[self.owner.id, self.alice.id], labels=[self.bug.id])
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.m2m_writes, [])
+        self.assertEqual((form.added_assignee_ids, form.removed_assignee_ids), (set(), set()))
+
+    def test_form_without_labels_field_keeps_labels(self):
+        form = self.form(assigned_to=[self.alice.id])
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.m2m_writes, [(Task.assigned_to.through, 'post_remove', {self.owner.id})])
+        self.assertEqual(list(self.task.labels.values_list('id', flat=True)), [self.bug.id])
+
+
+# ==========================================
+# Activity: keyset cursor (เวลาเท่ากันก็ไม่ซ้ำ/ไม่หล่น) + export แบบ stream
+# ==========================================
+
+class ActivityFeedTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='feed-owner', password='pass')
+        self.alice = User.objects.create_user(username='feed-alice', password='pass')
+        self.board = make_board('feed', self.owner)
+        self.board.members.add(self.alice)
+        self.task = Task.objects.create(
+            list=List.objects.create(board=self.board, title='Todo', position=POSITION_GAP),
+            title='Essay', position=POSITION_GAP,
+        )
+        ActivityLog.objects.filter(board=self.board).delete()
+
+        # 7 แถวเวลาเดียวกันทั้งหมด + 2 แถวเก่ากว่า -> cursor ต้องตัดสินด้วย id เมื่อเวลาเท่ากัน
+        same_time = timezone.now().replace(microsecond=0)
+        for index in range(9):
+            actor = self.alice if index % 2 else self.owner
+            log_activity(self.board, actor, ActivityLog.Verb.TASK_UPDATED, task=self.task)
+        ids = list(ActivityLog.objects.filter(board=self.board).order_by('id').values_list('id', flat=True))
+        ActivityLog.objects.filter(id__in=ids[2:]).update(created_at=same_time)
+        ActivityLog.objects.filter(id__in=ids[:2]).update(created_at=same_time - timedelta(hours=1))
+        self.expected_ids = ids[2:][::-1] + ids[:2][::-1]
+
+        self.client.force_login(self.alice)
+        self.url = reverse('get_board_activities', args=[self.board.id])
+
+    def test_cursor_walks_ties_without_gaps_or_duplicates(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(self.url, params).json()
+            seen += [row['id'] for row in data['activities']]
+            pages += 1
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(seen, self.expected_ids)
+        self.assertEqual(pages, 3)
+
+    def test_cursor_page_query_count_is_constant(self):
+        first = self.client.get(self.url, {'limit': 3}).json()
+        with self.assertNumQueries(4):  # session + user + บอร์ด + หน้า activity (select_related ชื่อแล้ว)
+            self.client.get(self.url, {'limit': 3, 'cursor': first['next_cursor']})
+
+    def test_bad_cursor_and_limit_are_400(self):
+        for params, message in (
+            ({'cursor': 'not-a-cursor'}, 'Invalid cursor'),
+            ({'cursor': base64.urlsafe_b64encode(b'yesterday|1').decode()}, 'Invalid cursor'),
+            ({'limit': 'ten'}, 'Invalid limit'),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['message'], message)
+
+    def test_actor_filter(self):
+        data = self.client.get(self.url, {'actor': self.alice.id, 'limit': 50}).json()
+        self.assertEqual({row['actor_id'] for row in data['activities']}, {self.alice.id})
+        self.assertEqual(len(data['activities']), 4)
+
+    def test_export_streams_csv_and_ndjson(self):
+        url = reverse('export_board_activities', args=[self.board.id])
+
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        lines = body.lstrip('\ufeff').splitlines()
+        self.assertTrue(body.startswith('\ufeff'))
+        self.assertEqual(lines[0], ','.join(EXPORT_FIELDS))
+        self.assertEqual([int(line.split(',', 1)[0]) for line in lines[1:]], self.expected_ids)
+
+        response = self.client.get(url, {'format': 'ndjson', 'actor': self.owner.id})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['actor'] for row in rows}, {'feed-owner'})
+        self.assertIn('Essay', rows[0]['action'])
+
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+
+    def test_export_reads_in_chunks(self):
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator:
+            lines = list(export_activity_lines(activity_queryset(self.board.id), 'ndjson', chunk_size=2))
+        self.assertEqual(len(lines), 9)
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': 2})
+
+
+# ==========================================
+# iCalendar Feed: 304 ไม่แตะตาราง Task / token หมดอายุ / พับบรรทัดตาม RFC 5545
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES)
+class CalendarFeedTests(TestCase):
+    # user จาก token + version ของบอร์ด (ID บอร์ดที่เข้าถึงได้อยู่ใน cache แล้ว)
+    NOT_MODIFIED_QUERIES = 2
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='ics-owner', password='pass')
+        self.alice = User.objects.create_user(username='ics-alice', password='pass')
+        self.board = make_board('ics', self.owner)
+        self.board.members.add(self.alice)
+        self.list = List.objects.create(board=self.board, title='Todo', position=POSITION_GAP)
+        self.due = timezone.now() + timedelta(days=2)
+        Task.objects.create(list=self.list, title='Quiz', position=POSITION_GAP, due_date=self.due)
+        Task.objects.create(list=self.list, title='No date', position=2 * POSITION_GAP)
+
+    def feed_url(self, user, board_id=None):
+        return reverse('calendar_feed', args=[ics.make_token(user, board_id)])
+
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_not_modified_skips_task_table(self):
+        url = self.feed_url(self.alice)
+        response = self.client.get(url)
+        self.assertIn('SUMMARY:[ics] Quiz', self.body(response))
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries, self.assertNumQueries(self.NOT_MODIFIED_QUERIES):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'board_task' in q['sql']])
+
+        # งานเปลี่ยน / ตารางเรียนเปลี่ยน -> ETag ใหม่
+        Task.objects.create(list=self.list, title='Lab', position=3 * POSITION_GAP, due_date=self.due)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertIn('SUMMARY:[ics] Lab', self.body(response))
+        etag = response['ETag']
+        ClassSchedule.objects.create(user=self.alice, subject_name='Math', day='Mon',
+                                     start_time=time(8, 30), end_time=time(10, 0))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO', self.body(response))
+
+    def test_token_stops_working_after_password_change(self):
+        url = self.feed_url(self.alice)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.alice.set_password('new-pass')
+        self.alice.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(self.feed_url(self.alice)).status_code, 200)  # ลิงก์ใหม่ใช้ได้
+
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=['garbage'])).status_code, 404)
+
+    def test_board_feed_404_after_leaving_board(self):
+        url = self.feed_url(self.alice, self.board.id)
+        self.assertIn('X-WR-CALNAME:ics', self.body(self.client.get(url)))
+
+        self.board.members.remove(self.alice)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        # feed รวมของ user ยังใช้ได้ แต่ไม่มีงานของบอร์ดที่ออกไปแล้ว
+        self.assertNotIn('Quiz', self.body(self.client.get(self.feed_url(self.alice))))
+
+    def test_long_thai_lines_fold_at_75_octets(self):
+        title = 'ส่งรายงานวิชาการออกแบบระบบสารสนเทศ, บทที่ 3; ' * 4
+        Task.objects.create(list=self.list, title=title, position=3 * POSITION_GAP, due_date=self.due)
+
+        raw = b''.join(self.client.get(self.feed_url(self.alice)).streaming_content)
+        self.assertTrue(raw.endswith(b'END:VCALENDAR\r\n'))
+        physical = raw.split(b'\r\n')[:-1]
+        for line in physical:
+            self.assertLessEqual(len(line), 75)
+            line.decode('utf-8')  # ไม่ตัดกลางตัวอักษร UTF-8
+
+        unfolded = raw.decode('utf-8').replace('\r\n ', '').split('\r\n')
+        summary = ics._escape(f"[ics] {title}")
+        self.assertIn(f"SUMMARY:{summary}", unfolded)
+        folded = [line for line in physical if line.startswith(b' ')]
+        self.assertGreater(len(folded), 3)
+
+
+# ==========================================
+# My Tasks: ตัวเลขแต่ละแท็บ + keyset cursor ข้าม NULL / priority เท่ากัน
+# ==========================================
+
+class MyTasksTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='mine-alice', password='pass')
+        self.bob = User.objects.create_user(username='mine-bob', password='pass')
+        board = make_board('mine', self.alice)
+        self.list = List.objects.create(board=board, title='Todo', position=POSITION_GAP)
+        self.now = timezone.now().replace(microsecond=0)
+        self.soon = self.now + timedelta(days=2)
+        self.later = self.now + timedelta(days=20)
+
+        # due เท่ากัน + priority เท่ากันหลายใบ / ไม่มีกำหนดส่งหลายใบ -> cursor ต้องตัดสินด้วย rank แล้ว id
+        plan = [
+            (self.now - timedelta(days=1), Task.Priority.LOW),
+            (self.soon, Task.Priority.LOW),
+            (self.soon, Task.Priority.HIGH),
+            (self.soon, Task.Priority.HIGH),
+            (self.soon, Task.Priority.MEDIUM),
+            (self.later, Task.Priority.MEDIUM),
+            (None, Task.Priority.LOW),
+            (None, Task.Priority.HIGH),
+            (None, Task.Priority.HIGH),
+        ]
+        self.tasks = [self.assign(f"Task {index}", due_date=due, priority=priority)
+                      for index, (due, priority) in enumerate(plan)]
+        self.expected_ids = [task.id for task in sorted(self.tasks, key=lambda task: (
+            task.due_date is None, task.due_date or self.now, -task.priority_rank, task.id,
+        ))]
+
+        # ไม่นับ: เสร็จแล้ว / เก็บถาวร / ของคนอื่น
+        self.assign('Done', due_date=self.soon, is_completed=True)
+        self.assign('Archived', due_date=self.soon, is_archived=True)
+        Task.objects.create(list=self.list, title='Bob', position=POSITION_GAP, due_date=self.soon).assigned_to.add(self.bob)
+
+    def assign(self, title, **fields):
+        task = Task.objects.create(list=self.list, title=title, position=POSITION_GAP, **fields)
+        task.assigned_to.add(self.alice)
+        return task
+
+    def walk(self, bucket, page_size):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = my_tasks_page(my_tasks_queryset(self.alice.id, bucket, self.now), cursor, page_size)
+            seen += [row['id'] for row in rows]
+            if not cursor:
+                return seen
+
+    def test_bucket_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = bucket_counts(self.alice.id, self.now)
+        self.assertEqual(counts, {'all': 9, 'week': 4, 'overdue': 1})
+
+    def test_every_page_size_walks_full_order(self):
+        # ทุกขนาดหน้า -> ขอบหน้าตกทุกตำแหน่ง (รวมรอยต่อจากงานมีกำหนดส่งไปงาน NULL และกลางกลุ่มที่เท่ากัน)
+        for page_size in range(1, len(self.tasks) + 1):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.walk('all', page_size), self.expected_ids)
+        week_ids = [task_id for task_id in self.expected_ids
+                    if Task.objects.get(pk=task_id).due_date == self.soon]
+        self.assertEqual(self.walk('week', 2), week_ids)
+
+    def test_page_crossing_due_date_boundary(self):
+        dated = [task_id for task_id in self.expected_ids if Task.objects.get(pk=task_id).due_date]
+        rows, cursor = my_tasks_page(my_tasks_queryset(self.alice.id), None, len(dated))
+        self.assertIsNotNone(rows[-1]['due_date'])
+
+        rows, cursor = my_tasks_page(my_tasks_queryset(self.alice.id), cursor, 2)
+        self.assertEqual([row['due_date'] for row in rows], [None, None])
+        self.assertEqual([row['priority_rank'] for row in rows], [3, 3])
+        rows, cursor = my_tasks_page(my_tasks_queryset(self.alice.id), cursor, 2)
+        self.assertEqual(([row['id'] for row in rows], cursor), ([self.expected_ids[-1]], None))
+
+    def test_api_errors_and_counts(self):
+        self.client.force_login(self.alice)
+        url = reverse('my_tasks_api')
+
+        data = self.client.get(url, {'limit': 4}).json()
+        self.assertEqual(data['counts'], {'all': 9, 'week': 4, 'overdue': 1})
+        self.assertEqual([task['id'] for task in data['tasks']], self.expected_ids[:4])
+        data = self.client.get(url, {'limit': 4, 'cursor': data['next_cursor']}).json()
+        self.assertNotIn('counts', data)
+        self.assertEqual([task['id'] for task in data['tasks']], self.expected_ids[4:8])
+
+        for params, message in (
+            ({'limit': 'abc'}, 'Invalid limit'),
+            ({'cursor': 'bad'}, 'Invalid cursor'),
+            ({'cursor': base64.urlsafe_b64encode(b'someday|3|1').decode()}, 'Invalid cursor'),
+            ({'bucket': 'later'}, 'Invalid bucket'),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['message'], message)
+
+
+# ==========================================
+# priority_rank: save(update_fields) เขียนตาม + migration 0038 เติมค่าให้งานเดิม
+# ==========================================
+
+class PriorityRankTests(TestCase):
+    def setUp(self):
+        self.list = List.objects.create(board=make_board('rank'), title='Todo', position=POSITION_GAP)
+
+    def test_save_with_update_fields_writes_rank(self):
+        task = Task.objects.create(list=self.list, title='Essay', position=POSITION_GAP, priority=Task.Priority.LOW)
+        self.assertEqual(Task.objects.get(pk=task.pk).priority_rank, 1)
+
+        task.priority = Task.Priority.HIGH
+        task.save(update_fields=['priority'])
+        self.assertEqual(Task.objects.values_list('priority', 'priority_rank').get(pk=task.pk), ('high', 3))
+
+        # แก้ฟิลด์อื่นอย่างเดียว -> ไม่แตะ priority_rank
+        Task.objects.filter(pk=task.pk).update(priority_rank=0)
+        task.title = 'Essay v2'
+        task.save(update_fields=['title'])
+        self.assertEqual(Task.objects.get(pk=task.pk).priority_rank, 0)
+
+    def test_migration_backfills_rank_for_existing_rows(self):
+        priorities = ['medium', 'high', 'low', 'urgent', 'high', 'low']
+        tasks = Task.objects.bulk_create([
+            Task(list=self.list, title=f"Old {index}", position=index, priority=priority, priority_rank=2)
+            for index, priority in enumerate(priorities)
+        ])
+
+        fill = importlib.import_module('board.migrations.0038_task_priority_rank').fill_priority_rank
+        fill(django_apps, None)
+
+        ordered = list(Task.objects.filter(list=self.list).order_by('-priority_rank', 'id').values_list('priority', 'priority_rank'))
+        self.assertEqual(ordered, [
+            ('high', 3), ('high', 3), ('medium', 2), ('low', 1), ('low', 1), ('urgent', 0),
+        ])
+        self.assertEqual(
+            dict(Task.objects.filter(pk__in=[task.pk for task in tasks]).values_list('priority', 'priority_rank')),
+            {**Task.PRIORITY_RANK, 'urgent': 0},
+        )
+
+
+# ==========================================
+# Notification WebSocket: ?since= ส่งเฉพาะแจ้งเตือนที่พลาดไปของ user คนนั้น
+# ==========================================
+
+@override_settings(CACHES=TEST_CACHES, CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+class NotificationConsumerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.actor = User.objects.create_user(username='ws-actor', password='pass')
+        self.alice = User.objects.create_user(username='ws-alice', password='pass')
+        self.bob = User.objects.create_user(username='ws-bob', password='pass')
+        self.alice_ids = []
+        for index in range(4):
+            self.alice_ids += [row.id for row in notify(self.actor, [self.alice, self.bob], f"งาน {index}", 'งานเข้า!')
+                               if row.recipient_id == self.alice.id]
+        self.bob_ids = set(Notification.objects.filter(recipient=self.bob).values_list('id', flat=True))
+
+    async def connect(self, user, since=None):
+        path = '/ws/notifications/' + (f"?since={since}" if since is not None else '')
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator, await communicator.receive_json_from()
+
+    async def test_since_returns_only_newer_rows_of_that_user(self):
+        communicator, frame = await self.connect(self.alice, since=self.alice_ids[1])
+
+        self.assertEqual(frame['type'], 'notification.sync')
+        self.assertFalse(frame['reset'])
+        self.assertEqual([row['id'] for row in frame['notifications']], self.alice_ids[:1:-1])  # ใหม่ -> เก่า
+        self.assertFalse(self.bob_ids & {row['id'] for row in frame['notifications']})
+        self.assertEqual(frame['unread_count'], 4)
+        await communicator.disconnect()
+
+    async def test_since_latest_id_returns_nothing(self):
+        communicator, frame = await self.connect(self.alice, since=self.alice_ids[-1])
+        self.assertEqual((frame['reset'], frame['notifications']), (False, []))
+
+        # แจ้งเตือนใหม่หลัง connect -> ได้เฉพาะแถวใหม่ของตัวเอง
+        created = await sync_to_async(notify)(self.actor, [self.alice, self.bob], 'งานใหม่', 'งานใหม่!')
+        frame = await communicator.receive_json_from()
+        alice_row = next(row for row in created if row.recipient_id == self.alice.id)
+        self.assertEqual([row['id'] for row in frame['notifications']], [alice_row.id])
+        self.assertEqual(frame['unread_count'], 5)
+        await communicator.disconnect()
+
+    async def test_missing_or_bad_since_resets_to_recent(self):
+        for since in (None, 'abc', 0):
+            with self.subTest(since=since):
+                communicator, frame = await self.connect(self.alice, since=since)
+                self.assertTrue(frame['reset'])
+                self.assertEqual([row['id'] for row in frame['notifications']], self.alice_ids[::-1])
+                await communicator.disconnect()
+
+    async def test_too_many_missed_resets_to_recent_limit(self):
+        for index in range(RECENT_LIMIT):
+            await sync_to_async(notify)(self.actor, [self.alice], f"เพิ่ม {index}", 'งานเข้า!')
+
+        communicator, frame = await self.connect(self.alice, since=self.alice_ids[0])
+        self.assertTrue(frame['reset'])
+        self.assertEqual(len(frame['notifications']), RECENT_LIMIT)
+        await communicator.disconnect()
+
+
+# ==========================================
+# run_due_jobs: limit ต่อ destination นับรวมงานที่รอบนี้ส่งไปแล้ว
+# ==========================================
+
+class RecordingPool:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id, destination):
+        self.submitted.append((job_id, destination))
+
+    def join(self):
+        pass
+
+
+class RunDueJobsTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(jobs, 'JOB_DESTINATION_LIMITS', {'email': 4, 'discord': 1})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def jobs(self, destination, count, **fields):
+        return Job.objects.bulk_create([
+            Job(kind=destination.split(':', 1)[0], destination=destination, **fields) for _ in range(count)
+        ])
+
+    def test_submissions_count_toward_destination_limit(self):
+        now = timezone.now()
+        self.jobs('email', 1, status=Job.Status.RUNNING, locked_at=now)  # โปรเซสอื่นกำลังส่งอยู่ 1
+        emails = self.jobs('email', 6)
+        hooks = self.jobs('discord:/a', 3)
+        busy_hook = self.jobs('discord:/b', 2)
+        self.jobs('discord:/b', 1, status=Job.Status.RUNNING, locked_at=now)
+
+        pool = RecordingPool()
+        submitted = jobs.run_due_jobs(pool=pool)
+
+        self.assertEqual(submitted, 4)
+        self.assertEqual(pool.submitted, [
+            *[(job.id, 'email') for job in emails[:3]],
+            (hooks[0].id, 'discord:/a'),
+        ])
+        self.assertFalse({job.id for job in busy_hook} & {job_id for job_id, _ in pool.submitted})
+
+    def test_stale_running_jobs_do_not_block(self):
+        stale = timezone.now() - jobs.JOB_LOCK_TIMEOUT - timedelta(minutes=1)
+        crashed = self.jobs('discord:/a', 1, status=Job.Status.RUNNING, locked_at=stale)
+        pending = self.jobs('discord:/a', 1)
+
+        pool = RecordingPool()
+        self.assertEqual(jobs.run_due_jobs(pool=pool), 1)
+        self.assertEqual(pool.submitted, [(crashed[0].id, 'discord:/a')])  # เก็บงานของ worker ที่ตายก่อน
+        self.assertNotIn(pending[0].id, [job_id for job_id, _ in pool.submitted])
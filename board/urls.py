@@ -3,12 +3,14 @@ from .views import *
 
 urlpatterns = [
     path('home/',board_lsit_view, name="home"),
+    path('api/my-tasks/', my_tasks_api, name='my_tasks_api'),
     path("projects/", project_page, name="project_page"),
 
     # BOARD
     path('board/<int:board_id>/star/', toggle_star_board, name='board_star'),
     path("create/", board_create, name="board_create"),
     path("<int:board_id>/", board_detail, name="board_detail"),
+    path("<int:board_id>/snapshot/", board_snapshot_api, name="board_snapshot_api"),
     path("<int:board_id>/edit/", board_update, name="board_update"),
     path("<int:board_id>/delete/", board_delete, name="board_delete"),
     path('board/<int:board_id>/archived-tasks/', get_archived_tasks, name='get_archived_tasks'),
@@ -39,6 +41,7 @@ urlpatterns = [
     path("task/create/<int:list_id>/", task_create, name="task_create"),
     path("task/<int:task_id>/edit/", task_update, name="task_update"),
     path("task/<int:task_id>/delete/", task_delete, name="task_delete"),
+    path("task/<int:task_id>/card/", task_card_partial, name="task_card_partial"),
     path("task/move/", task_move, name="task_move"),
     path('api/calendar/update-date/', api_update_task_date, name='api_update_task_date'),
 
@@ -66,10 +69,12 @@ urlpatterns = [
 
     # ประวัติการทำงาน
     path('<int:board_id>/activities/', get_board_activities, name='get_board_activities'),
+    path('<int:board_id>/activities/export/', export_board_activities, name='export_board_activities'),
 
     # 1. หน้าปฏิทิน
     path('my-calendar/', global_calendar_view, name='global_calendar'),
     path('api/calendar/events/', api_calendar_events, name='api_calendar_events'),
+    path('calendar/feed/<str:token>.ics', calendar_feed, name='calendar_feed'),
     path('google-calendar/init/', google_calendar_init, name='google_calendar_init'),
     path('google-calendar/callback/', google_calendar_callback, name='google_calendar_callback'),
     path('api/calendar-widget/', fetch_google_calendar_partial, name='fetch_google_calendar'),
@@ -81,6 +86,7 @@ urlpatterns = [
 
     # 2. Reporting
     path('reporting/', reporting_view, name='reporting'),
+    path('reporting/tasks/', reporting_tasks_api, name='reporting_tasks_api'),
 
     path('schedule/create/', create_class_schedule, name='create_class_schedule'),
     path('schedule/delete/<int:schedule_id>/', delete_class_schedule, name='delete_class_schedule'),
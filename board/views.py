@@ -1,30 +1,43 @@
 from django.db import models
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from .models import Board, List, Task, Comment , Label , BoardInvitation , ChecklistItem, Attachment, Notification , ActivityLog , ClassSchedule
+from .models import Board, List, Task, Comment , Label , BoardInvitation , ChecklistItem, Attachment, Notification , ActivityLog , ClassSchedule, SearchDocument
 from .forms import BoardForm, ListForm, TaskForm , ClassScheduleForm 
+from .notifications import notify, adjust_unread, get_unread_count, recent_notifications, push_read_state
+from .jobs import enqueue_email, enqueue_discord
+from .snapshot import get_board_snapshot, get_board_version, hydrate_snapshot
+from .google_calendar import upcoming_events, calendar_feed_events, floor_time, sync_calendar
+from .permissions import accessible_board_ids, accessible_boards, can_access, filter_accessible
+from .reporting import TREND_DAYS, TREND_RANGES, get_report, report_task_page
+from .search import search
+from .activity import (
+    ACTIVITY_PAGE_SIZE, EXPORT_FORMATS, InvalidCursor, activity_page, activity_queryset, export_lines, parse_filters,
+    log as log_activity, serialize as serialize_activity,
+)
+from .my_tasks import (
+    BUCKETS as MY_TASK_BUCKETS, MY_TASKS_PAGE_SIZE, InvalidCursor as InvalidMyTasksCursor, bucket_counts,
+    my_tasks_page, my_tasks_queryset, serialize as serialize_my_task,
+)
+from .ics import (
+    InvalidToken as InvalidIcsToken, feed_board_ids as ics_feed_board_ids, feed_lines as ics_feed_lines,
+    feed_version as ics_feed_version, make_token as make_ics_token, read_token as read_ics_token,
+)
+from .ordering import POSITION_GAP, first_position, last_position, move_list, move_task, move_task_to_order, reorder_lists
 from users.models import User
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.http import require_POST
-from django.db.models import Max
-from django.db.models import Q, Prefetch
+from django.utils.http import parse_etags
+from django.db.models import Q
 import json
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count
-from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date, parse_datetime
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from django.conf import settings
 import datetime
-import requests
-from django.core.mail import send_mail
-import threading
-from django.core.cache import cache
 from django.contrib import messages
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 
 # ==========================================
 # 1. Main Dashboard & Project Views
@@ -45,41 +58,20 @@ def board_lsit_view(request):
     # =================================================
     # 2. ส่วนบอร์ด (Boards)
     # =================================================
-    boards = Board.objects.filter(
-        Q(created_by=request.user) | Q(members=request.user)
-    ).distinct()
+    boards = accessible_boards(request.user)
 
     # =================================================
     # 3. ส่วนงานของฉัน (My Tasks)
     # =================================================
-    all_tasks = Task.objects.filter(
-        assigned_to=request.user,
-        is_completed=False,
-        is_archived=False
-    ).select_related('list__board').order_by('due_date', '-priority')
-
+    # ตัวเลขทุกแท็บนับใน query เดียว + หน้าแรกของ "ทั้งหมด" (หน้าถัดไป / แท็บอื่นโหลดผ่าน my_tasks_api)
     now = timezone.now()
-    next_week = now + timedelta(days=7)
-    
-    task_list_data = []
-    counts = {'all': all_tasks.count(), 'overdue': 0, 'week': 0}
-
-    for task in all_tasks:
-        is_overdue = False
-        is_week = False
-        if task.due_date:
-            if task.due_date < now:
-                is_overdue = True
-                counts['overdue'] += 1
-            elif task.due_date <= next_week:
-                is_week = True
-                counts['week'] += 1
-        
-        task_list_data.append({
-            'obj': task,
-            'is_overdue': is_overdue,
-            'is_week': is_week
-        })
+    counts = bucket_counts(request.user.id, now)
+    rows, next_cursor = my_tasks_page(my_tasks_queryset(request.user.id, 'all', now))
+    my_tasks = {
+        'counts': counts,
+        'tasks': [serialize_my_task(row, now) for row in rows],
+        'next_cursor': next_cursor,
+    }
 
     # =================================================
     # 4. ส่วน Google Calendar  - UPDATED
@@ -88,100 +80,13 @@ def board_lsit_view(request):
     google_course_names = []
     
     if 'google_credentials' in request.session:
-        # ตั้งชื่อ Key สำหรับจำข้อมูล (แยกตาม User ID)
-        cache_key_events = f"google_events_{request.user.id}"
-        cache_key_courses = f"google_courses_{request.user.id}"
-        
-        # 1. ลองถาม Cache ดูก่อนว่ามีข้อมูลไหม?
-        cached_events = cache.get(cache_key_events)
-        cached_courses = cache.get(cache_key_courses)
-
-        if cached_events is not None and cached_courses is not None:
-            #  เจอ! ใช้ข้อมูลเก่าเลย (เร็วมาก ไม่ต้องรอโหลด)
-            google_events = cached_events
-            google_course_names = cached_courses
-        else:
-            #  ไม่เจอ (หรือหมดอายุ) ให้วิ่งไปถาม Google (ยอมช้าหน่อย)
-            try:
-                creds_data = request.session['google_credentials']
-                creds = Credentials(**creds_data)
-                service = build('calendar', 'v3', credentials=creds)
-                
-                now_iso = datetime.datetime.utcnow().isoformat() + 'Z'
-                
-                # 1. ดึงรายชื่อปฏิทิน
-                calendar_list = service.calendarList().list().execute().get('items', [])
-                
-                all_events = []
-                temp_course_names = [] # ใช้ตัวแปรชั่วคราว
-                
-                # 2. วนลูปดึง Event
-                for calendar_entry in calendar_list:
-                    cal_name = calendar_entry.get('summary', '')
-
-                    keywords = ['holiday', 'วันหยุด', 'birthday', 'วันเกิด']
-                    if any(k in cal_name.lower() for k in keywords):
-                        continue
-
-                    if cal_name not in temp_course_names and '@' not in cal_name:
-                        temp_course_names.append(cal_name)
-
-                    try:
-                        events_result = service.events().list(
-                            calendarId=calendar_entry['id'], 
-                            timeMin=now_iso,
-                            maxResults=5, 
-                            singleEvents=True,
-                            orderBy='startTime'
-                        ).execute()
-                        
-                        items = events_result.get('items', [])
-                        for event in items:
-                            event['calendar_name'] = cal_name
-                            all_events.append(event)
-                            
-                    except Exception:
-                        continue # ข้ามปฏิทินที่มีปัญหา
-
-                # 3. จัดเรียงข้อมูล
-                def get_start_time(e):
-                    return e['start'].get('dateTime', e['start'].get('date'))
-                
-                all_events.sort(key=get_start_time)
-                all_events = all_events[:15]
-
-                # 4. แปลงข้อมูล
-                final_events = []
-                for event in all_events:
-                    start = event['start'].get('dateTime', event['start'].get('date'))
-                    try:
-                        if isinstance(start, str):
-                            if 'T' in start:
-                                 start_dt = datetime.datetime.fromisoformat(start.replace('Z', '+00:00'))
-                            else:
-                                 start_dt = datetime.datetime.strptime(start, "%Y-%m-%d")
-                        else:
-                            start_dt = start
-                    except ValueError:
-                        start_dt = start
-
-                    final_events.append({
-                        'title': event.get('summary', '(ไม่มีชื่อ)'),
-                        'start': start_dt,
-                        'link': event.get('htmlLink', '#'),
-                        'source': event.get('calendar_name', 'Google Calendar')
-                    })
-                
-                # อัปเดตตัวแปรหลัก
-                google_events = final_events
-                google_course_names = temp_course_names
-
-                # 5. บันทึกลง Cache (จำไว้ 15 นาที = 900 วินาที) 
-                cache.set(cache_key_events, google_events, 900)
-                cache.set(cache_key_courses, google_course_names, 900)
-                
-            except Exception as e:
-                print(f"Google API Error: {e}")
+        # ดึงผ่าน service กลาง (cache ต่อ user / ปฏิทิน / ช่วงเวลา + ยิงทุกปฏิทินพร้อมกัน)
+        try:
+            google_events, google_course_names = upcoming_events(
+                request.user.id, request.session['google_credentials']
+            )
+        except Exception as e:
+            print(f"Google API Error: {e}")
 
     # =================================================
     # 5. ส่วนตารางเรียน (Schedule Calculation Logic) 
@@ -237,8 +142,7 @@ def board_lsit_view(request):
     context = {
         'received_invites': received_invites,
         'boards': boards,
-        'task_list_data': task_list_data,
-        'counts': counts,
+        'my_tasks': my_tasks,
         'google_events': google_events,
         'google_course_names': google_course_names, 
         'manual_schedules': manual_schedules, 
@@ -249,17 +153,42 @@ def board_lsit_view(request):
     
     return render(request, 'boards/dashboard.html', context)
 
+@login_required
+def my_tasks_api(request):
+    # ?bucket=all|week|overdue&cursor=...  (หน้าแรกของแต่ละแท็บแนบตัวเลขทุกแท็บมาด้วย)
+    bucket = request.GET.get('bucket', 'all')
+    if bucket not in MY_TASK_BUCKETS:
+        return JsonResponse({'status': 'error', 'message': 'Invalid bucket'}, status=400)
+
+    now = timezone.now()
+    cursor = request.GET.get('cursor')
+    try:
+        page_size = int(request.GET.get('limit', MY_TASKS_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid limit'}, status=400)
+    try:
+        rows, next_cursor = my_tasks_page(my_tasks_queryset(request.user.id, bucket, now), cursor, page_size)
+    except InvalidMyTasksCursor:
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
+
+    data = {
+        'tasks': [serialize_my_task(row, now) for row in rows],
+        'next_cursor': next_cursor,
+    }
+    if not cursor:
+        data['counts'] = bucket_counts(request.user.id, now)
+    return JsonResponse(data)
+
 @login_required
 def project_page(request):
     # 1. ดึง Query พื้นฐานมาก่อน (คนสร้าง หรือ สมาชิก)
-    boards = Board.objects.filter(
-        Q(created_by=request.user) | Q(members=request.user)
-    ).distinct()
+    boards = accessible_boards(request.user)
 
     search_query = request.GET.get('q')  
     if search_query:
-        # กรองเฉพาะบอร์ดที่มีชื่อตรงกับคำค้น (icontains = ไม่สนตัวพิมพ์เล็กใหญ่)
-        boards = boards.filter(name__icontains=search_query)
+        # กรองเฉพาะบอร์ดที่ชื่อ/คำอธิบายตรงกับคำค้น (ผ่าน search index ดู search.py)
+        results = search(request.user, search_query, kinds=[SearchDocument.Kind.BOARD], limit=None)
+        boards = boards.filter(id__in=[result['board_id'] for result in results])
 
     # 3. สั่งเรียงลำดับ (เหมือนเดิม)
     boards = boards.order_by("-created_at")
@@ -281,20 +210,8 @@ def search_boards_api(request):
     if len(query) < 1:
         return JsonResponse({'results': []})
 
-    # ค้นหาบอร์ดที่เรามีสิทธิ์เห็น (เป็นเจ้าของ หรือ เป็นสมาชิก)
-    boards = Board.objects.filter(
-        Q(created_by=request.user) | Q(members=request.user),
-        name__icontains=query
-    ).distinct().order_by('-updated_at')[:5]  # จำกัดแค่ 5 อันดับล่าสุด
-
-    results = []
-    for b in boards:
-        results.append({
-            'id': b.id,
-            'name': b.name,
-            # ส่ง URL รูปปกไปด้วย (ถ้ามี) เพื่อความสวยงาม
-            'cover': b.cover_image.url if b.cover_image else None 
-        })
+    # ค้นหาบอร์ด / งาน / คอมเมนต์ / เช็คลิสต์ ในบอร์ดที่เรามีสิทธิ์เห็น (จัดอันดับ + กรองสิทธิ์ใน query เดียว)
+    results = search(request.user, query, limit=10)
 
     return JsonResponse({'results': results})
 
@@ -315,9 +232,9 @@ def board_create(request):
             # ✅ สร้าง 3 ลิสต์เริ่มต้นให้บอร์ดนี้อัตโนมัติ
             # (กันกรณีเผื่อเรียกซ้ำ ไม่ให้สร้างซ้ำ)
             if not board.lists.exists():
-                List.objects.create(board=board, title="TO DO",  position=1)
-                List.objects.create(board=board, title="Doing", position=2)
-                List.objects.create(board=board, title="Done",  position=3)
+                List.objects.create(board=board, title="TO DO",  position=1 * POSITION_GAP)
+                List.objects.create(board=board, title="Doing", position=2 * POSITION_GAP)
+                List.objects.create(board=board, title="Done",  position=3 * POSITION_GAP)
 
             return redirect("board_detail", board_id=board.id)
     else:
@@ -332,34 +249,50 @@ def board_list(request):
 
 @login_required
 def board_detail(request, board_id):
-    board = get_object_or_404(
-        Board.objects.filter(
-            Q(created_by=request.user) | Q(members=request.user)
-        ).distinct(),  
-        id=board_id
-    )
-    
-    lists = List.objects.filter(board=board).order_by('position').prefetch_related(
-        Prefetch(
-            'tasks',
-            queryset=Task.objects.filter(is_archived=False).prefetch_related('assigned_to', 'labels').select_related('list').order_by('position')
-        )
-    )
-
-    users = User.objects.filter(
-        Q(id=board.created_by.id) | Q(joined_boards=board)
-    ).distinct()
+    board = get_object_or_404(accessible_boards(request.user), id=board_id)
     
-    priority_choices = Task.Priority.choices
+    # ดึงทั้งบอร์ดจาก Snapshot (cache ตาม version -> ไม่ต้อง query การ์ดทีละใบ)
+    snapshot = get_board_snapshot(board)
+    data = hydrate_snapshot(snapshot)
 
     return render(request, "boards/board_detail.html", {
         "board": board,
-        "lists": lists,
-        "users": users,
-        "priority_choices": priority_choices,
-        "labels": board.labels.all(),
+        "lists": data["lists"],
+        "users": data["members"],
+        "priority_choices": Task.Priority.choices,
+        "labels": data["labels"],
+        "snapshot": snapshot,
     })
 
+@login_required
+def board_snapshot_api(request, board_id):
+    """API ส่งข้อมูลทั้งบอร์ดเป็น JSON (ใช้ version เป็น ETag)"""
+    board = get_object_or_404(accessible_boards(request.user), id=board_id)
+
+    etag = f'"{get_board_version(board.id)}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(get_board_snapshot(board))
+    response['ETag'] = etag
+    return response
+
+@login_required
+def task_card_partial(request, task_id):
+    """HTML ของการ์ด 1 ใบ (client เรียกเมื่อได้ event task.created / task.updated จาก WebSocket)"""
+    task = get_object_or_404(
+        filter_accessible(Task.objects.select_related('list__board'), request.user, 'list__board_id'), id=task_id
+    )
+
+    # ใช้ snapshot เดียวกับหน้าบอร์ด (cache ตาม version -> client หลายคนขอพร้อมกันก็สร้างครั้งเดียว)
+    data = hydrate_snapshot(get_board_snapshot(task.list.board))
+    for lst in data["lists"]:
+        for card in lst["tasks"]:
+            if card["id"] == task.id:
+                return render(request, "boards/components/task_item.html", {"task": card, "lst": lst})
+
+    return HttpResponse(status=204)  # การ์ดถูกเก็บ (archived) -> ไม่แสดงบนบอร์ดแล้ว
+
 # UPDATE
 @login_required
 def board_update(request, board_id):
@@ -390,10 +323,10 @@ def toggle_star_board(request, board_id):
     board = get_object_or_404(Board, id=board_id)
     
     # ตรวจสอบสิทธิ์ (ต้องเป็นสมาชิกบอร์ดถึงจะติดดาวได้)
-    if request.user not in board.members.all() and board.created_by != request.user:
+    if not can_access(request.user, board.id):
         return JsonResponse({'error': 'Permission denied'}, status=403)
 
-    if request.user in board.starred_by.all():
+    if board.starred_by.filter(pk=request.user.pk).exists():
         board.starred_by.remove(request.user)
         is_starred = False
     else:
@@ -412,10 +345,9 @@ def leave_board(request, board_id):
     if request.user == board.created_by:
         return redirect('board_detail', board_id=board.id)
 
-    if request.user in board.members.all():
+    if can_access(request.user, board.id):
         board.members.remove(request.user)
-        # (Option) อยากบันทึก Log การออกด้วยไหม? ถ้าอยากก็ Uncomment บรรทัดล่างครับ
-        log_activity(board, request.user, f"ได้ออกจากบอร์ด '{board.name}'")
+        log_activity(board, request.user, ActivityLog.Verb.BOARD_LEFT, board=board.name)
         
     return redirect('project_page') # ออกเสร็จเด้งกลับหน้าแรก
 
@@ -427,21 +359,15 @@ def leave_board(request, board_id):
 # LIST CREATE
 @login_required
 def list_create(request, board_id):
-    board = get_object_or_404(
-        Board.objects.filter(
-            Q(created_by=request.user) | Q(members=request.user)
-        ).distinct(),
-        id=board_id
-    )
+    board = get_object_or_404(accessible_boards(request.user), id=board_id)
 
     if request.method == "POST":
         title = request.POST.get("title", "").strip()
         if title:
-            max_pos = board.lists.aggregate(Max("position"))["position__max"] or 0
             List.objects.create(
                 board=board,
                 title=title,
-                position=max_pos + 1
+                position=last_position(board.lists.all())
             )          
         return redirect("board_detail", board_id=board.id)
     form = ListForm()
@@ -452,9 +378,7 @@ def list_create(request, board_id):
 @login_required
 def list_update(request, list_id):
     lst = get_object_or_404(
-        List.objects.filter(
-            Q(board__created_by=request.user) | Q(board__members=request.user)
-        ).distinct(),
+        filter_accessible(List.objects.all(), request.user),
         id=list_id
     )
     board = lst.board
@@ -473,9 +397,7 @@ def list_update(request, list_id):
 @login_required
 def list_delete(request, list_id):
     list_obj = get_object_or_404(
-        List.objects.filter(
-            Q(board__created_by=request.user) | Q(board__members=request.user)
-        ).distinct(),
+        filter_accessible(List.objects.all(), request.user),
         id=list_id
     )
 
@@ -489,12 +411,15 @@ def list_delete(request, list_id):
 @require_POST
 @login_required
 def list_reorder(request, board_id):
-    board = get_object_or_404(
-        Board, 
-        Q(id=board_id) & (Q(created_by=request.user) | Q(members=request.user))
-    )
+    board = get_object_or_404(accessible_boards(request.user), id=board_id)
     list_id = request.POST.get("list_id")
     target_id = request.POST.get("target_id")
+    order_str = request.POST.get("order")
+
+    # ส่งลำดับลิสต์ทั้งบอร์ดมา -> เขียนทีเดียวด้วย UPDATE ... CASE WHEN
+    if order_str:
+        reorder_lists(board.id, [int(id) for id in order_str.split(",") if id])
+        return JsonResponse({"success": True})
 
     if not list_id or not target_id:
         return JsonResponse({"success": False, "error": "missing params"}, status=400)
@@ -502,24 +427,15 @@ def list_reorder(request, board_id):
     lst = get_object_or_404(List, id=list_id, board=board)
     target = get_object_or_404(List, id=target_id, board=board)
 
-    # ดึงลิสต์ทั้งหมดเรียงตาม position
-    lists = list(board.lists.order_by("position"))
-
-    # เอาตัวที่ลากออกก่อน
-    lists = [l for l in lists if l.id != lst.id]
-
-    # แทรก lst ไว้ก่อน target
-    new_order = []
-    for l in lists:
-        if l.id == target.id:
-            new_order.append(lst)
-        new_order.append(l)
-
-    # เซฟ position ใหม่เรียงจาก 1...
-    for idx, l in enumerate(new_order, start=1):
-        if l.position != idx:
-            l.position = idx
-            l.save(update_fields=["position"])
+    # แทรก lst ไว้ก่อน target -> เพื่อนบ้านคือ (ลิสต์ที่อยู่ก่อน target, target)
+    prev_list = (
+        board.lists.exclude(id=lst.id)
+        .filter(Q(position__lt=target.position) | Q(position=target.position, id__lt=target.id))
+        .order_by("-position", "-id")
+        .first()
+    )
+    if lst.id != target.id:
+        move_list(lst, prev_id=prev_list.id if prev_list else None, next_id=target.id)
 
     return JsonResponse({"success": True})
 
@@ -536,71 +452,48 @@ def list_reorder(request, board_id):
 def task_create(request, list_id):
     # 1. ดึง List และเช็คสิทธิ์
     list_obj = get_object_or_404(
-        List.objects.filter(
-            Q(board__created_by=request.user) | Q(board__members=request.user)
-        ).distinct(),
+        filter_accessible(List.objects.all(), request.user),
         id=list_id
     )
 
     if request.method == "POST":
-        form = TaskForm(request.POST)
+        form = TaskForm(request.POST, board=list_obj.board)
         if form.is_valid():
             # 2. บันทึก Task เบื้องต้น
             task = form.save(commit=False)
             task.created_by = request.user
             task.list = list_obj
+            task.position = first_position(list_obj.tasks.all())  # การ์ดใหม่อยู่บนสุด
             task.save() 
             
-            # 3. จัดการ Labels
-            label_ids = request.POST.getlist('labels')
-            if label_ids:
-                task.labels.set(label_ids)
-
-            # 4. จัดการ Assignees
-            assignee_ids = request.POST.getlist('assigned_to')
-            if assignee_ids:
-                users_to_assign = User.objects.filter(id__in=assignee_ids)
-                task.assigned_to.set(users_to_assign)
+            # 3-4. Labels + Assignees (ฟอร์มตรวจแล้วว่าเป็นของบอร์ดนี้ / สมาชิกบอร์ด)
+            form.save_m2m()
 
             # บันทึก Log
-            log_activity(list_obj.board, request.user, f"สร้างการ์ด '{task.title}' ในรายการ '{list_obj.title}'")
+            log_activity(list_obj.board, request.user, ActivityLog.Verb.TASK_CREATED, task=task, to_list=list_obj)
             
-            import threading
-
             # ==================================================
             # 5. แจ้งเตือน Notification (Real-time) & Email
             # ==================================================
-            assigned_users = task.assigned_to.all()
+            assigned_users = list(User.objects.filter(id__in=form.added_assignee_ids)) if form.added_assignee_ids else []
+            if assigned_users:
+                log_activity(
+                    list_obj.board, request.user, ActivityLog.Verb.TASK_ASSIGNED,
+                    task=task, users=", ".join(u.username for u in assigned_users),
+                )
+            # A + B. ลง Database + ส่งสัญญาณ Real-time (ทำเป็นชุดเดียว)
+            notify(
+                request.user,
+                assigned_users,
+                message=f"ได้มอบหมายงานใหม่ '{task.title}' ให้คุณ",
+                push_message=f"งานเข้า! '{task.title}'",
+                task=task,
+            )
+
             for user in assigned_users:
                 if user != request.user:
-                    # A. สร้าง Notification ลง Database
-                    Notification.objects.create(
-                        recipient=user,
-                        actor=request.user,
-                        task=task,
-                        message=f"ได้มอบหมายงานใหม่ '{task.title}' ให้คุณ"
-                    )
-
-                    # B. ✅ ส่งสัญญาณ Real-time เข้าห้องส่วนตัวของ User
-                    unread_count = Notification.objects.filter(recipient=user, is_read=False).count()
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        f"user_{user.id}",  # ส่งหา user คนนี้โดยเฉพาะ
-                        {
-                            "type": "send_notification",
-                            "message": f"งานเข้า! '{task.title}'",
-                            "unread_count": unread_count
-                        }
-                    )
-
-                    # C. ส่ง Email (แยก Thread)
-                    try:
-                        threading.Thread(
-                            target=send_email_notify, 
-                            args=(task, user)
-                        ).start()
-                    except Exception as e:
-                        print(f"Email Thread Error: {e}")
+                    # C. ส่ง Email (เข้าคิวงานเบื้องหลัง)
+                    send_email_notify(task, user)
 
             # ==================================================
             # 6. แจ้งเตือน DISCORD
@@ -619,17 +512,14 @@ def task_create(request, list_id):
                         f"**By:** {request.user.username}"
                     )
                     
-                    threading.Thread(
-                        target=send_discord_notify, 
-                        args=(discord_msg, webhook_url)
-                    ).start()
+                    send_discord_notify(discord_msg, webhook_url)
                 
             except Exception as e:
                 print(f"Discord Notify Error: {e}")
 
             return redirect("board_detail", board_id=list_obj.board.id)
     else:
-        form = TaskForm()
+        form = TaskForm(board=list_obj.board)
 
     return render(request, "tasks/task_form.html", {
         "form": form,
@@ -639,19 +529,17 @@ def task_create(request, list_id):
 @login_required
 def task_update(request, task_id):
     task = get_object_or_404(
-        Task.objects.filter(
-            Q(list__board__created_by=request.user) | Q(list__board__members=request.user)
-        ).distinct(),
+        filter_accessible(Task.objects.all(), request.user, 'list__board_id'),
         id=task_id
     )
 
-    # จำค่าเดิมไว้เปรียบเทียบ
-    old_assignee_ids = set(task.assigned_to.values_list('id', flat=True))
+    # จำค่าเดิมไว้เปรียบเทียบ (ผู้รับผิดชอบเดิม ฟอร์มจำไว้ให้แล้ว)
     old_due_date = task.due_date
     old_remind_days = task.remind_days # ✅ เพิ่ม: จำค่าวันเตือนเดิม
+    board = task.list.board
 
     if request.method == "POST":
-        form = TaskForm(request.POST, instance=task)
+        form = TaskForm(request.POST, instance=task, board=board)
         if form.is_valid():
             updated_task = form.save(commit=False)
             
@@ -660,51 +548,35 @@ def task_update(request, task_id):
                 updated_task.is_reminded = False
             
             updated_task.save()
-            form.save_m2m() # บันทึก Many-to-Many
 
             # -----------------------------------------------
-            # A. จัดการ Assignees ใหม่ (แบบ Manual เพื่อหาความเปลี่ยนแปลง)
+            # A. Labels + Assignees: เขียนเฉพาะส่วนที่เปลี่ยน (ฟอร์ม diff กับค่าเดิมให้)
             # -----------------------------------------------
-            label_ids = request.POST.getlist('labels')
-            if label_ids:
-                 updated_task.labels.set(label_ids)
-
-            new_assignee_ids = request.POST.getlist('assigned_to')
-            new_assignee_ids_set = set(map(int, new_assignee_ids)) if new_assignee_ids else set()
-            
-            users_to_assign = User.objects.filter(id__in=new_assignee_ids_set)
-            updated_task.assigned_to.set(users_to_assign)
-
-            # หาคนที่ "เพิ่งถูกเพิ่ม" (New - Old)
-            added_ids = new_assignee_ids_set - old_assignee_ids
-            added_users = User.objects.filter(id__in=added_ids)
-
-            channel_layer = get_channel_layer()
-            import threading
+            form.save_m2m()
+            added_ids = form.added_assignee_ids
+            assignees_changed = bool(added_ids or form.removed_assignee_ids)
+            added_users = User.objects.filter(id__in=added_ids) if added_ids else []
+
+            # บันทึก Log (แก้ไข + ผู้รับผิดชอบที่เพิ่ม/ถอนออก)
+            log_activity(board, request.user, ActivityLog.Verb.TASK_UPDATED, task=updated_task)
+            for verb, user_ids in (
+                (ActivityLog.Verb.TASK_ASSIGNED, added_ids),
+                (ActivityLog.Verb.TASK_UNASSIGNED, form.removed_assignee_ids),
+            ):
+                if user_ids:
+                    usernames = User.objects.filter(id__in=user_ids).order_by('username').values_list('username', flat=True)
+                    log_activity(board, request.user, verb, task=updated_task, users=", ".join(usernames))
 
             # -----------------------------------------------
-            # ✅ B. แจ้งเตือนคนใหม่ (Real-time) - แก้ไข Indentation แล้ว
+            # ✅ B. แจ้งเตือนคนใหม่ (Real-time)
             # -----------------------------------------------
-            for user in added_users:
-                if user != request.user:
-                    # 1. ลง DB
-                    Notification.objects.create(
-                        recipient=user,
-                        actor=request.user,
-                        task=updated_task,
-                        message=f"ได้มอบหมายงาน '{updated_task.title}' ให้คุณ"
-                    )
-                    
-                    # 2. ส่ง Real-time (ต้องอยู่ใน Loop เพื่อส่งหาทีละคน)
-                    unread_count = Notification.objects.filter(recipient=user, is_read=False).count()
-                    async_to_sync(channel_layer.group_send)(
-                        f"user_{user.id}",
-                        {
-                            "type": "send_notification",
-                            "message": f"งานเข้าใหม่! '{updated_task.title}'",
-                            "unread_count": unread_count
-                        }
-                    )
+            notify(
+                request.user,
+                added_users,
+                message=f"ได้มอบหมายงาน '{updated_task.title}' ให้คุณ",
+                push_message=f"งานเข้าใหม่! '{updated_task.title}'",
+                task=updated_task,
+            )
 
             # -----------------------------------------------
             # ✅ C. แจ้งเตือนเมื่อเปลี่ยน Due Date (Real-time)
@@ -713,31 +585,19 @@ def task_update(request, task_id):
                 date_msg = updated_task.due_date.strftime('%d/%m/%Y') if updated_task.due_date else "ไม่มีกำหนด"
                 
                 # แจ้งทุกคนที่รับผิดชอบงาน
-                for user in updated_task.assigned_to.all():
-                    if user != request.user:
-                        # ลง DB
-                        Notification.objects.create(
-                            recipient=user,
-                            actor=request.user,
-                            task=updated_task,
-                            message=f"ได้เปลี่ยนกำหนดส่งงาน '{updated_task.title}' เป็น {date_msg}"
-                        )
-                        # ส่ง Real-time
-                        unread_count = Notification.objects.filter(recipient=user, is_read=False).count()
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{user.id}",
-                            {
-                                "type": "send_notification",
-                                "message": f"⏰ เลื่อนกำหนดส่งงาน '{updated_task.title}'",
-                                "unread_count": unread_count
-                            }
-                        )
+                notify(
+                    request.user,
+                    updated_task.assigned_to.all(),
+                    message=f"ได้เปลี่ยนกำหนดส่งงาน '{updated_task.title}' เป็น {date_msg}",
+                    push_message=f"⏰ เลื่อนกำหนดส่งงาน '{updated_task.title}'",
+                    task=updated_task,
+                )
 
             # -----------------------------------------------
             # D. แจ้งเตือน DISCORD
             # -----------------------------------------------
-            webhook_url = task.list.board.discord_webhook_url
-            if webhook_url and (old_assignee_ids != new_assignee_ids_set):
+            webhook_url = board.discord_webhook_url
+            if webhook_url and assignees_changed:
                 current_assignees = updated_task.assigned_to.all()
                 assignee_names = ", ".join([u.username for u in current_assignees]) if current_assignees else "Unassigned"
                 
@@ -747,11 +607,11 @@ def task_update(request, task_id):
                     f"**New Team:** {assignee_names}\n"
                     f"**By:** {request.user.username}"
                 )
-                threading.Thread(target=send_discord_notify, args=(msg, webhook_url)).start()
+                send_discord_notify(msg, webhook_url)
 
-            return redirect("board_detail", board_id=task.list.board.id)
+            return redirect("board_detail", board_id=board.id)
     else:
-        form = TaskForm(instance=task)
+        form = TaskForm(instance=task, board=board)
 
     return render(request, "tasks/task_form.html", {
         "form": form,
@@ -762,9 +622,7 @@ def task_update(request, task_id):
 def task_delete(request, task_id):
     # ✅ แก้ไข Query: เช็คว่าเป็น Owner (created_by) หรือ Member (members)
     task = get_object_or_404(
-        Task.objects.filter(
-            Q(list__board__created_by=request.user) | Q(list__board__members=request.user)
-        ).distinct(),
+        filter_accessible(Task.objects.all(), request.user, 'list__board_id'),
         id=task_id
     )
     board_id = task.list.board.id
@@ -790,68 +648,61 @@ def task_move(request):
     
         # ค้นหา Task (เช็คสิทธิ์ Owner หรือ Member)
         task = get_object_or_404(
-            Task.objects.filter(
-                Q(list__board__created_by=request.user) | Q(list__board__members=request.user)
-            ).distinct(),
+            filter_accessible(Task.objects.select_related('list'), request.user, 'list__board_id'),
             id=task_id
         )
         
         # ตรวจสอบว่าลิสต์เป้าหมายอยู่ในบอร์ดเดียวกัน
-        target_list = get_object_or_404(List, id=list_id, board=task.list.board)
+        target_list = get_object_or_404(List, id=list_id, board_id=task.list.board_id)
 
-        # 1. ย้าย Task ไปลิสต์ใหม่ (ถ้ามีการเปลี่ยนลิสต์)
-        if task.list != target_list:
-            old_list_title = task.list.title 
+        old_list = task.list
 
-            # เปลี่ยนลิสต์ใหม่
-            task.list = target_list
-            task.save()
+        # 1. ย้าย Task
+        #    - ส่ง prev_id / next_id มา -> UPDATE แค่แถวเดียว
+        #    - ส่ง order (ลำดับทั้งคอลัมน์) มา -> ใช้ move_task_to_order (แถวเดียว หรือ CASE WHEN ทั้งคอลัมน์)
+        #    (ทั้งสองแบบล็อกแถว List เป้าหมายด้วย select_for_update ใน transaction.atomic() ของ ordering.py)
+        prev_id = request.POST.get("prev_id") or None
+        next_id = request.POST.get("next_id") or None
+        if order_str and not (prev_id or next_id):
+            ordered_ids = [int(id) for id in order_str.split(",") if id]
+            move_task_to_order(task, target_list, ordered_ids)
+        else:
+            move_task(task, target_list, prev_id=prev_id, next_id=next_id)
 
-            # บันทึก Log
+        if old_list != target_list:
+            # บันทึก Log (เข้า buffer, เขียนตอนจบ request)
             log_activity(
-                target_list.board, 
-                request.user, 
-                f"ย้ายการ์ด '{task.title}' จาก '{old_list_title}' ไปยัง '{target_list.title}'"
+                target_list.board_id,
+                request.user,
+                ActivityLog.Verb.TASK_MOVED,
+                task=task, from_list=old_list, to_list=target_list,
             )
 
-        # 2. อัปเดต position ของทุก Task ในลิสต์นั้น (Reorder)
-        if order_str:
-            ordered_ids = [int(id) for id in order_str.split(",") if id]
-            
-            # ดึง tasks ทั้งหมดในลิสต์เป้าหมายมา (เพื่อลด Query ใน Loop)
-            tasks_in_list = Task.objects.filter(list=target_list, id__in=ordered_ids)
-            
-            # สร้าง dict {task_id: task_object} เพื่อให้เข้าถึงข้อมูลเร็วๆ
-            task_map = {t.id: t for t in tasks_in_list}
-            
-            # วนลูปเซฟ position ตามลำดับที่ส่งมา
-            for index, t_id in enumerate(ordered_ids, start=1):
-                if t_id in task_map:
-                    t = task_map[t_id]
-                    # เซฟเฉพาะถ้าค่าเปลี่ยนจริง ๆ (ช่วยลดการยิง Database)
-                    if t.position != index:
-                        t.position = index
-                        t.save(update_fields=['position'])
-
         return JsonResponse({"success": True})
         
+    except Http404:
+        raise  # ไม่มีสิทธิ์ / ไม่พบการ์ดหรือลิสต์ -> 404 (ไม่ใช่ 500)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
 
 @login_required
 @require_POST
 def toggle_task_completion(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    user = request.user
+    task = get_object_or_404(Task.objects.select_related('list__board', 'created_by'), id=task_id)
     
     # Check Permission
-    if request.user not in task.list.board.members.all() and request.user != task.list.board.created_by:
+    if not can_access(user, task.list.board_id):
         return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
 
-    # สลับสถานะ
+    # สลับสถานะ (บันทึกเฉพาะฟิลด์สถานะ -> ไม่ index การค้นหาใหม่ / remind_at ถูกเติมใน Task.save เอง)
     task.is_completed = not task.is_completed
-    task.save()
-
-    import threading
+    task.save(update_fields=['is_completed', 'completed_at'])
+    log_activity(
+        task.list.board_id, user,
+        ActivityLog.Verb.TASK_COMPLETED if task.is_completed else ActivityLog.Verb.TASK_REOPENED,
+        task=task,
+    )
 
     # -----------------------------------------------
     # ✅ 1. แจ้งเตือน Notification & Real-time (เฉพาะตอนเสร็จ)
@@ -859,33 +710,20 @@ def toggle_task_completion(request, task_id):
     if task.is_completed:
         # เตรียมรายชื่อคนที่จะแจ้งเตือน (คนสร้าง + คนรับผิดชอบทุกคน ยกเว้นตัวเอง)
         target_users = set()
-        if task.created_by and task.created_by != request.user:
+        if task.created_by and task.created_by != user:
             target_users.add(task.created_by)
         
         for assignee in task.assigned_to.all():
-            if assignee != request.user:
+            if assignee != user:
                 target_users.add(assignee)
 
-        channel_layer = get_channel_layer()
-        for user in target_users:
-            # A. ลง Database
-            Notification.objects.create(
-                recipient=user,
-                actor=request.user,
-                task=task,
-                message=f"ได้ทำงาน '{task.title}' เสร็จเรียบร้อยแล้ว! 🎉"
-            )
-
-            # B. ส่ง Real-time
-            unread_count = Notification.objects.filter(recipient=user, is_read=False).count()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{user.id}",
-                {
-                    "type": "send_notification",
-                    "message": f"งานเสร็จแล้ว! '{task.title}'",
-                    "unread_count": unread_count
-                }
-            )
+        notify(
+            user,
+            target_users,
+            message=f"ได้ทำงาน '{task.title}' เสร็จเรียบร้อยแล้ว! 🎉",
+            push_message=f"งานเสร็จแล้ว! '{task.title}'",
+            task=task,
+        )
 
     # -----------------------------------------------
     # ✅ 2. แจ้งเตือน DISCORD
@@ -896,9 +734,9 @@ def toggle_task_completion(request, task_id):
             f"✅ **Task Completed!** 🎉\n"
             f"**Task:** {task.title}\n"
             f"**List:** {task.list.title}\n"
-            f"**Completed By:** {request.user.username}"
+            f"**Completed By:** {user.username}"
         )
-        threading.Thread(target=send_discord_notify, args=(msg, webhook_url)).start()
+        send_discord_notify(msg, webhook_url)
 
     return JsonResponse({
         'success': True, 
@@ -910,15 +748,11 @@ def toggle_task_completion(request, task_id):
 @login_required
 def toggle_task_archive(request, task_id):
     # แก้ไขตรงนี้: ใช้ Q เช็คว่า (เป็นสมาชิก OR เป็นคนสร้าง)
-    task = get_object_or_404(
-        Task, 
-        Q(list__board__members=request.user) | Q(list__board__created_by=request.user),
-        id=task_id
-    )
+    task = get_object_or_404(filter_accessible(Task.objects.all(), request.user, 'list__board_id'), id=task_id)
     
-    # ส่วนที่เหลือเหมือนเดิม
+    # ส่วนที่เหลือเหมือนเดิม (บันทึกแค่ is_archived -> ส่ง live event 'task.archived' และไม่ index ใหม่)
     task.is_archived = not task.is_archived
-    task.save()
+    task.save(update_fields=['is_archived'])
     
     return JsonResponse({
         'success': True, 
@@ -929,11 +763,7 @@ def toggle_task_archive(request, task_id):
 @login_required
 def get_archived_tasks(request, board_id):
     # 1. แก้ไขการหา Board: ให้เจอทั้ง "คนสร้าง" และ "สมาชิก"
-    board = get_object_or_404(
-        Board, 
-        Q(members=request.user) | Q(created_by=request.user),
-        id=board_id
-    )
+    board = get_object_or_404(accessible_boards(request.user), id=board_id)
 
     # 2. ดึงงานที่ is_archived=True
     tasks = Task.objects.filter(
@@ -964,11 +794,7 @@ def api_update_task_date(request):
             return JsonResponse({'success': False, 'error': 'Missing data'}, status=400)
 
         # หา Task (เช็คสิทธิ์ด้วย)
-        task = get_object_or_404(
-            Task, 
-            Q(list__board__created_by=request.user) | Q(list__board__members=request.user),
-            id=task_id
-        )
+        task = get_object_or_404(filter_accessible(Task.objects.all(), request.user, 'list__board_id'), id=task_id)
         
         from django.utils.dateparse import parse_datetime, parse_date
         
@@ -981,6 +807,8 @@ def api_update_task_date(request):
             # ถ้าของเดิมไม่มีเวลา ให้ตั้งเป็นเที่ยงวัน
             task.due_date = timezone.make_aware(datetime.datetime.combine(new_date, datetime.time(12, 0)))
 
+        # เปลี่ยนวันกำหนดส่ง -> ต้องแจ้งเตือนใหม่ตามวันใหม่ (เหมือน task_update)
+        task.is_reminded = False
         task.save()
         
         return JsonResponse({'success': True})
@@ -1000,7 +828,7 @@ def create_label(request, board_id):
     board = get_object_or_404(Board, id=board_id)
     
     # ตรวจสอบสิทธิ์ว่า user เป็นสมาชิกบอร์ดไหม
-    if request.user not in board.members.all() and board.created_by != request.user:
+    if not can_access(request.user, board.id):
         return JsonResponse({'error': 'Permission denied'}, status=403)
 
     try:
@@ -1027,10 +855,9 @@ def create_label(request, board_id):
 @require_POST
 def delete_label(request, label_id):
     label = get_object_or_404(Label, id=label_id)
-    board = label.board
     
     # ตรวจสอบสิทธิ์: ต้องเป็นสมาชิก หรือ เจ้าของบอร์ด ถึงจะลบได้
-    if request.user not in board.members.all() and board.created_by != request.user:
+    if not can_access(request.user, label.board_id):
         return JsonResponse({'error': 'Permission denied'}, status=403)
 
     try:
@@ -1044,9 +871,8 @@ def delete_label(request, label_id):
 @login_required
 @require_POST
 def create_checklist_item(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
-    
-    # ตรวจสอบสิทธิ์ (ถ้าจำเป็น): เช่น user ต้องอยู่ใน board นี้
+    # ตรวจสอบสิทธิ์: user ต้องอยู่ใน board นี้
+    task = get_object_or_404(filter_accessible(Task.objects.all(), request.user, 'list__board_id'), id=task_id)
     
     try:
         data = json.loads(request.body)
@@ -1068,7 +894,7 @@ def create_checklist_item(request, task_id):
 @login_required
 @require_POST
 def update_checklist_item_status(request, item_id):
-    item = get_object_or_404(ChecklistItem, id=item_id)
+    item = get_object_or_404(filter_accessible(ChecklistItem.objects.all(), request.user, 'task__list__board_id'), id=item_id)
     
     try:
         data = json.loads(request.body)
@@ -1084,7 +910,7 @@ def update_checklist_item_status(request, item_id):
 @login_required
 @require_POST
 def delete_checklist_item(request, item_id):
-    item = get_object_or_404(ChecklistItem, id=item_id)
+    item = get_object_or_404(filter_accessible(ChecklistItem.objects.all(), request.user, 'task__list__board_id'), id=item_id)
     item.delete()
     return JsonResponse({'success': True})
 
@@ -1093,7 +919,7 @@ def delete_checklist_item(request, item_id):
 @login_required
 @require_POST
 def create_attachment(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(filter_accessible(Task.objects.all(), request.user, 'list__board_id'), id=task_id)
     
     if 'file' in request.FILES:
         file = request.FILES['file']
@@ -1113,7 +939,9 @@ def create_attachment(request, task_id):
 @login_required
 @require_POST
 def delete_attachment(request, attachment_id):
-    attachment = get_object_or_404(Attachment, id=attachment_id)
+    attachment = get_object_or_404(
+        filter_accessible(Attachment.objects.all(), request.user, 'task__list__board_id'), id=attachment_id
+    )
     attachment.delete()
     return JsonResponse({'success': True})
 
@@ -1123,10 +951,10 @@ def delete_attachment(request, attachment_id):
 
 @login_required
 def get_comments(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(Task.objects.select_related('list'), id=task_id)
     
     # Check สิทธิ์: ต้องเป็นเจ้าของบอร์ด หรือ สมาชิกในบอร์ด
-    if request.user != task.list.board.created_by and request.user not in task.list.board.members.all():
+    if not can_access(request.user, task.list.board_id):
          return JsonResponse({'error': 'Unauthorized'}, status=403)
 
     comments = task.comments.select_related('author').order_by('-created_at')
@@ -1148,10 +976,10 @@ def get_comments(request, task_id):
 @require_POST
 @login_required
 def add_comment(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(Task.objects.select_related('list'), id=task_id)
     
     # Check สิทธิ์
-    if request.user != task.list.board.created_by and request.user not in task.list.board.members.all():
+    if not can_access(request.user, task.list.board_id):
          return JsonResponse({'error': 'Unauthorized'}, status=403)
 
     try:
@@ -1162,32 +990,19 @@ def add_comment(request, task_id):
 
         # 1. สร้างคอมเมนต์ลง DB
         comment = Comment.objects.create(task=task, author=request.user, content=content)
+        log_activity(task.list.board_id, request.user, ActivityLog.Verb.COMMENT_ADDED, task=task)
         
         # ==================================================
         # ⚠️ แจ้งเตือน Notification (Real-time)
         # ==================================================
-        # วนลูปแจ้งทุกคนที่รับผิดชอบงานนี้ (ยกเว้นตัวเราเอง)
-        for user in task.assigned_to.all():
-            if user != request.user:
-                # A. สร้าง Notification ลง Database
-                Notification.objects.create(
-                    recipient=user,
-                    actor=request.user,
-                    task=task,
-                    message=f"ได้แสดงความคิดเห็นในงาน '{task.title}': \"{content[:20]}{'...' if len(content)>20 else ''}\""
-                )
-
-                # B. ✅ ส่งสัญญาณ Real-time เข้าห้องส่วนตัวของ User
-                unread_count = Notification.objects.filter(recipient=user, is_read=False).count()
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    f"user_{user.id}",
-                    {
-                        "type": "send_notification",
-                        "message": f"มีความคิดเห็นใหม่ในงาน '{task.title}'",
-                        "unread_count": unread_count
-                    }
-                )
+        # แจ้งทุกคนที่รับผิดชอบงานนี้ (ยกเว้นตัวเราเอง)
+        notify(
+            request.user,
+            task.assigned_to.all(),
+            message=f"ได้แสดงความคิดเห็นในงาน '{task.title}': \"{content[:20]}{'...' if len(content)>20 else ''}\"",
+            push_message=f"มีความคิดเห็นใหม่ในงาน '{task.title}'",
+            task=task,
+        )
 
         # 2. เตรียมข้อมูลส่งกลับ (Response)
         avatar_url = comment.author.profile_image.url if comment.author.profile_image else None
@@ -1248,7 +1063,7 @@ def add_member(request, board_id):
     try:
         user_to_invite = User.objects.get(username=username)
         
-        if user_to_invite in board.members.all() or user_to_invite == board.created_by:
+        if can_access(user_to_invite, board.id):
             pass
         else:
             existing_invite = BoardInvitation.objects.filter(
@@ -1265,24 +1080,13 @@ def add_member(request, board_id):
                     recipient=user_to_invite
                 )
                 
-                # 2. สร้าง Notification ลง DB
-                Notification.objects.create(
-                    recipient=user_to_invite,
-                    actor=request.user,
-                    board=board,  
-                    message=f"ได้เชิญคุณเข้าร่วมบอร์ด '{board.name}'"
-                )
-
-                # ✅ 3. ส่ง Real-time Notification
-                channel_layer = get_channel_layer()
-                unread_count = Notification.objects.filter(recipient=user_to_invite, is_read=False).count()
-                async_to_sync(channel_layer.group_send)(
-                    f"user_{user_to_invite.id}",
-                    {
-                        "type": "send_notification",
-                        "message": f"คุณได้รับเชิญเข้าบอร์ด '{board.name}'",
-                        "unread_count": unread_count
-                    }
+                # 2. สร้าง Notification ลง DB + ส่ง Real-time
+                notify(
+                    request.user,
+                    [user_to_invite],
+                    message=f"ได้เชิญคุณเข้าร่วมบอร์ด '{board.name}'",
+                    push_message=f"คุณได้รับเชิญเข้าบอร์ด '{board.name}'",
+                    board=board,
                 )
 
     except User.DoesNotExist:
@@ -1300,6 +1104,7 @@ def remove_member(request, board_id, user_id):
 
     user_to_remove = get_object_or_404(User, id=user_id)
     board.members.remove(user_to_remove)
+    log_activity(board, request.user, ActivityLog.Verb.MEMBER_REMOVED, board=board.name, member=user_to_remove.username)
     
     return redirect('board_detail', board_id=board.id)
 
@@ -1311,6 +1116,7 @@ def respond_invitation(request, invite_id, action):
         invite.status = 'accepted'
         invite.save()
         invite.board.members.add(request.user)
+        log_activity(invite.board, request.user, ActivityLog.Verb.MEMBER_JOINED, board=invite.board.name)
     elif action == 'decline':
         invite.status = 'declined'
         invite.save()
@@ -1323,36 +1129,15 @@ def respond_invitation(request, invite_id, action):
 
 @login_required
 def get_notifications(request):
-    """ดึงรายการแจ้งเตือนล่าสุด 10 รายการ"""
-    notifs = Notification.objects.filter(recipient=request.user).order_by('-created_at')[:10]
-    
-    data = []
-    for n in notifs:
-        # 1. จัดการรูปโปรไฟล์
-        avatar_url = None
-        if n.actor and hasattr(n.actor, 'profile_image') and n.actor.profile_image:
-            avatar_url = n.actor.profile_image.url
-
-        
-        board_id = None
-        if n.task and n.task.list and n.task.list.board:
-            board_id = n.task.list.board.id
+    """ดึงรายการแจ้งเตือนล่าสุด 10 รายการ (?since=<id> = เฉพาะที่ใหม่กว่า id นั้น)"""
+    try:
+        since_id = int(request.GET.get('since') or 0) or None
+    except ValueError:
+        since_id = None
 
-        data.append({
-            'id': n.id,
-            'actor': n.actor.username if n.actor else 'ระบบ',
-            'actor_avatar': avatar_url,
-            'message': n.message,  
-            'created_at': n.created_at.strftime('%d/%m %H:%M'),
-            'is_read': n.is_read,
-            'board_id': board_id,  
-        })
-    
-    unread_count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-    
     return JsonResponse({
-        'notifications': data,
-        'unread_count': unread_count
+        'notifications': recent_notifications(request.user.pk, since_id),
+        'unread_count': get_unread_count(request.user),
     })
 
 @login_required
@@ -1360,8 +1145,10 @@ def read_notification(request, pk):
     """กดอ่านแจ้งเตือนรายตัว"""
     if request.method == "POST":
         notif = get_object_or_404(Notification, pk=pk, recipient=request.user)
-        notif.is_read = True
-        notif.save()
+        # อัปเดตแบบมีเงื่อนไข กันลดตัวนับซ้ำถ้ากดอ่านซ้ำ/กดพร้อมกัน
+        if Notification.objects.filter(pk=notif.pk, is_read=False).update(is_read=True):
+            adjust_unread([request.user.pk], -1)
+            push_read_state(request.user.pk, [notif.pk])  # แท็บอื่นของ user อัปเดตตาม
         return JsonResponse({'success': True})
     return JsonResponse({'success': False}, status=400)
 
@@ -1369,7 +1156,10 @@ def read_notification(request, pk):
 def mark_all_read(request):
     """กด 'อ่านทั้งหมด'"""
     if request.method == "POST":
-        Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+        marked = Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+        adjust_unread([request.user.pk], -marked)
+        if marked:
+            push_read_state(request.user.pk)
         return JsonResponse({'success': True})
     return JsonResponse({'success': False}, status=400)
 
@@ -1378,25 +1168,40 @@ def mark_all_read(request):
 #  8.1 Activities 
 # ==============================#
 
-def log_activity(board, user, action_text):
-    ActivityLog.objects.create(board=board, actor=user, action=action_text)
-
 # API ดึงประวัติกิจกรรม (สำหรับ JavaScript)
 @login_required
 def get_board_activities(request, board_id):
-    board = get_object_or_404(Board, pk=board_id)
-    
-    # ดึง 50 รายการล่าสุด
-    activities = board.activities.select_related('actor').order_by('-created_at')[:50]
-    
-    data = [{
-        'actor': act.actor.username,
-        'actor_initial': act.actor.username[0].upper(), # ตัวอักษรแรกของชื่อ
-        'action': act.action,
-        'created_at': act.created_at.strftime('%d/%m/%Y %H:%M')
-    } for act in activities]
-    
-    return JsonResponse({'activities': data})
+    board = get_object_or_404(accessible_boards(request.user), pk=board_id)
+
+    # แบ่งหน้าด้วย cursor (?cursor=...) + กรอง ?actor=<user_id>&from=YYYY-MM-DD&to=YYYY-MM-DD
+    activities = activity_queryset(board.id, **parse_filters(request.GET))
+    try:
+        page_size = int(request.GET.get('limit', ACTIVITY_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid limit'}, status=400)
+    try:
+        rows, next_cursor = activity_page(activities, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'activities': [serialize_activity(act) for act in rows],
+        'next_cursor': next_cursor,
+    })
+
+@login_required
+def export_board_activities(request, board_id):
+    board = get_object_or_404(accessible_boards(request.user), pk=board_id)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'message': 'Unsupported format'}, status=400)
+
+    # สตรีมทีละ chunk -> ไม่โหลดทั้งหมดเข้า memory
+    activities = activity_queryset(board.id, **parse_filters(request.GET))
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(export_lines(activities, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="board-{board.id}-activities.{fmt}"'
+    return response
 
 # ==========================================
 # 9. Calendar & Schedule
@@ -1405,43 +1210,119 @@ def get_board_activities(request, board_id):
 @login_required
 def global_calendar_view(request):
     # ดึงรายชื่อบอร์ดทั้งหมดที่ user เป็นสมาชิก หรือ เป็นคนสร้าง (เพื่อเอาไปใส่ Dropdown)
-    boards = Board.objects.filter(
-        Q(created_by=request.user) | Q(members=request.user)
-    ).distinct()
+    boards = list(accessible_boards(request.user))
+
+    # ลิงก์ subscribe (.ics) ของทุกบอร์ด + แต่ละบอร์ด (เปลี่ยนตาม dropdown)
+    ics_feeds = {'all': request.build_absolute_uri(reverse('calendar_feed', args=[make_ics_token(request.user)]))}
+    for board in boards:
+        ics_feeds[str(board.id)] = request.build_absolute_uri(
+            reverse('calendar_feed', args=[make_ics_token(request.user, board.id)])
+        )
     
     return render(request, 'boards/calendar_main.html', {
-        'boards': boards
+        'boards': boards,
+        'ics_feeds': ics_feeds,
     })
 
+
+def calendar_feed(request, token):
+    """
+    .ics feed สำหรับปฏิทินภายนอก (ไม่ต้องล็อกอิน ใช้ token ใน URL แทน)
+    ETag มาจาก data version (BoardVersion + ตารางเรียน) -> ไม่มีอะไรเปลี่ยนตอบ 304 โดยไม่ query ตาราง Task
+    """
+    try:
+        user, board_id = read_ics_token(token)
+    except InvalidIcsToken:
+        return HttpResponse(status=404)
+
+    board_ids = ics_feed_board_ids(user, board_id)
+    if board_id is not None and not board_ids:
+        return HttpResponse(status=404)  # ไม่ได้เป็นสมาชิกบอร์ดนี้แล้ว
+
+    include_schedule = board_id is None
+    etag = f'"{ics_feed_version(user, board_ids, include_schedule)}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        if board_id is None:
+            name = f"งานของ {user.username}"
+        else:
+            name = Board.objects.filter(id=board_id).values_list('name', flat=True).first() or ''
+        base_url = f"{request.scheme}://{request.get_host()}"
+        response = StreamingHttpResponse(
+            ics_feed_lines(user, board_ids, include_schedule, base_url, name),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="calendar.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+CALENDAR_PRIORITY_COLORS = {
+    Task.Priority.HIGH: '#EF4444',
+    Task.Priority.MEDIUM: '#3B82F6',
+    Task.Priority.LOW: '#10B981',
+}
+CALENDAR_DEFAULT_DAYS = 365  # ไม่ส่ง start/end มา -> ย้อนหลัง / ล่วงหน้าอย่างละ 1 ปี
+
+
+def _calendar_param(value):
+    # รับทั้ง "2026-10-01" และ "2026-10-01T00:00:00+07:00" (ค่าที่อ่านไม่ออก -> ValueError)
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _calendar_range(params):
+    """?start=&end= -> (start, end) แบบ aware (end ไม่รวม)"""
+    now = timezone.now()
+    start = _calendar_param(params['start']) if params.get('start') else now - datetime.timedelta(days=CALENDAR_DEFAULT_DAYS)
+    end = _calendar_param(params['end']) if params.get('end') else now + datetime.timedelta(days=CALENDAR_DEFAULT_DAYS)
+    if end <= start:
+        raise ValueError('end must be after start')
+    return start, end
+
+
 @login_required
 def api_calendar_events(request):
     events = []
 
+    # ช่วงวันที่ที่ปฏิทินแสดงอยู่ (FullCalendar ส่ง ?start=...&end=... มาเองทุกครั้งที่เปลี่ยนเดือน/สัปดาห์)
+    try:
+        range_start, range_end = _calendar_range(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid start/end'}, status=400)
+
     # ==========================================
     # 1. LOCAL TASKS: งานจากบอร์ดของเรา
     # ==========================================
     board_id = request.GET.get('board_id')
     
+    # กรองช่วง due_date ใน DB (index task_list_due_idx) + ดึงชื่อบอร์ดมาใน query เดียวกันด้วย values()
     tasks = Task.objects.filter(
-        due_date__isnull=False,
+        due_date__gte=range_start,
+        due_date__lt=range_end,
         is_archived=False
     )
 
-    user_boards = Board.objects.filter(Q(created_by=request.user) | Q(members=request.user))
-    tasks = tasks.filter(list__board__in=user_boards)
+    tasks = filter_accessible(tasks, request.user, 'list__board_id')
 
     if board_id and board_id != 'all':
         tasks = tasks.filter(list__board_id=board_id)
     
-    for task in tasks:
-        color = '#3B82F6' 
-        if task.priority == 'high': color = '#EF4444'
-        elif task.priority == 'low': color = '#10B981'
+    for task in tasks.values('id', 'title', 'priority', 'due_date', 'list__board_id', 'list__board__name'):
+        color = CALENDAR_PRIORITY_COLORS.get(task['priority'], '#3B82F6')
             
         events.append({
-            'title': f"[{task.list.board.name}] {task.title}",
-            'start': task.due_date.isoformat(),
-            'url': f"/board/{task.list.board.id}/?task_id={task.id}",
+            'title': f"[{task['list__board__name']}] {task['title']}",
+            'start': task['due_date'].isoformat(),
+            'url': f"/board/{task['list__board_id']}/?task_id={task['id']}",
             'backgroundColor': color,
             'borderColor': color,
             'textColor': '#ffffff',
@@ -1483,67 +1364,43 @@ def api_calendar_events(request):
     # ==========================================
     if 'google_credentials' in request.session:
         try:
-            creds_data = request.session['google_credentials']
-            creds = Credentials(**creds_data)
-            service = build('calendar', 'v3', credentials=creds)
-            
-            # ย้อนหลัง 1 ปี
-            start_time = (datetime.datetime.utcnow() - datetime.timedelta(days=365)).isoformat() + 'Z'
-            
-            calendar_list_result = service.calendarList().list(showHidden=True).execute()
-            calendars = calendar_list_result.get('items', [])
-            
-            for calendar_entry in calendars:
-                cal_id = calendar_entry['id']
-                cal_summary = calendar_entry.get('summary', 'Unknown')
-                
-                if 'holiday' in cal_id or 'addressbook' in cal_id or 'th.thai' in cal_id:
-                    continue
-
-                try:
-                    events_result = service.events().list(
-                        calendarId=cal_id,
-                        timeMin=start_time, 
-                        maxResults=50,      
-                        singleEvents=True,
-                        orderBy='startTime'
-                    ).execute()
-                    
-                    google_events = events_result.get('items', [])
-                    
-                    for event in google_events:
-                        start = event['start'].get('dateTime', event['start'].get('date'))
-                        event_title = event.get('summary', 'No Title')
-                        is_all_day = 'date' in event['start']
-                        
-                        # ✅ Check หา Google Meet Link
-                        meet_link = event.get('hangoutLink')
-                        html_link = event.get('htmlLink')
-                        
-                        # ถ้ามี Meet Link ให้ใช้เป็น URL หลัก (กดแล้วไป Meet เลย)
-                        # ถ้าไม่มี ให้ไปหน้าปฏิทิน Google ปกติ
-                        final_url = meet_link if meet_link else html_link
-                        
-                        events.append({
-                            'title': f"[{cal_summary}] {event_title}", 
-                            'start': start,
-                            'url': final_url,
-                            'backgroundColor': '#F59E0B', # สีส้ม
-                            'borderColor': '#F59E0B',
-                            'textColor': '#ffffff',
-                            'allDay': is_all_day,
-                            'editable': False, # ห้ามลากแก้ไข
-                            'extendedProps': {
-                                'is_google': True,
-                                'has_meet': bool(meet_link) # ส่ง Flag ไปบอก Frontend ให้โชว์ไอคอนกล้อง
-                            }
-                        })
-                        
-                except Exception:
-                    continue
-                
-        except Exception:
-            pass
+            # ช่วงเดียวกับที่ปฏิทินแสดง (ปัดเป็นต้นวัน -> ใช้ cache ร่วมกันได้ทั้งวัน)
+            one_day = datetime.timedelta(days=1)
+            start_time = floor_time(range_start, one_day)
+            end_time = floor_time(range_end, one_day) + one_day
+
+            for cal_summary, event in calendar_feed_events(
+                request.user.id, request.session['google_credentials'], start_time, end_time
+            ):
+                start = event['start'].get('dateTime', event['start'].get('date'))
+                event_title = event.get('summary', 'No Title')
+                is_all_day = 'date' in event['start']
+
+                # ✅ Check หา Google Meet Link
+                meet_link = event.get('hangoutLink')
+                html_link = event.get('htmlLink')
+
+                # ถ้ามี Meet Link ให้ใช้เป็น URL หลัก (กดแล้วไป Meet เลย)
+                # ถ้าไม่มี ให้ไปหน้าปฏิทิน Google ปกติ
+                final_url = meet_link if meet_link else html_link
+
+                events.append({
+                    'title': f"[{cal_summary}] {event_title}", 
+                    'start': start,
+                    'url': final_url,
+                    'backgroundColor': '#F59E0B', # สีส้ม
+                    'borderColor': '#F59E0B',
+                    'textColor': '#ffffff',
+                    'allDay': is_all_day,
+                    'editable': False, # ห้ามลากแก้ไข
+                    'extendedProps': {
+                        'is_google': True,
+                        'has_meet': bool(meet_link) # ส่ง Flag ไปบอก Frontend ให้โชว์ไอคอนกล้อง
+                    }
+                })
+
+        except Exception as e:
+            print(f"Google API Error: {e}")
 
     return JsonResponse(events, safe=False)
 
@@ -1624,76 +1481,10 @@ def google_calendar_callback(request):
 def fetch_google_calendar_partial(request):
 
     google_events = [] 
-    # เช็คว่ามี Credentials ไหม
+    # เช็คว่ามี Credentials ไหม (ใช้ service + cache เดียวกับหน้า Dashboard)
     if 'google_credentials' in request.session:
         try:
-            creds_data = request.session['google_credentials']
-            creds = Credentials(**creds_data)
-            service = build('calendar', 'v3', credentials=creds)
-            
-            now_iso = datetime.datetime.utcnow().isoformat() + 'Z'
-            
-            # 1. ดึงรายชื่อปฏิทิน
-            calendar_list = service.calendarList().list().execute().get('items', [])
-            
-            all_events = []
-            
-            # 2. วนลูปดึง Event (ส่วนนี้แหละที่ช้า เราเลยย้ายมาทำทีหลัง)
-            for calendar_entry in calendar_list:
-                cal_name = calendar_entry.get('summary', '')
-
-                # กรองปฏิทินที่ไม่ต้องการ
-                keywords = ['holiday', 'วันหยุด', 'birthday', 'วันเกิด']
-                if any(k in cal_name.lower() for k in keywords):
-                    continue
-
-                try:
-                    # ดึง Event จากแต่ละปฏิทิน
-                    events_result = service.events().list(
-                        calendarId=calendar_entry['id'], 
-                        timeMin=now_iso,
-                        maxResults=5, 
-                        singleEvents=True,
-                        orderBy='startTime'
-                    ).execute()
-                    
-                    items = events_result.get('items', [])
-                    for event in items:
-                        event['calendar_name'] = cal_name
-                        all_events.append(event)
-                        
-                except Exception as e:
-                    # ถ้าปฏิทินไหน error ก็ข้ามไป ไม่ให้เว็บพัง
-                    continue
-
-            # 3. จัดเรียงตามเวลา
-            def get_start_time(e):
-                return e['start'].get('dateTime', e['start'].get('date'))
-            
-            all_events.sort(key=get_start_time)
-            all_events = all_events[:15] # เอาแค่ 15 อันดับแรก
-
-            # 4. จัด Format ข้อมูล
-            for event in all_events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                try:
-                    if isinstance(start, str):
-                        if 'T' in start:
-                             start_dt = datetime.datetime.fromisoformat(start.replace('Z', '+00:00'))
-                        else:
-                             start_dt = datetime.datetime.strptime(start, "%Y-%m-%d")
-                    else:
-                        start_dt = start
-                except ValueError:
-                    start_dt = start
-
-                google_events.append({
-                    'title': event.get('summary', '(ไม่มีชื่อ)'),
-                    'start': start_dt,
-                    'link': event.get('htmlLink', '#'),
-                    'source': event.get('calendar_name', 'Google Calendar')
-                })
-                
+            google_events, _ = upcoming_events(request.user.id, request.session['google_credentials'])
         except Exception as e:
             print(f"Google API Error in Partial View: {e}")
 
@@ -1745,16 +1536,11 @@ def sync_google_classroom_confirm(request):
         return redirect('project_page')
 
     try:
-        # 2. เตรียม Service
+        # 2. เตรียม Credentials (ใช้ service กลางใน google_calendar.py)
         creds_data = request.session['google_credentials']
-        creds = Credentials(**creds_data)
-        service = build('calendar', 'v3', credentials=creds)
-        
-        # กำหนดช่วงเวลา (ย้อนหลัง 90 วัน)
-        now = datetime.datetime.utcnow()
-        time_min = (now - datetime.timedelta(days=90)).isoformat() + 'Z'
 
         created_count = 0
+        updated_count = 0
         error_logs = []
 
         for item in selected_items:
@@ -1773,9 +1559,9 @@ def sync_google_classroom_confirm(request):
             )
 
             if created:
-                List.objects.create(board=board, title="To Do", position=1)
-                List.objects.create(board=board, title="Doing", position=2)
-                List.objects.create(board=board, title="Done", position=3)
+                List.objects.create(board=board, title="To Do", position=1 * POSITION_GAP)
+                List.objects.create(board=board, title="Doing", position=2 * POSITION_GAP)
+                List.objects.create(board=board, title="Done", position=3 * POSITION_GAP)
             
             # หา List เป้าหมาย (To Do)
             todo_list = board.lists.filter(title__icontains="To Do").first()
@@ -1785,87 +1571,25 @@ def sync_google_classroom_confirm(request):
             if not todo_list: continue # ถ้าไม่มี List เลยก็ข้าม
 
             # ---------------------------------------------------
-            # STEP B: ดึงงานจาก Google Calendar
+            # STEP B: Sync งานจาก Google Calendar
+            # (รอบแรกดึงย้อนหลัง 90 วัน รอบถัดไปใช้ syncToken ดึงเฉพาะที่เปลี่ยน)
             # ---------------------------------------------------
             try:
-                events_result = service.events().list(
-                    calendarId=cal_id,
-                    timeMin=time_min,
-                    maxResults=50,
-                    singleEvents=True,
-                    orderBy='startTime'
-                ).execute()
-                
-                google_events = events_result.get('items', [])
-
-                for event in google_events:
-                    g_id = event['id']
-                    summary = event.get('summary', '(No Title)')
-
-                    # 1. เช็คงานซ้ำ (Duplicate Check)
-                    if Task.objects.filter(google_event_id=g_id).exists():
-                        continue 
-                    
-                    # 2. เตรียมข้อมูล Description + Link
-                    desc_text = event.get('description', '') or "-"
-                    link = event.get('htmlLink', '#')
-                    final_desc = f"{desc_text}\n\n🔗 Google Link:\n{link}"
-
-                    # 3. แปลงวันที่ (Due Date Parsing)
-                    start = event['start'].get('dateTime', event['start'].get('date'))
-                    due_date = None
-                    if start:
-                        try:
-                            if 'T' in start:
-                                # มีเวลา (datetime)
-                                due_date = datetime.datetime.fromisoformat(start.replace('Z', '+00:00'))
-                            else:
-                                # มีแต่วันที่ (date) -> ตั้งเป็น 23:59 ของวันนั้น
-                                due_date = datetime.datetime.strptime(start, "%Y-%m-%d")
-                                due_date = due_date.replace(hour=23, minute=59)
-                                due_date = timezone.make_aware(due_date)
-                        except Exception:
-                            pass
-
-                    # 4. สร้าง Task
-                    try:
-                        task = Task.objects.create(
-                            list=todo_list,
-                            title=summary[:255],     # ตัดชื่อไม่ให้เกิน 255
-                            description=final_desc,
-                            due_date=due_date,
-                            google_event_id=g_id,
-                            
-                            # ค่า Default ตาม Model
-                            position=0, 
-                            priority=Task.Priority.MEDIUM,
-                            status=Task.Status.TODO,
-                            is_completed=False,
-                            is_archived=False
-                            
-                            # ❌ ตัด created_by ออก เพราะใน Model ไม่มี field นี้
-                        )
-                        
-                        # ✅ เพิ่มคนรับผิดชอบ (Assigned To) เป็นคนกด Sync
-                        task.assigned_to.add(request.user)
-                        
-                        created_count += 1
-                        
-                    except Exception as e:
-                        print(f"❌ Error Saving Task '{summary}': {e}")
-                        error_logs.append(f"{summary}: {e}")
-
+                result = sync_calendar(request.user, creds_data, cal_id, board, todo_list)
+                created_count += result['created']
+                updated_count += result['updated'] + result['cancelled']
             except Exception as e:
                 print(f"❌ API Error for Calendar {cal_name}: {e}")
+                error_logs.append(f"{cal_name}: {e}")
                 continue
 
         # แจ้งผลลัพธ์
         if error_logs:
             messages.warning(request, f"นำเข้าได้ {created_count} งาน แต่มีข้อผิดพลาดบางรายการ")
-        elif created_count == 0:
-            messages.info(request, "ไม่พบงานใหม่ในช่วง 90 วันที่ผ่านมา")
+        elif created_count == 0 and updated_count == 0:
+            messages.info(request, "ไม่พบงานใหม่หรืองานที่เปลี่ยนแปลง")
         else:
-            messages.success(request, f"สำเร็จ! นำเข้า {created_count} งานเรียบร้อยแล้ว")
+            messages.success(request, f"สำเร็จ! นำเข้า {created_count} งาน อัปเดต {updated_count} งานเรียบร้อยแล้ว")
 
         return redirect('project_page')
 
@@ -1879,112 +1603,68 @@ def sync_google_classroom_confirm(request):
 
 @login_required
 def reporting_view(request):
-    # ... (ส่วน Filter บอร์ด เหมือนเดิม) ...
-    user_boards = Board.objects.filter(Q(created_by=request.user) | Q(members=request.user)).distinct()
-    tasks = Task.objects.filter(
-    Q(list__board__created_by=request.user) | Q(list__board__members=request.user)
-).distinct() \
- .select_related('list', 'list__board') \
- .prefetch_related('assigned_to', 'labels')
+    board_ids = sorted(accessible_board_ids(request.user))
+    user_boards = Board.objects.filter(id__in=board_ids).only('id', 'name')
 
     selected_board_id = request.GET.get('board_id')
+    current_board_name = "ทุกโปรเจกต์"
     if selected_board_id and selected_board_id != 'all':
-        tasks = tasks.filter(list__board_id=selected_board_id)
-        current_board_name = user_boards.filter(id=selected_board_id).first().name
-    else:
-        current_board_name = "ทุกโปรเจกต์"
-
-    # ==========================================
-    # เตรียม QuerySet สำหรับ Modal List
-    # ==========================================
-    all_tasks_qs = tasks.select_related('list__board').order_by('-created_at')
-    completed_tasks_qs = tasks.filter(is_completed=True).select_related('list__board').order_by('-completed_at')
-    overdue_tasks_qs = tasks.filter(due_date__lt=timezone.now(), is_completed=False).select_related('list__board').order_by('due_date')
-    remaining_tasks_qs = tasks.filter(is_completed=False).select_related('list__board').order_by('due_date')
-
-    # ==========================================
-    # คำนวณ KPIs
-    # ==========================================
-    total_tasks = tasks.count()
-    completed_tasks = completed_tasks_qs.count()
-    remaining_count = remaining_tasks_qs.count()
-    overdue_tasks = overdue_tasks_qs.count()
-    completion_rate = round((completed_tasks / total_tasks * 100), 1) if total_tasks > 0 else 0
+        selected_board = next((b for b in user_boards if str(b.id) == selected_board_id), None)
+        if selected_board:
+            board_ids = [selected_board.id]
+            current_board_name = selected_board.name
 
-    # ==========================================
-    # เตรียมข้อมูลกราฟ (Charts Data)
-    # ==========================================
-
-    # Chart 1: Priority
-    priority_data = {
-        'high': tasks.filter(priority='high', is_completed=False).count(),
-        'medium': tasks.filter(priority='medium', is_completed=False).count(),
-        'low': tasks.filter(priority='low', is_completed=False).count(),
-    }
-
-    # Chart 2: Trend
-    last_7_days = timezone.now() - timedelta(days=7)
-    completed_trend = (
-        tasks.filter(is_completed=True, completed_at__gte=last_7_days)
-        .annotate(date=TruncDate('completed_at'))
-        .values('date')
-        .annotate(count=Count('id'))
-        .order_by('date')
-    )
-    trend_labels = [item['date'].strftime('%d/%m') for item in completed_trend]
-    trend_data = [item['count'] for item in completed_trend]
-
-    # Chart 3: Member Workload
-    member_stats = tasks.values('assigned_to__username').annotate(total=Count('id')).order_by('-total')
-    member_labels = [m['assigned_to__username'] if m['assigned_to__username'] else 'Unassigned' for m in member_stats]
-    member_data = [m['total'] for m in member_stats]
-
-    # Chart 4: Task Distribution (แก้ไขจุดที่ Error) ✅
-    # เปลี่ยนจาก 'list__order' เป็น 'list__position'
-    list_stats = tasks.values('list__title').annotate(count=Count('id')).order_by('list__position')
-    
-    list_labels = [l['list__title'] for l in list_stats]
-    list_data = [l['count'] for l in list_stats]
+    # ช่วงเวลาของกราฟแนวโน้ม (7 / 30 / 90 / 365 วัน)
+    try:
+        trend_days = int(request.GET.get('days', TREND_DAYS))
+    except ValueError:
+        trend_days = TREND_DAYS
 
+    # KPI + กราฟ ทั้งหมดมาจาก reporting engine (cache ตาม version ของบอร์ด)
     context = {
         'boards': user_boards,
         'selected_board_id': selected_board_id,
         'current_board_name': current_board_name,
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'remaining_count': remaining_count,
-        'completion_rate': completion_rate,
-        'overdue_tasks': overdue_tasks,
-        'all_tasks_qs': all_tasks_qs,
-        'completed_tasks_qs': completed_tasks_qs,
-        'remaining_tasks_qs': remaining_tasks_qs,
-        'overdue_tasks_qs': overdue_tasks_qs,
-        'priority_data': priority_data,
-        'trend_labels': trend_labels,
-        'trend_data': trend_data,
-        'member_labels': member_labels,
-        'member_data': member_data,
-        'list_labels': list_labels, #  ส่งข้อมูลกราฟใหม่
-        'list_data': list_data,     #  ส่งข้อมูลกราฟใหม่
+        'trend_ranges': TREND_RANGES,
+        **get_report(request.user, board_ids, trend_days),
     }
 
     return render(request, 'boards/reporting.html', context)
 
+
+@login_required
+def reporting_tasks_api(request):
+    """รายการงานใน Modal ของหน้า Report (ทีละหน้า)"""
+    board_ids = sorted(accessible_board_ids(request.user))
+    selected_board_id = request.GET.get('board_id')
+    if selected_board_id and selected_board_id != 'all':
+        board_ids = [board_id for board_id in board_ids if str(board_id) == selected_board_id]
+
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    rows, has_next = report_task_page(board_ids, request.GET.get('type', 'all'), page)
+    tasks = [{
+        'id': row['id'],
+        'title': row['title'],
+        'board_name': row['list__board__name'],
+        'list_title': row['list__title'],
+        'due_date': timezone.localtime(row['due_date']).strftime('%d %b %Y') if row['due_date'] else '',
+        'url': f"{reverse('board_detail', args=[row['list__board_id']])}?task_id={row['id']}",
+    } for row in rows]
+
+    return JsonResponse({'tasks': tasks, 'page': page, 'has_next': has_next})
+
 # =========
 # DISCORD NOTIFICATION FUNCTION
 # =========
 def send_discord_notify(message, webhook_url=None):
+    """ส่งข้อความเข้า Discord ผ่านคิวงานเบื้องหลัง (มี retry ถ้าส่งไม่ผ่าน)"""
     if not webhook_url:
         return
-    try:
-        data = {
-            "username": "Work Wai D Borad", 
-            "avatar_url": "https://cdn-icons-png.flaticon.com/512/2991/2991148.png", 
-            "content": message
-        }
-        requests.post(webhook_url, json=data, timeout=3)
-    except Exception as e:
-        print(f"Discord Error: {e}") 
+    enqueue_discord(message, webhook_url)
 
 
 # ==========================================
@@ -2002,16 +1682,7 @@ def send_invitation_email(invite, sender):
         f"สามารถเข้าไปตอบรับคำเชิญได้ที่เว็บไซต์ของเรา"
     )
     
-    try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [invite.recipient.email],
-            fail_silently=False,
-        )
-    except Exception as e:
-        print(f"Invite Email Error: {e}")
+    enqueue_email(subject, message, [invite.recipient.email])
 
 
 def send_email_notify(task, recipient):
@@ -2031,14 +1702,4 @@ def send_email_notify(task, recipient):
         f"ตรวจสอบรายละเอียดได้ที่เว็บไซต์ของเรา"
     )
     
-    try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [recipient.email],
-            fail_silently=False,
-        )
-        print(f" Email sent to {recipient.email}")
-    except Exception as e:
-        print(f" Email Error: {e}")
\ No newline at end of file
+    enqueue_email(subject, message, [recipient.email])
\ No newline at end of file
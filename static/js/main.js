@@ -33,12 +33,68 @@ function projectPage() {
     };
 }
 
+// งานของฉัน (Dashboard): ตัวเลข + หน้าแรกมากับ HTML แล้ว, แท็บอื่น / หน้าถัดไปดึงจาก API ทีละหน้า (keyset cursor)
+window.myTasksPage = function (config) {
+    const initial = JSON.parse(document.getElementById(config.dataId).textContent);
+    return {
+        url: config.url,
+        filter: 'all',
+        counts: initial.counts,
+        tasks: initial.tasks,
+        cursor: initial.next_cursor,
+        isLoading: false,
+
+        async fetchPage(cursor = null) {
+            const params = new URLSearchParams({ bucket: this.filter });
+            if (cursor) params.set('cursor', cursor);
+            const res = await fetch(`${this.url}?${params}`);
+            const data = await res.json();
+            if (data.counts) this.counts = data.counts;
+            this.cursor = data.next_cursor || null;
+            return data.tasks || [];
+        },
+        async setFilter(filter) {
+            if (this.filter === filter || this.isLoading) return;
+            this.filter = filter;
+            this.isLoading = true;
+            this.tasks = [];
+            this.cursor = null;
+            try {
+                this.tasks = await this.fetchPage();
+            } catch (err) {
+                console.error("Error loading tasks:", err);
+            } finally {
+                this.isLoading = false;
+            }
+        },
+        async loadMore() {
+            if (!this.cursor || this.isLoading) return;
+            this.isLoading = true;
+            try {
+                this.tasks.push(...await this.fetchPage(this.cursor));
+            } catch (err) {
+                console.error("Error loading tasks:", err);
+            } finally {
+                this.isLoading = false;
+            }
+        },
+    };
+};
+
 window.boardDetailPage = function (config) {
     return {
         // ==== Configuration ====
+        boardId: (config && config.boardId) ? config.boardId : null,
         moveUrl: (config && config.moveUrl) ? config.moveUrl : '',
         listMoveUrl: (config && config.listMoveUrl) ? config.listMoveUrl : '',
 
+        // ==== Live Updates (WebSocket) ====
+        liveSocket: null,
+        liveConnected: false,
+        onlineUsers: [],
+        boardStale: false,       // มีการเปลี่ยนแปลงที่อัปเดตเองไม่ได้ -> แสดงปุ่มโหลดใหม่
+        deferredEvents: [],      // event ที่มาระหว่างกำลังลาก (รอวางเสร็จก่อนค่อยอัปเดต)
+
         // ==== Member & UI ====
         addMemberOpen: false,
         filterMember: '',
@@ -93,8 +149,166 @@ window.boardDetailPage = function (config) {
         activityDrawerOpen: false,
         activities: [],
         isLoadingActivities: false,
+        activityCursor: null,       // cursor ของหน้าถัดไป (null = หมดแล้ว)
+        activityFilter: { actor: '', from: '', to: '' },
+        isLoadingMoreActivities: false,
         menuOpen: false,
 
+        init() {
+            if (this.boardId) this.connectLive();
+        },
+
+        // ------------------------------------------------------------------
+        // ✅ Live Updates: รับ delta จาก ws/board/<id>/ แล้วแก้ DOM (ไม่ต้องโหลดบอร์ดใหม่)
+        // ------------------------------------------------------------------
+        connectLive() {
+            const wsScheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+            this.liveSocket = new WebSocket(`${wsScheme}://${window.location.host}/ws/board/${this.boardId}/`);
+
+            this.liveSocket.onopen = () => {
+                // ต่อใหม่หลังหลุด -> อาจพลาด event ระหว่างนั้น
+                if (this.liveConnected) this.boardStale = true;
+                this.liveConnected = true;
+            };
+            this.liveSocket.onmessage = (e) => {
+                const data = JSON.parse(e.data);
+                if (data.type === 'board.delta') this.applyDelta(data.events);
+            };
+            this.liveSocket.onclose = () => {
+                setTimeout(() => this.connectLive(), 3000);
+            };
+        },
+
+        findCard(taskId) {
+            return document.querySelector(`[data-task-id="${taskId}"]`);
+        },
+
+        sortChildren(container, selector, anchor = null) {
+            if (!container) return;
+            const items = [...container.querySelectorAll(`:scope > ${selector}`)];
+            const key = (el) => [parseFloat(el.dataset.position) || 0, parseInt(el.dataset.taskId || el.dataset.listId)];
+            items.sort((a, b) => {
+                const [pa, ia] = key(a), [pb, ib] = key(b);
+                return (pa - pb) || (ia - ib);
+            });
+            items.forEach(el => container.insertBefore(el, anchor));
+        },
+
+        sortCards(listId) {
+            this.sortChildren(document.querySelector(`[data-list-tasks="${listId}"]`), '[data-task-id]');
+        },
+
+        sortLists() {
+            const columns = document.querySelector('[data-list-columns]');
+            this.sortChildren(columns, '[data-list-id]', columns ? columns.querySelector(':scope > [data-add-list]') : null);
+        },
+
+        applyDelta(events) {
+            if (this.draggingTaskId || this.draggingListId) {
+                this.deferredEvents.push(...events);
+                return;
+            }
+
+            const touchedLists = new Set();
+            let listsMoved = false;
+
+            for (const ev of events) {
+                switch (ev.type) {
+                    case 'presence':
+                        this.onlineUsers = ev.users;
+                        break;
+                    case 'board.changed':
+                        this.boardStale = true;
+                        break;
+                    case 'task.deleted':
+                        this.findCard(ev.id)?.remove();
+                        break;
+                    case 'list.deleted':
+                        document.querySelector(`[data-list-id="${ev.id}"]`)?.remove();
+                        break;
+                    case 'list.updated': {
+                        const column = document.querySelector(`[data-list-id="${ev.id}"]`);
+                        if (!column) { this.boardStale = true; break; }  // ลิสต์ใหม่ -> ต้องโหลดใหม่
+                        column.querySelector('[data-list-title]').textContent = ev.title;
+                        column.dataset.position = ev.position;
+                        listsMoved = true;
+                        break;
+                    }
+                    case 'list.reordered':
+                        for (const [id, position] of Object.entries(ev.positions)) {
+                            const column = document.querySelector(`[data-list-id="${id}"]`);
+                            if (column) column.dataset.position = position;
+                        }
+                        listsMoved = true;
+                        break;
+                    case 'list.tasks_reordered':
+                        for (const [id, position] of Object.entries(ev.positions)) {
+                            const card = this.findCard(id);
+                            if (card) card.dataset.position = position;
+                        }
+                        touchedLists.add(String(ev.list_id));
+                        break;
+                    default:
+                        // task.created / task.updated / task.moved / task.archived
+                        this.applyTaskDelta(ev, touchedLists);
+                }
+            }
+
+            touchedLists.forEach(listId => this.sortCards(listId));
+            if (listsMoved) this.sortLists();
+        },
+
+        applyTaskDelta(ev, touchedLists) {
+            const card = this.findCard(ev.id);
+            if (ev.is_archived) {
+                card?.remove();
+                return;
+            }
+            // ข้อมูลบนการ์ดเปลี่ยน (ชื่อ, ผู้รับผิดชอบ, เช็คลิสต์ ...) -> ขอ HTML การ์ดใบเดียวมาแทน
+            if (ev.title !== undefined || !card) {
+                this.refreshCard(ev.id);
+                return;
+            }
+            if (ev.list_id !== undefined) {
+                const container = document.querySelector(`[data-list-tasks="${ev.list_id}"]`);
+                if (container && card.parentElement !== container) container.appendChild(card);
+                card.dataset.position = ev.position;
+                touchedLists.add(String(ev.list_id));
+            }
+        },
+
+        async refreshCard(taskId) {
+            try {
+                const res = await fetch(`/board/task/${taskId}/card/`);
+                if (!res.ok || res.status === 204) {
+                    this.findCard(taskId)?.remove();
+                    return;
+                }
+                const template = document.createElement('template');
+                template.innerHTML = (await res.text()).trim();
+                const fresh = template.content.firstElementChild;
+                const container = document.querySelector(`[data-list-tasks="${fresh.dataset.list}"]`);
+                if (!container) { this.boardStale = true; return; }
+
+                const old = this.findCard(taskId);
+                if (old && old.parentElement === container) {
+                    old.replaceWith(fresh);
+                } else {
+                    old?.remove();
+                    container.appendChild(fresh);
+                }
+                this.sortCards(fresh.dataset.list);
+            } catch (err) {
+                console.error('Refresh card error:', err);
+            }
+        },
+
+        flushDeferredEvents() {
+            const events = this.deferredEvents;
+            this.deferredEvents = [];
+            if (events.length) this.applyDelta(events);
+        },
+
         // Return a human readable label for remind days (used by popup form)
         remindLabel(days) {
             const d = parseInt(days) || 0;
@@ -119,21 +333,48 @@ window.boardDetailPage = function (config) {
                 this.isLoadingArchived = false;
             }
         },
+        activityQuery(extra = {}) {
+            const params = new URLSearchParams();
+            Object.entries({ ...this.activityFilter, ...extra }).forEach(([key, value]) => {
+                if (value) params.set(key, value);
+            });
+            return params.toString();
+        },
+        async fetchActivities(boardId, cursor = null) {
+            const res = await fetch(`/board/${boardId}/activities/?${this.activityQuery({ cursor })}`);
+            const data = await res.json();
+            this.activityCursor = data.next_cursor || null;
+            return data.activities || [];
+        },
         async loadActivities(boardId) {
             this.activityDrawerOpen = true;
             this.isLoadingActivities = true;
             this.activities = [];
+            this.activityCursor = null;
 
             try {
-                const res = await fetch(`/board/${boardId}/activities/`);
-                const data = await res.json();
-                this.activities = data.activities || [];
+                this.activities = await this.fetchActivities(boardId);
             } catch (err) {
                 console.error("Error loading activities:", err);
             } finally {
                 this.isLoadingActivities = false;
             }
         },
+        // โหลดหน้าถัดไปต่อท้าย (keyset cursor)
+        async loadMoreActivities(boardId) {
+            if (!this.activityCursor || this.isLoadingMoreActivities) return;
+            this.isLoadingMoreActivities = true;
+            try {
+                this.activities.push(...await this.fetchActivities(boardId, this.activityCursor));
+            } catch (err) {
+                console.error("Error loading activities:", err);
+            } finally {
+                this.isLoadingMoreActivities = false;
+            }
+        },
+        activityExportUrl(boardId, format) {
+            return `/board/${boardId}/activities/export/?${this.activityQuery({ format })}`;
+        },
 
         // ✅ 3. ฟังก์ชันกู้คืนงาน (ใช้ API ตัวเดิมที่มีอยู่แล้วได้เลย)
         async restoreTask(taskId, csrfToken) {
@@ -232,6 +473,7 @@ window.boardDetailPage = function (config) {
         onDragEndTask(event) {
             event.target.classList.remove('opacity-50', 'dragging');
             this.draggingTaskId = null;
+            this.flushDeferredEvents();
         },
 
         onDragStartList(event, listId) {
@@ -307,16 +549,15 @@ window.boardDetailPage = function (config) {
                     if (!res.ok) {
                         console.error('Task move failed');
                         window.location.reload();
-                    } else {
-                        // ✅ เพิ่มบรรทัดนี้: ถ้าย้ายสำเร็จ ให้รีโหลดหน้าเพื่อซิงค์ข้อมูลล่าสุดจาก Server
-                        window.location.reload(); 
                     }
+                    // ย้ายสำเร็จ -> ไม่ต้องรีโหลด: position ล่าสุดจะมาทาง WebSocket (task.moved / list.tasks_reordered)
                 } catch (err) {
                     console.error(err);
                     alert("เกิดข้อผิดพลาดในการย้ายการ์ด"); // เพิ่ม Alert ให้รู้ถ้าเน็ตหลุด
                 }
                 
                 this.draggingTaskId = null;
+                this.flushDeferredEvents();
                 return;
             }
 
@@ -330,15 +571,17 @@ window.boardDetailPage = function (config) {
                 formData.append('target_id', listId);
 
                 try {
-                    await fetch(this.listMoveUrl, {
+                    const res = await fetch(this.listMoveUrl, {
                         method: 'POST',
                         headers: { 'X-CSRFToken': csrftoken },
                         body: formData,
                     });
-                    window.location.reload();
+                    // สำเร็จ -> ลำดับลิสต์ใหม่มาทาง WebSocket (list.reordered)
+                    if (!res.ok) window.location.reload();
                 } catch (err) {
                     console.error(err);
                 }
+                this.flushDeferredEvents();
             }
         },
     };